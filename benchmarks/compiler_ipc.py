@@ -0,0 +1,121 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""Compare the compiler IPC codec with plain pickle.
+
+The traffic is modelled after a typical workload: many client
+connections with a handful of distinct session states compiling
+a few hundred distinct queries that share a smaller set of types.
+
+Usage: python benchmarks/compiler_ipc.py [--messages N]
+"""
+
+
+import argparse
+import hashlib
+import os
+import random
+import time
+
+import immutables
+
+from edb.server2 import procpool
+from edb.server2.backend import dbstate
+from edb.server2.backend import ipc
+
+
+def make_traffic(n, *, seed=0):
+    rnd = random.Random(seed)
+
+    types = [
+        (os.urandom(16), os.urandom(rnd.randint(40, 600)))
+        for _ in range(40)
+    ]
+
+    states = []
+    for i in range(8):
+        modaliases = immutables.Map({None: 'default', 'm': f'mod{i}'})
+        config = immutables.Map(
+            {f'setting{j}': 'value' for j in range(rnd.randint(0, 5))})
+        states.append((modaliases, config))
+
+    queries = []
+    for i in range(300):
+        eql = (f'SELECT User {{ name, friends: {{ name }} }} '
+               f'FILTER .id = <uuid>$0 LIMIT {i}').encode()
+        sql = b'SELECT ' + b', '.join(
+            b'"t%d"."c%d"' % (i, j) for j in range(rnd.randint(5, 50)))
+        out_type_id, out_type_data = rnd.choice(types)
+        in_type_id, in_type_data = rnd.choice(types[:5])
+        unit = dbstate.QueryUnit(
+            dbver=1,
+            txid=None,
+            sql=sql,
+            sql_hash=hashlib.sha1(sql).hexdigest().encode(),
+            out_type_data=out_type_data,
+            out_type_id=out_type_id,
+            in_type_data=in_type_data,
+            in_type_id=in_type_id)
+        queries.append((eql, unit))
+
+    traffic = []
+    for _ in range(n):
+        modaliases, config = rnd.choice(states)
+        eql, unit = rnd.choice(queries)
+        args = ('db', 1, eql, modaliases, config, False)
+        traffic.append((('compile_eql', args), (0, unit)))
+
+    return traffic
+
+
+def run(codec_cls, traffic):
+    server = codec_cls()
+    worker = codec_cls()
+    total_size = 0
+
+    started = time.perf_counter()
+    for (method_name, args), response in traffic:
+        data = server.encode_request(method_name, args)
+        total_size += len(data)
+        worker.decode_request(data)
+
+        data = worker.encode_response(response)
+        total_size += len(data)
+        server.decode_response(data)
+
+    return time.perf_counter() - started, total_size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=100_000)
+    args = parser.parse_args()
+
+    traffic = make_traffic(args.messages)
+
+    print(f'{args.messages} compile calls')
+    for codec_cls in (procpool.PickleCodec, ipc.CompilerCodec):
+        duration, size = run(codec_cls, traffic)
+        print(f'{codec_cls.__name__:>15}: '
+              f'{duration / len(traffic) * 1e6:7.2f} us/call, '
+              f'{size / len(traffic):8.1f} bytes/call')
+
+
+if __name__ == '__main__':
+    main()
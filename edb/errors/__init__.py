@@ -66,6 +66,8 @@ __all__ = base.__all__ + (
     'CardinalityViolationError',
     'MissingRequiredError',
     'TransactionError',
+    'QueryCancelledError',
+    'QueryTimeoutError',
     'ConfigurationError',
 )
 
@@ -298,5 +300,13 @@ class TransactionError(ExecutionError):
     _code = 0x_05_03_00_00
 
 
+class QueryCancelledError(ExecutionError):
+    _code = 0x_05_04_00_00
+
+
+class QueryTimeoutError(QueryCancelledError):
+    _code = 0x_05_04_00_01
+
+
 class ConfigurationError(EdgeDBError):
     _code = 0x_06_00_00_00
@@ -32,6 +32,12 @@ class ASTError(Exception):
     pass
 
 
+# Runtime type checking of field values and maintaining the parent
+# links of nodes; both are turned off by set_production_mode().
+_type_checks = __debug__
+_track_parents = True
+
+
 class Field:
     def __init__(
             self, name, type_, default, traverse, child_traverse=None,
@@ -149,6 +155,10 @@ class MetaAST(type):
                         field_child_traverse, field_hidden, field_meta)
 
         cls._fields = fields
+        # Fields that hold the children of a node, as opposed to
+        # meta fields, which hold annotations.
+        cls._nonmeta_fields = tuple(
+            name for name, field in fields.items() if not field.meta)
 
     def get_field(cls, name):
         return cls._fields.get(name)
@@ -161,10 +171,14 @@ class AST(object, metaclass=MetaAST):
         object.__setattr__(self, 'parent', None)
         self._init_fields(kwargs)
 
+        track_parents = _track_parents
+
         # XXX: use weakref here
         for arg, value in kwargs.items():
             if hasattr(self, arg):
-                if is_ast_node(value):
+                if not track_parents:
+                    continue
+                elif is_ast_node(value):
                     object.__setattr__(value, 'parent', self)
                 elif isinstance(value, list):
                     for v in value:
@@ -183,6 +197,7 @@ class AST(object, metaclass=MetaAST):
             object.__setattr__(self, 'parent', kwargs['parent'])
 
     def _init_fields(self, values):
+        type_checks = _type_checks
         for field_name, field in self.__class__._fields.items():
             if field_name in values:
                 value = values[field_name]
@@ -194,7 +209,7 @@ class AST(object, metaclass=MetaAST):
             else:
                 value = None
 
-            if __debug__:
+            if type_checks:
                 self.check_field_type(field, value)
 
             # Bypass overloaded setattr
@@ -220,6 +235,8 @@ class AST(object, metaclass=MetaAST):
             if field:
                 self.check_field_type(field, value)
 
+        _checked_setattr = __setattr__
+
     def check_field_type(self, field, value):
         def raise_error(field_type_name, value):
             raise TypeError(
@@ -247,6 +264,32 @@ class ImmutableASTMixin:
             super().__setattr__(name, value)
 
 
+def set_production_mode(enabled: bool=True):
+    """Turn runtime validation of AST nodes off (or back on).
+
+    In production mode the values of node fields are not type checked
+    and nodes do not set the "parent" links of their children; use
+    fix_parent_links() where those links are needed.  Field values are
+    never type checked when Python runs with -O.
+    """
+    global _type_checks, _track_parents
+
+    _type_checks = __debug__ and not enabled
+    _track_parents = not enabled
+
+    if __debug__:
+        # Rather than testing a flag on every attribute assignment,
+        # drop the checking __setattr__ altogether.
+        if _type_checks:
+            AST.__setattr__ = AST._checked_setattr
+        elif '__setattr__' in AST.__dict__:
+            del AST.__setattr__
+
+
+def is_in_production_mode() -> bool:
+    return not _track_parents
+
+
 @markup.serializer.serializer.register(AST)
 def _serialize_to_markup(ast, *, ctx):
     node = markup.elements.lang.TreeNode(id=id(ast), name=type(ast).__name__)
@@ -300,10 +343,9 @@ _marker = object()
 
 
 def iter_fields(node, *, include_meta=True, exclude_unset=False):
-    exclude_meta = not include_meta
-    for field_name, field in node._fields.items():
-        if exclude_meta and field.meta:
-            continue
+    fields = node._fields
+    for field_name in fields if include_meta else node._nonmeta_fields:
+        field = fields[field_name]
         field_val = getattr(node, field_name, _marker)
         if field_val is _marker:
             continue
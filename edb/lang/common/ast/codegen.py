@@ -37,10 +37,14 @@ class SourceGenerator(NodeVisitor):
         self.current_line = 1
         self.pretty = pretty
 
+    @classmethod
+    def _lookup_visitor(cls, node_cls):
+        # Code generators don't fall back to visitors of base classes.
+        method = 'visit_' + node_cls.__name__
+        return method if hasattr(cls, method) else None
+
     def node_visit(self, node):
-        method = 'visit_' + node.__class__.__name__
-        visitor = getattr(self, method, self.generic_visit)
-        return visitor(node)
+        return self._get_visitor(node)(node)
 
     def write(self, *x, delimiter=None):
         if self.new_lines:
@@ -113,8 +113,18 @@ class NodeVisitor:
     Don't use the `NodeVisitor` if you want to apply changes to nodes during
     traversing.  For this a special visitor exists (`NodeTransformer`) that
     allows modifications.
+
+    Visitor methods are looked up once per node class; adding visitor
+    methods to a visitor class after it has been used has no effect.
     """
 
+    # Names of visitor methods by node class, per visitor class.
+    _visitor_methods = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._visitor_methods = {}
+
     def __init__(self, *, context=None, memo=None):
         if memo is not None:
             self._memo = memo
@@ -147,19 +157,35 @@ class NodeVisitor:
         else:
             return result
 
+    @classmethod
+    def _lookup_visitor(cls, node_cls):
+        """Return the name of the visitor method for *node_cls*."""
+        for c in node_cls.__mro__:
+            method = 'visit_' + c.__name__
+            if getattr(cls, method, None) is not None:
+                return method
+        return None
+
+    def _get_visitor(self, node):
+        node_cls = node.__class__
+        try:
+            method = self._visitor_methods[node_cls]
+        except KeyError:
+            method = self._lookup_visitor(node_cls)
+            self._visitor_methods[node_cls] = method
+
+        if method is None:
+            return self.generic_visit
+        else:
+            return getattr(self, method)
+
     def node_visit(self, node):
         if node in self.memo:
             return self.repeated_node_visit(node)
         else:
             self.memo[node] = None
 
-        for cls in node.__class__.__mro__:
-            method = 'visit_' + cls.__name__
-            visitor = getattr(self, method, None)
-            if visitor is not None:
-                break
-        else:
-            visitor = self.generic_visit
+        visitor = self._get_visitor(node)
         result = visitor(node)
         self.memo[node] = result
         return result
@@ -173,7 +199,8 @@ class NodeVisitor:
     def generic_visit(self, node, *, combine_results=None):
         field_results = []
 
-        for field, value in base.iter_fields(node, include_meta=False):
+        for field in node._nonmeta_fields:
+            value = getattr(node, field, None)
             if typeutils.is_container(value):
                 for item in value:
                     if base.is_ast_node(item):
@@ -18,8 +18,11 @@
 
 
 import collections
+import collections.abc
 import re
 
+import immutables
+
 
 class ContextLevel:
     def on_pop(self, prevlevel):
@@ -74,6 +77,66 @@ class CompilerContext:
     current = property(_current)
 
 
+class PersistentDict(collections.abc.MutableMapping):
+    """A mutable mapping backed by an immutables.Map.
+
+    Context levels hand these down to child levels with copy(), which
+    is O(1): the copy shares the persistent map with the original, and
+    a write to either of them only replaces the map of that object.
+    """
+
+    __slots__ = ('_map',)
+
+    def __init__(self, *args, **kwargs):
+        self._map = immutables.Map(*map(_as_map_arg, args), **kwargs)
+
+    def __getitem__(self, key):
+        return self._map[key]
+
+    def __setitem__(self, key, value):
+        self._map = self._map.set(key, value)
+
+    def __delitem__(self, key):
+        self._map = self._map.delete(key)
+
+    def __contains__(self, key):
+        return key in self._map
+
+    def __iter__(self):
+        return iter(self._map)
+
+    def __len__(self):
+        return len(self._map)
+
+    def get(self, key, default=None):
+        return self._map.get(key, default)
+
+    def update(self, *args, **kwargs):
+        self._map = self._map.update(*map(_as_map_arg, args), **kwargs)
+
+    def clear(self):
+        self._map = immutables.Map()
+
+    def copy(self):
+        result = PersistentDict.__new__(PersistentDict)
+        result._map = self._map
+        return result
+
+    def __repr__(self):
+        return f'{type(self).__name__}({dict(self._map)!r})'
+
+
+def _as_map_arg(arg):
+    # immutables.Map only accepts dicts, Maps and iterables of pairs.
+    if isinstance(arg, PersistentDict):
+        return arg._map
+    elif (isinstance(arg, collections.abc.Mapping)
+            and not isinstance(arg, (dict, immutables.Map))):
+        return arg.items()
+    else:
+        return arg
+
+
 class Counter:
     def __init__(self):
         self.counts = collections.defaultdict(int)
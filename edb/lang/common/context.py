@@ -39,6 +39,8 @@ from edb.lang.common import typeutils
 
 
 class SourcePoint:
+    __slots__ = ('line', 'column', 'pointer')
+
     def __init__(self, line, column, pointer):
         self.line = line
         self.column = column
@@ -70,6 +70,34 @@ class Rule:
         return '<{} {} {!r}>'.format(self.id, self.token, self.regexp)
 
 
+def group_words(*words):
+    """Return a regexp matching any of the given whole *words*.
+
+    Unlike group(), which makes an alternative of every word, the
+    words are arranged in a prefix tree, so that a failed match
+    is rejected after looking at a character or two rather than
+    after trying every word in turn.
+    """
+    def _tree(words):
+        by_first = {}
+        for word in words:
+            by_first.setdefault(word[0], []).append(word[1:])
+
+        rx = []
+        for first, tails in sorted(by_first.items()):
+            rest = [tail for tail in tails if tail]
+            if not rest:
+                rx.append(re.escape(first))
+            else:
+                rx.append('{}(?:{}){}'.format(
+                    re.escape(first), _tree(rest),
+                    '?' if len(rest) < len(tails) else ''))
+
+        return '|'.join(rx)
+
+    return r'\b(?:' + _tree(set(words)) + r')\b'
+
+
 def group(*literals, _re_alpha=re.compile(r'^\w+$'), asbytes=False):
     rx = []
     for lit in literals:
@@ -94,31 +122,41 @@ class Lexer:
 
     def __init__(self):
         self.reset()
+        self.re_states = self._get_re_states()
+
+        if self.asbytes:
+            self._NL = b'\n'
+
+    @classmethod
+    def _get_re_states(cls):
+        # The rules are fixed per lexer class, so compile them once
+        # rather than for every lexer instance.
+        re_states = cls.__dict__.get('_re_states')
+        if re_states is not None:
+            return re_states
 
         re_states = {}
-        for state, rules in self.states.items():
+        for state, rules in cls.states.items():
             res = []
             for rule in rules:
-                if self.asbytes:
+                if cls.asbytes:
                     res.append(b'(?P<%b>%b)' % (rule.id.encode(), rule.regexp))
                 else:
                     res.append('(?P<{}>{})'.format(rule.id, rule.regexp))
 
-            if self.asbytes:
+            if cls.asbytes:
                 res.append(b'(?P<err>.)')
             else:
                 res.append('(?P<err>.)')
 
-            if self.asbytes:
+            if cls.asbytes:
                 full_re = b' | '.join(res)
             else:
                 full_re = ' | '.join(res)
-            re_states[state] = re.compile(full_re, self.RE_FLAGS)
+            re_states[state] = re.compile(full_re, cls.RE_FLAGS)
 
-        self.re_states = re_states
-
-        if self.asbytes:
-            self._NL = b'\n'
+        cls._re_states = re_states
+        return re_states
 
     def reset(self):
         self.lineno = 1
@@ -184,6 +222,9 @@ class Lexer:
         if start_tok is not None:
             yield start_tok
 
+        rules = Rule._map
+        token_from_text = self.token_from_text
+
         while self.start < self.end:
             for match in self.re_states[self._state].finditer(src, self.start):
                 rule_id = match.lastgroup
@@ -194,12 +235,9 @@ class Lexer:
                     # Error group -- no rule has been matched
                     self.handle_error(txt)
 
-                rule = Rule._map[rule_id]
-                rule_token = rule.token
-
-                token = self.token_from_text(rule_token, txt)
+                rule = rules[rule_id]
 
-                yield token
+                yield token_from_text(rule.token, txt)
 
                 if rule.next_state and rule.next_state != self._state:
                     # Rule dictates that the lexer state should be
@@ -40,13 +40,16 @@ class LRUMapping(collections.abc.MutableMapping):
     # entries dict, whereas the unused one will group in the
     # beginning of it.
 
-    def __init__(self, *, maxsize):
+    def __init__(self, *, maxsize, on_evict=None):
         if maxsize <= 0:
             raise ValueError(
                 f'maxsize is expected to be greater than 0, got {maxsize}')
 
         self._dict = collections.OrderedDict()
         self._maxsize = maxsize
+        # Called with the key and the value of every entry removed
+        # to maintain `maxsize`.
+        self._on_evict = on_evict
 
     def __getitem__(self, key):
         o = self._dict[key]
@@ -60,7 +63,9 @@ class LRUMapping(collections.abc.MutableMapping):
         else:
             self._dict[key] = o
             if len(self._dict) > self._maxsize:
-                self._dict.popitem(last=False)
+                evicted = self._dict.popitem(last=False)
+                if self._on_evict is not None:
+                    self._on_evict(*evicted)
 
     def __delitem__(self, key):
         del self._dict[key]
@@ -232,8 +232,8 @@ class ContextLevel(compiler.ContextLevel):
             self.env = None
             self.derived_target_module = None
             self.aliases = compiler.AliasGenerator()
-            self.anchors = {}
-            self.modaliases = {}
+            self.anchors = compiler.PersistentDict()
+            self.modaliases = compiler.PersistentDict()
             self.func = None
             self.all_sets = []
             self.stmt_metadata = {}
@@ -244,10 +244,10 @@ class ContextLevel(compiler.ContextLevel):
             self.source_map = {}
             self.view_nodes = {}
             self.view_sets = {}
-            self.aliased_views = collections.ChainMap()
+            self.aliased_views = compiler.PersistentDict()
             self.expr_view_cache = {}
             self.shape_type_cache = {}
-            self.class_view_overrides = {}
+            self.class_view_overrides = compiler.PersistentDict()
 
             self.clause = None
             self.toplevel_clause = None
@@ -256,7 +256,7 @@ class ContextLevel(compiler.ContextLevel):
             self.path_id_namespace = frozenset()
             self.pending_stmt_own_path_id_namespace = frozenset()
             self.pending_stmt_full_path_id_namespace = frozenset()
-            self.view_map = collections.ChainMap()
+            self.view_map = compiler.PersistentDict()
             self.class_shapes = collections.defaultdict(list)
             self.path_scope = None
             self.path_scope_is_temp = False
@@ -310,7 +310,7 @@ class ContextLevel(compiler.ContextLevel):
             if mode == ContextSwitchMode.SUBQUERY:
                 self.anchors = prevlevel.anchors.copy()
                 self.modaliases = prevlevel.modaliases.copy()
-                self.aliased_views = prevlevel.aliased_views.new_child()
+                self.aliased_views = prevlevel.aliased_views.copy()
                 self.class_view_overrides = \
                     prevlevel.class_view_overrides.copy()
 
@@ -330,8 +330,8 @@ class ContextLevel(compiler.ContextLevel):
             elif mode == ContextSwitchMode.DETACHED:
                 self.anchors = prevlevel.anchors.copy()
                 self.modaliases = prevlevel.modaliases.copy()
-                self.aliased_views = collections.ChainMap()
-                self.class_view_overrides = {}
+                self.aliased_views = compiler.PersistentDict()
+                self.class_view_overrides = compiler.PersistentDict()
                 self.expr_exposed = prevlevel.expr_exposed
 
                 self.view_nodes = {}
@@ -26,6 +26,7 @@ import typing
 
 from edb import errors
 
+from edb.lang.common import compiler
 from edb.lang.common import parsing
 
 from edb.lang.ir import ast as irast
@@ -754,18 +755,18 @@ def _get_computable_ctx(
     @contextlib.contextmanager
     def newctx():
         with ctx.new() as subctx:
-            subctx.class_view_overrides = {}
+            subctx.class_view_overrides = compiler.PersistentDict()
             subctx.partial_path_prefix = None
 
             subctx.modaliases = qlctx.modaliases.copy()
-            subctx.aliased_views = qlctx.aliased_views.new_child()
+            subctx.aliased_views = qlctx.aliased_views.copy()
             if source_scls.is_view(ctx.env.schema):
                 scls_name = source.stype.get_name(ctx.env.schema)
                 subctx.aliased_views[scls_name] = None
             subctx.source_map = qlctx.source_map.copy()
             subctx.view_nodes = qlctx.view_nodes.copy()
             subctx.view_sets = qlctx.view_sets.copy()
-            subctx.view_map = qlctx.view_map.new_child()
+            subctx.view_map = qlctx.view_map.copy()
 
             source_scope = pathctx.get_set_scope(rptr.source, ctx=ctx)
             if source_scope and source_scope.namespaces:
@@ -55,7 +55,7 @@ def compile_SelectQuery(
         # Compile implicit "SELECT Path" as "Path"
         with ctx.new() as sctx:
             process_with_block(expr, ctx=sctx, parent_ctx=ctx)
-            sctx.aliased_views = ctx.aliased_views.new_child()
+            sctx.aliased_views = ctx.aliased_views.copy()
             sctx.modaliases = ctx.modaliases.copy()
             sctx.anchors = ctx.anchors.copy()
             result = compile_result_clause(
@@ -25,6 +25,7 @@ import typing
 
 from edb import errors
 
+from edb.lang.common import compiler
 from edb.lang.common import parsing
 
 from edb.lang.ir import ast as irast
@@ -231,7 +232,7 @@ def compile_anchor(
     elif isinstance(anchor, qlast.SubExpr):
         with ctx.new() as subctx:
             if anchor.anchors:
-                subctx.anchors = {}
+                subctx.anchors = compiler.PersistentDict()
                 populate_anchors(anchor.anchors, ctx=subctx)
 
             step = compile_anchor(name, anchor.expr, ctx=subctx)
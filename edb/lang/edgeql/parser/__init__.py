@@ -21,9 +21,25 @@ from .parser import EdgeQLExpressionParser, EdgeQLBlockParser
 from .. import ast as qlast
 
 
+# Idle parsers by parser class.  Setting up a parser and its lexer
+# is expensive compared to parsing a typical query, so parsers are
+# reused.  A parser is taken out of the pool while it is running,
+# which keeps nested parsing (e.g. from within a grammar reduction)
+# safe.
+_parsers = {}
+
+
+def _parse(parser_cls, expr):
+    pool = _parsers.setdefault(parser_cls, [])
+    parser = pool.pop() if pool else parser_cls()
+    try:
+        return parser.parse(expr)
+    finally:
+        pool.append(parser)
+
+
 def parse_fragment(expr):
-    parser = EdgeQLExpressionParser()
-    return parser.parse(expr)
+    return _parse(EdgeQLExpressionParser, expr)
 
 
 def append_module_aliases(tree, aliases):
@@ -53,5 +69,4 @@ def parse(expr, module_aliases=None):
 
 
 def parse_block(expr):
-    parser = EdgeQLBlockParser()
-    return parser.parse(expr)
+    return _parse(EdgeQLBlockParser, expr)
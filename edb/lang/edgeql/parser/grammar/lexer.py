@@ -46,11 +46,11 @@ class EdgeQLLexer(lexer.Lexer):
     MULTILINE_TOKENS = frozenset(('SCONST', 'BCONST', 'RSCONST'))
     RE_FLAGS = re.X | re.M | re.I
 
-    # Basic keywords
-    keyword_rules = [Rule(token=tok[0],
+    # Basic keywords.  All of them are matched by a single rule, the
+    # actual token is looked up in token_from_text().
+    keyword_rules = [Rule(token='KEYWORD',
                           next_state=STATE_KEEP,
-                          regexp=lexer.group(val))
-                     for val, tok in edgeql_keywords.items()]
+                          regexp=lexer.group_words(*edgeql_keywords))]
 
     common_rules = keyword_rules + [
         Rule(token='WS',
@@ -220,7 +220,9 @@ class EdgeQLLexer(lexer.Lexer):
         self._long_token_match = {x[1]: x[0] for x in self.MERGE_TOKENS}
 
     def token_from_text(self, rule_token, txt):
-        if rule_token == 'BADSCONST':
+        if rule_token == 'KEYWORD':
+            rule_token = self._keyword_token(txt)
+        elif rule_token == 'BADSCONST':
             raise lexer.UnknownTokenError(
                 f"Unterminated string {txt}",
                 line=self.lineno, col=self.column, filename=self.filename)
@@ -237,6 +239,17 @@ class EdgeQLLexer(lexer.Lexer):
 
         return tok
 
+    def _keyword_token(self, txt):
+        try:
+            return edgeql_keywords[txt.lower()][0]
+        except KeyError:
+            # Case-insensitive matching of the keyword regexp folds
+            # a few non-ASCII characters that lower() does not.
+            for val, tok in edgeql_keywords.items():
+                if re.fullmatch(val, txt, re.I):
+                    return tok[0]
+            raise
+
     def lex(self):
         buffer = []
 
@@ -19,6 +19,7 @@
 
 from collections import namedtuple
 from graphql import graphql as gql_proc, GraphQLString, GraphQLID
+import copy
 import json
 import re
 
@@ -26,6 +27,7 @@ from edb import errors
 
 from edb.lang import edgeql
 from edb.lang.common import ast
+from edb.lang.common import lru
 from edb.lang.common import typeutils
 from edb.lang.edgeql import ast as qlast
 from edb.lang.graphql import ast as gqlast, parser as gqlparser
@@ -48,6 +50,17 @@ class GraphQLTranslatorContext:
         self.include_base = [False]
         self.gqlcore = gqlcore
         self.query = query
+        # Set if the results of introspection are embedded into
+        # the translated query.
+        self.has_introspection = False
+
+
+# The maximum number of GQLCoreSchema objects to keep around.
+GQLCORE_CACHE_SIZE = 16
+
+# The maximum number of translated GraphQL operations to keep around
+# per schema.
+TRANSLATION_CACHE_SIZE = 1000
 
 
 Step = namedtuple('Step', ['name', 'type'])
@@ -123,6 +136,7 @@ class GraphQLTranslator(ast.NodeVisitor):
                 name = el.expr.steps[0].ptr.name
                 el.compexpr.args[0].arg = qlast.StringConstant.from_python(
                     json.dumps(gqlresult.data[name], indent=4))
+                self._context.has_introspection = True
 
         return translated
 
@@ -198,9 +212,7 @@ class GraphQLTranslator(ast.NodeVisitor):
                         if a.name == 'if'][0]
 
                 if isinstance(cond, gqlast.Variable):
-                    var = self._context.vars[cond.value]
-                    cond = var[0]
-                    var[1] = True  # mark the variable as critical
+                    cond = self._get_critical_value(cond)
 
                 if not isinstance(cond, gqlast.BooleanLiteral):
                     raise g_errors.GraphQLValidationError(
@@ -215,6 +227,13 @@ class GraphQLTranslator(ast.NodeVisitor):
 
         return True
 
+    def _get_critical_value(self, var):
+        # The value of the variable affects the shape of the query,
+        # so it is inlined and the variable is marked as critical.
+        var = self._context.vars[var.value]
+        var[1] = True
+        return var[0]
+
     def visit_VariableDefinition(self, node):
         variables = self._context.vars
         if not variables.get(node.name):
@@ -476,26 +495,33 @@ class GraphQLTranslator(ast.NodeVisitor):
         first = last = before = after = None
 
         for arg in arguments:
+            value = arg.value
+            if (arg.name in {'first', 'last', 'before', 'after'} and
+                    isinstance(value, gqlast.Variable)):
+                # Pagination is translated into constant OFFSET
+                # and LIMIT values.
+                value = self._get_critical_value(value)
+
             try:
                 if arg.name == 'filter':
                     where = self.visit(arg.value)
                 elif arg.name == 'order':
                     orderby = self.visit_order(arg.value)
                 elif arg.name == 'first':
-                    first = int(arg.value.value)
+                    first = int(value.value)
                     if first < 0:
                         raise ValueError(f"{arg.name!r} cannot be negative")
                 elif arg.name == 'last':
-                    last = int(arg.value.value)
+                    last = int(value.value)
                     last_context = arg.context
                     if last < 0:
                         raise ValueError(f"{arg.name!r} cannot be negative")
                 elif arg.name == 'before':
-                    before = int(arg.value.value)
+                    before = int(value.value)
                     if before < 0:
                         raise ValueError(f"{arg.name!r} cannot be negative")
                 elif arg.name == 'after':
-                    after = int(arg.value.value)
+                    after = int(value.value)
                     if after < 0:
                         raise ValueError(f"{arg.name!r} cannot be negative")
                     # The +1 is to make 'after' into an appropriate index.
@@ -727,17 +753,95 @@ class GraphQLTranslator(ast.NodeVisitor):
             return results
 
 
-def translate(schema, graphql, *, variables=None, operation_name=None):
+# Building a GQLCoreSchema reflects every object type of the schema,
+# so it is done once per schema.  Schemas are immutable, and so are
+# the GraphQL types reflecting them.  The cache is keyed on the
+# schema object; entries cannot be weak, as a GQLCoreSchema refers
+# to its schema.
+_gqlcore_cache = lru.LRUMapping(maxsize=GQLCORE_CACHE_SIZE)
+
+
+def _get_gqlcore(schema):
+    try:
+        return _gqlcore_cache[schema]
+    except KeyError:
+        gqlcore = _gqlcore_cache[schema] = gt.GQLCoreSchema(schema)
+        return gqlcore
+
+
+class _TranslationCache:
+    """Translations of GraphQL documents against one schema."""
+
+    def __init__(self):
+        # Translated operations, keyed on the document, the name of
+        # the operation and the values of critical variables: the
+        # other variables are passed to EdgeQL as query parameters,
+        # so they do not affect the translation.
+        self.translations = lru.LRUMapping(maxsize=TRANSLATION_CACHE_SIZE)
+
+        # The names of the critical variables of documents seen so
+        # far, keyed on the document and the name of the operation.
+        # The set can only grow: variables that turn out to be
+        # critical for some values of other variables are added as
+        # they are discovered.
+        self.critical_variables = lru.LRUMapping(
+            maxsize=TRANSLATION_CACHE_SIZE)
+
+
+# Translation caches keyed on the schema.  Like GQLCoreSchemas, they
+# are kept for a limited number of schemas, so that old versions of
+# the schema are not kept alive by the cached translations.
+_translation_caches = lru.LRUMapping(maxsize=GQLCORE_CACHE_SIZE)
+
+
+def _get_translation_cache(schema):
+    try:
+        return _translation_caches[schema]
+    except KeyError:
+        cache = _translation_caches[schema] = _TranslationCache()
+        return cache
+
+
+def _translate(schema, graphql, *, variables, operation_name):
     if variables is None:
         variables = {}
 
+    cache = _get_translation_cache(schema)
+    doc_key = (graphql, operation_name)
+    critnames = cache.critical_variables.get(doc_key, ())
+    key = doc_key + (tuple(variables.get(n) for n in critnames),)
+    try:
+        forest = cache.translations.get(key)
+    except TypeError:
+        # Variables of unhashable types are never critical.
+        key = forest = None
+
+    if forest is None:
+        forest, cacheable = _translate_document(
+            schema, graphql,
+            variables=variables, operation_name=operation_name)
+
+        if cacheable and key is not None:
+            found = {name for _, (_, critvars) in forest
+                     for name, _ in critvars}
+            if found.issubset(critnames):
+                cache.translations[key] = forest
+            else:
+                cache.critical_variables[doc_key] = tuple(
+                    sorted(found.union(critnames)))
+
+    # The compiler may modify the trees.
+    return copy.deepcopy(forest)
+
+
+def _translate_document(schema, graphql, *, variables, operation_name):
     gql_vars = {}
     for n, v in variables.items():
         gql_vars[n] = gqlast.BaseLiteral.from_python(v)
 
     # HACK
     query = re.sub(r'@edgedb\(.*?\)', '', graphql)
-    gqlcore = gt.GQLCoreSchema(schema)
+    gqlcore = _get_gqlcore(schema)
 
     parser = gqlparser.GraphQLParser()
     gqltree = parser.parse(graphql)
@@ -745,8 +849,17 @@ def translate(schema, graphql, *, variables=None, operation_name=None):
         schema=schema, gqlcore=gqlcore, query=query,
         variables=gql_vars, operation_name=operation_name)
     edge_forest_map = GraphQLTranslator(context=context).visit(gqltree)
+
+    # Results of introspection can depend on any variable.
+    cacheable = not context.has_introspection
+    return sorted(edge_forest_map.items()), cacheable
+
+
+def translate(schema, graphql, *, variables=None, operation_name=None):
     code = []
-    for name, (tree, critvars) in sorted(edge_forest_map.items()):
+    for name, (tree, critvars) in _translate(
+            schema, graphql,
+            variables=variables, operation_name=operation_name):
         if name:
             code.append(f'# {name}')
         if critvars:
@@ -755,3 +868,17 @@ def translate(schema, graphql, *, variables=None, operation_name=None):
         code += [edgeql.generate_source(tree), ';']
 
     return '\n'.join(code)
+
+
+def translate_ast(schema, graphql, *, variables=None, operation_name=None):
+    """Translate a GraphQL document into a list of EdgeQL statements.
+
+    This is what translate() does, but the EdgeQL ASTs are returned
+    as is, so that they can be compiled without being rendered to
+    EdgeQL source and parsed back.
+    """
+    return [
+        tree for _, (tree, _) in _translate(
+            schema, graphql,
+            variables=variables, operation_name=operation_name)
+    ]
@@ -24,12 +24,20 @@ from edb.lang.schema import scalars as s_scalars
 
 
 class PathId:
-    """Unique identifier of a path in an expression."""
+    """Unique identifier of a path in an expression.
+
+    PathIds are used as keys all over the compilers, so the hash of
+    a PathId and its prefixes are computed once and cached.  PathIds
+    must not be modified after they have been constructed.
+    """
 
     __slots__ = ('_path', '_norm_path', '_namespace', '_prefix',
-                 '_is_ptr', '_is_linkprop')
+                 '_is_ptr', '_is_linkprop', '_hash', '_prefixes')
 
     def __init__(self, initializer=None, *, namespace=None, typename=None):
+        self._hash = None
+        self._prefixes = None
+
         if isinstance(initializer, PathId):
             self._path = initializer._path
             self._norm_path = initializer._norm_path
@@ -64,14 +72,22 @@ class PathId:
         return pid
 
     def __hash__(self):
-        return hash((
-            self.__class__, self._norm_path,
-            self._namespace, self._prefix, self._is_ptr))
+        if self._hash is None:
+            self._hash = hash((
+                self.__class__, self._norm_path,
+                self._namespace, self._prefix, self._is_ptr))
+        return self._hash
 
     def __eq__(self, other):
+        if self is other:
+            return True
+
         if not isinstance(other, PathId):
             return NotImplemented
 
+        if hash(self) != hash(other):
+            return False
+
         return (
             self._norm_path == other._norm_path and
             self._namespace == other._namespace and
@@ -82,6 +98,14 @@ class PathId:
     def __len__(self):
         return len(self._path)
 
+    def namespace_free_key(self):
+        """Return a key that ignores the namespaces of this PathId.
+
+        PathIds that are equal once their namespaces (or the namespaces
+        of their prefixes) are stripped have equal keys.
+        """
+        return (self._norm_path, self._is_ptr)
+
     def get_prefix(self, size):
         # Validate that slicing results in a
         # valid PathId, it must not produce a path ending
@@ -298,6 +322,18 @@ class PathId:
             return result
 
     def iter_prefixes(self, include_ptr=False):
+        if self._prefixes is None:
+            self._prefixes = {}
+
+        try:
+            prefixes = self._prefixes[include_ptr]
+        except KeyError:
+            prefixes = self._prefixes[include_ptr] = tuple(
+                self._iter_prefixes(include_ptr))
+
+        return iter(prefixes)
+
+    def _iter_prefixes(self, include_ptr):
         if self._prefix is not None:
             yield from self._prefix.iter_prefixes(include_ptr=include_ptr)
             start = len(self._prefix)
@@ -68,8 +68,8 @@ class ScopeTreeNode:
 
     def __init__(self, *, path_id: typing.Optional[pathid.PathId]=None,
                  fenced: bool=False, unique_id: typing.Optional[int]=None):
-        self.unique_id = unique_id
-        self.path_id = path_id
+        self._unique_id = unique_id
+        self._path_id = path_id
         self.fenced = fenced
         self.protect_parent = False
         self.unnest_fence = False
@@ -77,6 +77,39 @@ class ScopeTreeNode:
         self.children = set()
         self.namespaces = set()
         self._parent = None
+        # Path children by the namespace-free key of their path id.
+        self._path_children = {}
+        # The number of strict descendants with a path id by the
+        # namespace-free key of the path id; lookups skip subtrees
+        # that have no candidates.
+        self._descendant_keys = {}
+        # Descendants by unique_id; only maintained for root nodes
+        # and dropped whenever the tree changes.
+        self._unique_id_index = None
+
+    @property
+    def unique_id(self) -> typing.Optional[int]:
+        return self._unique_id
+
+    @unique_id.setter
+    def unique_id(self, unique_id: typing.Optional[int]) -> None:
+        self._unique_id = unique_id
+        self._tree_changed()
+
+    @property
+    def path_id(self) -> typing.Optional[pathid.PathId]:
+        return self._path_id
+
+    @path_id.setter
+    def path_id(self, path_id: typing.Optional[pathid.PathId]) -> None:
+        parent = self.parent
+        if parent is not None:
+            parent._unindex_child(self)
+            parent._count_descendant_keys(self._own_key_counts(), -1)
+        self._path_id = path_id
+        if parent is not None:
+            parent._index_child(self)
+            parent._count_descendant_keys(self._own_key_counts(), 1)
 
     def __repr__(self):
         return (f'<{type(self).__name__} '
@@ -261,10 +294,9 @@ class ScopeTreeNode:
         performed.  For safe tree modification, use attach_subtree()""
         """
         if node.path_id is not None:
-            for child in self.children:
-                if child.path_id == node.path_id:
-                    raise InvalidScopeConfiguration(
-                        f'{node.path_id} is already present in {self!r}')
+            if self.find_child(node.path_id) is not None:
+                raise InvalidScopeConfiguration(
+                    f'{node.path_id} is already present in {self!r}')
 
         node._set_parent(self)
 
@@ -400,7 +432,8 @@ class ScopeTreeNode:
 
         matching = set()
 
-        for node in self.descendants:
+        key = path_id.namespace_free_key()
+        for node in self._keyed_descendants(key, fenced=True):
             if _paths_equal_to_shortest_ns(node.path_id, path_id):
                 matching.add(node)
 
@@ -470,11 +503,13 @@ class ScopeTreeNode:
         """Find the visible node with the given *path_id*."""
         namespaces = set()
 
+        key = path_id.namespace_free_key()
+
         for node, ans in self.ancestors_and_namespaces:
             if _paths_equal(node.path_id, path_id, namespaces):
                 return node
 
-            for child in node.children:
+            for child in node._path_children.get(key, ()):
                 if _paths_equal(child.path_id, path_id, namespaces):
                     return child
 
@@ -494,7 +529,8 @@ class ScopeTreeNode:
 
     def find_child(self, path_id: pathid.PathId) \
             -> typing.Optional['ScopeTreeNode']:
-        for child in self.children:
+        children = self._path_children.get(path_id.namespace_free_key(), ())
+        for child in children:
             if child.path_id == path_id:
                 return child
 
@@ -502,17 +538,15 @@ class ScopeTreeNode:
 
     def find_descendant(self, path_id: pathid.PathId) \
             -> typing.Optional['ScopeTreeNode']:
-        for descendant, dns in self.strict_descendants_and_namespaces:
-            if _paths_equal(descendant.path_id, path_id, dns):
-                return descendant
-
-        return None
+        descendant, _ = self.find_descendant_and_ns(path_id)
+        return descendant
 
     def find_descendant_and_ns(self, path_id: pathid.PathId) \
             -> typing.Tuple[
                 typing.Optional['ScopeTreeNode'],
                 typing.FrozenSet[str]]:
-        for descendant, dns in self.strict_descendants_and_namespaces:
+        key = path_id.namespace_free_key()
+        for descendant, dns in self._keyed_descendants_and_namespaces(key):
             if _paths_equal(descendant.path_id, path_id, dns):
                 return descendant, dns
 
@@ -524,8 +558,10 @@ class ScopeTreeNode:
         namespaces = set()
         unnest_fence_seen = False
 
+        key = path_id.namespace_free_key()
+
         for node, ans in self.ancestors_and_namespaces:
-            for descendant in node.unfenced_descendants:
+            for descendant in node._keyed_descendants(key, fenced=False):
                 if _paths_equal(descendant.path_id, path_id, namespaces):
                     return descendant, unnest_fence_seen
 
@@ -536,11 +572,23 @@ class ScopeTreeNode:
 
     def find_by_unique_id(self, unique_id: int) \
             -> typing.Optional['ScopeTreeNode']:
-        for node in self.descendants:
-            if node.unique_id == unique_id:
-                return node
+        if self.parent is not None:
+            for node in self.descendants:
+                if node.unique_id == unique_id:
+                    return node
 
-        return None
+            return None
+
+        # Lookups are normally done from the root of the tree,
+        # so the root keeps an index of its descendants.
+        if self._unique_id_index is None:
+            index = {}
+            for node in self.descendants:
+                if node.unique_id is not None:
+                    index.setdefault(node.unique_id, node)
+            self._unique_id_index = index
+
+        return self._unique_id_index.get(unique_id)
 
     def copy(self) -> 'ScopeTreeNode':
         """Return a complete copy of this subtree."""
@@ -586,19 +634,100 @@ class ScopeTreeNode:
         if current_parent is not None:
             # Make sure no other node refers to us.
             current_parent.children.remove(self)
+            current_parent._unindex_child(self)
+            current_parent._tree_changed()
 
         if parent is not None:
             self._parent = weakref.ref(parent)
             parent.children.add(self)
+            parent._index_child(self)
+            parent._tree_changed()
         else:
             self._parent = None
 
+        if current_parent is not None or parent is not None:
+            counts = self._own_key_counts()
+            counts.extend(self._descendant_keys.items())
+            if current_parent is not None:
+                current_parent._count_descendant_keys(counts, -1)
+            if parent is not None:
+                parent._count_descendant_keys(counts, 1)
+
+        self._unique_id_index = None
+
+    def _index_child(self, child):
+        if child.path_id is not None:
+            key = child.path_id.namespace_free_key()
+            self._path_children.setdefault(key, set()).add(child)
+
+    def _unindex_child(self, child):
+        if child.path_id is not None:
+            key = child.path_id.namespace_free_key()
+            children = self._path_children[key]
+            children.discard(child)
+            if not children:
+                del self._path_children[key]
+
+    def _tree_changed(self):
+        self.root._unique_id_index = None
+
+    def _own_key_counts(self):
+        if self.path_id is None:
+            return []
+        else:
+            return [(self.path_id.namespace_free_key(), 1)]
+
+    def _count_descendant_keys(self, counts, sign):
+        # Add (sign=1) or subtract (sign=-1) the *counts* of path
+        # keys to the descendant keys of this node and its ancestors.
+        if not counts:
+            return
+        for node in self.ancestors:
+            keys = node._descendant_keys
+            for key, n in counts:
+                n = keys.get(key, 0) + sign * n
+                if n:
+                    keys[key] = n
+                else:
+                    del keys[key]
+
+    def _keyed_descendants(self, key, *, fenced):
+        """Descendants including self whose path id has *key*.
+
+        Same as descendants, or unfenced_descendants if *fenced*
+        is False, filtered by the namespace-free key.
+        """
+        if (self.path_id is not None and
+                self.path_id.namespace_free_key() == key):
+            yield self
+        if key not in self._descendant_keys:
+            return
+        for child in tuple(self.children):
+            if fenced or not child.fenced:
+                yield from child._keyed_descendants(key, fenced=fenced)
+
+    def _keyed_descendants_and_namespaces(self, key):
+        """Same as strict_descendants_and_namespaces filtered by *key*."""
+        if key not in self._descendant_keys:
+            return
+        for child in tuple(self.children):
+            if (child.path_id is not None and
+                    child.path_id.namespace_free_key() == key):
+                yield child, child.namespaces
+            desc_ns = child._keyed_descendants_and_namespaces(key)
+            for desc, desc_namespaces in desc_ns:
+                yield desc, child.namespaces | desc_namespaces
+
 
 def _paths_equal(path_id_1: pathid.PathId, path_id_2: pathid.PathId,
                  namespaces: typing.Set[str]) -> bool:
     if path_id_1 is None or path_id_2 is None:
         return False
 
+    if path_id_1.namespace_free_key() != path_id_2.namespace_free_key():
+        # Stripping namespaces won't make these equal.
+        return False
+
     if namespaces:
         path_id_1 = path_id_1.strip_namespace(namespaces)
         path_id_2 = path_id_2.strip_namespace(namespaces)
@@ -611,6 +740,9 @@ def _paths_equal_to_shortest_ns(path_id_1: pathid.PathId,
     if path_id_1 is None or path_id_2 is None:
         return False
 
+    if path_id_1.namespace_free_key() != path_id_2.namespace_free_key():
+        return False
+
     ns1 = path_id_1.namespace or set()
     ns2 = path_id_2.namespace or set()
 
@@ -17,13 +17,18 @@
 #
 
 
+import collections.abc
+import enum
 import functools
+import hashlib
 import itertools
 import typing
+import uuid
 
 import immutables as immu
 
 from edb import errors
+from edb.lang.common import context as pctx
 
 from . import casts as s_casts
 from . import functions as s_func
@@ -41,6 +46,87 @@ STD_MODULES = {'std', 'schema', 'stdgraphql', 'math'}
 _void = object()
 
 
+class SchemaDelta(typing.NamedTuple):
+    """The difference between two versions of a schema.
+
+    Every field is either None, if the corresponding schema index
+    is unchanged, or an (updates, deletions) pair.
+    """
+
+    modules: typing.Optional[tuple]
+    id_to_data: typing.Optional[tuple]
+    id_to_type: typing.Optional[tuple]
+    name_to_id: typing.Optional[tuple]
+    shortname_to_id: typing.Optional[tuple]
+    refs_to: typing.Optional[tuple]
+
+
+def _diff_map(new: immu.Map, base: immu.Map):
+    if new is base:
+        return None
+
+    updates = {k: v for k, v in new.items() if base.get(k, _void) is not v}
+    deletions = tuple(k for k in base if k not in new)
+
+    if not updates and not deletions:
+        return None
+
+    return updates, deletions
+
+
+def _patch_map(base: immu.Map, diff):
+    updates, deletions = diff
+    with base.mutate() as mm:
+        for k in deletions:
+            del mm[k]
+        for k, v in updates.items():
+            mm[k] = v
+        return mm.finish()
+
+
+def _hash_value(h, value):
+    if value is None or isinstance(value, (bool, int, float)):
+        h.update(repr(value).encode())
+    elif isinstance(value, str):
+        h.update(type(value).__name__.encode())
+        h.update(value.encode())
+    elif isinstance(value, enum.Enum):
+        h.update(str(value).encode())
+    elif isinstance(value, uuid.UUID):
+        h.update(value.bytes)
+    elif isinstance(value, so.ObjectRef):
+        h.update(b'ref')
+        h.update(value.name.encode())
+    elif isinstance(value, so.Object):
+        h.update(type(value).__name__.encode())
+        h.update(value.id.bytes)
+    elif isinstance(value, so.ObjectCollection):
+        h.update(type(value).__name__.encode())
+        _hash_value(h, value._ids)
+    elif isinstance(value, (immu.Map, collections.abc.Mapping)):
+        for k in sorted(value, key=str):
+            _hash_value(h, k)
+            _hash_value(h, value[k])
+    elif isinstance(value, collections.abc.Set):
+        for item in sorted(value, key=str):
+            _hash_value(h, item)
+    elif isinstance(value, collections.abc.Sequence):
+        h.update(b'(')
+        for item in value:
+            _hash_value(h, item)
+        h.update(b')')
+    elif isinstance(value, pctx.ParserContext):
+        # Source positions do not affect the semantics of the schema.
+        pass
+    else:
+        raise TypeError(f'cannot fingerprint {type(value).__name__!r}')
+
+
+def _is_introspectable(mcls, field_name):
+    field = mcls.get_field(field_name)
+    return field is None or field.introspectable
+
+
 class Schema:
 
     def __init__(self):
@@ -582,6 +668,59 @@ class Schema:
     def get_objects(self, *, modules=None, type=None):
         return SchemaIterator(self, modules=modules, type=type)
 
+    def get_delta(self, base: 'Schema') -> SchemaDelta:
+        """Compute the difference between *base* and this schema.
+
+        Applying the returned delta to *base* with apply_delta()
+        produces a schema equivalent to this one.  Since both schemas
+        are normally derived from the same ancestor, unchanged entries
+        are shared and the delta is proportional to the changes.
+        """
+        return SchemaDelta(
+            modules=_diff_map(self._modules, base._modules),
+            id_to_data=_diff_map(self._id_to_data, base._id_to_data),
+            id_to_type=_diff_map(self._id_to_type, base._id_to_type),
+            name_to_id=_diff_map(self._name_to_id, base._name_to_id),
+            shortname_to_id=_diff_map(
+                self._shortname_to_id, base._shortname_to_id),
+            refs_to=_diff_map(self._refs_to, base._refs_to),
+        )
+
+    def apply_delta(self, delta: SchemaDelta) -> 'Schema':
+        updates = {}
+        for field, diff in delta._asdict().items():
+            if diff is not None:
+                updates[field] = _patch_map(getattr(self, f'_{field}'), diff)
+        if not updates:
+            return self
+        return self._replace(**updates)
+
+    def get_fingerprint(self, base: 'Schema') -> bytes:
+        """Return a digest of the difference between *base* and this schema.
+
+        The digest does not depend on the identity of schema objects
+        or on the process computing it, so schemas introspected by
+        different processes have the same fingerprint.  Fields that
+        are not introspectable (e.g. the commands of a migration) are
+        not part of the digest, as introspected schemas lack them.
+        """
+        h = hashlib.sha1()
+        diff = _diff_map(self._id_to_data, base._id_to_data)
+        if diff is not None:
+            updates, deletions = diff
+            for obj_id in sorted(updates):
+                mcls = type(self._id_to_type[obj_id])
+                h.update(obj_id.bytes)
+                h.update(mcls.__name__.encode())
+                _hash_value(h, {
+                    fn: v for fn, v in updates[obj_id].items()
+                    if _is_introspectable(mcls, fn)
+                })
+            for obj_id in sorted(deletions):
+                h.update(b'-')
+                h.update(obj_id.bytes)
+        return h.digest()
+
     def __repr__(self):
         return (
             f'<{type(self).__name__} gen:{self._generation} at {id(self):#x}>')
@@ -116,11 +116,45 @@ def _sd_notify(message):
 
 
 def _run_server(cluster, args, runstate_dir):
-    loop = asyncio.get_event_loop()
-    srv = None
-
     _init_cluster(cluster, args)
 
+    nprocs = args['frontend_processes']
+    if nprocs > 1:
+        _run_frontends(cluster, args, runstate_dir, nprocs)
+    else:
+        _serve(cluster, args, runstate_dir, loop=asyncio.get_event_loop())
+
+
+def _run_frontends(cluster, args, runstate_dir, nprocs):
+    def frontend_main(frontend_id, supervisor_sock):
+        setproctitle.setproctitle(
+            'edgedb-server-{}-frontend-{}'.format(args['port'], frontend_id))
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            _serve(cluster, args, runstate_dir, loop=loop,
+                   frontend_id=frontend_id, nprocs=nprocs,
+                   supervisor_sock=supervisor_sock)
+        finally:
+            loop.close()
+        return 0
+
+    sv = server2.supervisor.Supervisor(nprocs, frontend_main)
+    logger.info('Starting %d front-end processes', nprocs)
+    _sd_notify('READY=1')
+    statuses = sv.run()
+    _sd_notify('STOPPING=1')
+    logger.info('Shutting down.')
+    if any(statuses.values()):
+        abort('front-end processes exited with errors')
+
+
+def _serve(cluster, args, runstate_dir, *, loop, frontend_id=None,
+           nprocs=1, supervisor_sock=None):
+    srv = None
+    # Front-end processes share the listening ports.
+    reuse_port = frontend_id is not None
+
     from edb.server import protocol as edgedb_protocol
 
     def protocol_factory():
@@ -130,24 +164,44 @@ def _run_server(cluster, args, runstate_dir):
         srv = loop.run_until_complete(
             loop.create_server(
                 protocol_factory,
-                host=args['bind_address'], port=args['port']))
+                host=args['bind_address'], port=args['port'],
+                reuse_port=reuse_port))
 
         loop.add_signal_handler(signal.SIGTERM, terminate_server, srv, loop)
         logger.info('Serving on %s:%s', args['bind_address'], args['port'])
 
-        # Notify systemd that we've started up.
-        _sd_notify('READY=1')
+        if frontend_id is None:
+            # Notify systemd that we've started up.
+            _sd_notify('READY=1')
 
+        # The backend connection and compiler process limits are
+        # shared by all front-ends.  The persistent query cache is
+        # what lets them share compiled queries.
         ss = server2.Server(
             loop=loop,
             cluster=cluster,
             runstate_dir=runstate_dir,
-            max_backend_connections=args['max_backend_connections'])
-        ss.add_binary_interface(args['bind_address'], args['port'] + 1)
+            max_backend_connections=max(
+                args['max_backend_connections'] // nprocs, 1),
+            compiler_pool_size=max(args['compiler_pool_size'] // nprocs, 1),
+            persistent_query_cache=(
+                args['persistent_query_cache'] or nprocs > 1),
+            frontend_id=frontend_id,
+            supervisor_sock=supervisor_sock)
+        ss.add_binary_interface(
+            args['bind_address'], args['port'] + 1, reuse_port=reuse_port)
+        if args['metrics_port']:
+            # Every front-end process has metrics of its own.
+            metrics_port = args['metrics_port'] + (frontend_id or 0)
+            ss.add_metrics_interface(args['bind_address'], metrics_port)
         loop.run_until_complete(ss.start())
         logger.info(
             'Serving EDGE on %s:%s',
             args['bind_address'], args['port'] + 1)
+        if args['metrics_port']:
+            logger.info(
+                'Serving metrics on http://%s:%s/metrics',
+                args['bind_address'], metrics_port)
 
         try:
             loop.run_forever()
@@ -156,7 +210,8 @@ def _run_server(cluster, args, runstate_dir):
 
     except KeyboardInterrupt:
         logger.info('Shutting down.')
-        _sd_notify('STOPPING=1')
+        if frontend_id is None:
+            _sd_notify('STOPPING=1')
         srv.close()
         loop.run_until_complete(srv.wait_closed())
         srv = None
@@ -296,6 +351,22 @@ def run_server(args):
           '("/run" on Linux by default)'))
 @click.option(
     '--max-backend-connections', type=int, default=100)
+@click.option(
+    '--compiler-pool-size', type=int,
+    default=lambda: max(os.cpu_count() or 1, 1),
+    help='maximum number of compiler worker processes')
+@click.option(
+    '--persistent-query-cache', is_flag=True,
+    help=('keep compiled queries in the runstate directory, '
+          'shared by server processes and across restarts'))
+@click.option(
+    '--frontend-processes', type=int, default=1,
+    help=('number of processes accepting client connections; with more '
+          'than one, the persistent query cache is always enabled'))
+@click.option(
+    '--metrics-port', type=int, default=None,
+    help=('serve metrics in the Prometheus format over HTTP on this '
+          'port; front-end processes use consecutive ports'))
 def main(**kwargs):
     logsetup.setup_logging(kwargs['log_level'], kwargs['log_to'])
     exceptions.install_excepthook()
@@ -22,6 +22,8 @@
 import collections
 import enum
 
+import immutables
+
 from edb.lang.common import compiler
 
 from edb.server.pgsql import ast as pgast
@@ -68,9 +70,11 @@ class CompilerContextLevel(compiler.ContextLevel):
             self.volatility_ref = None
             self.group_by_rels = {}
 
-            self.disable_semi_join = set()
-            self.unique_paths = set()
-            self.force_optional = set()
+            # Persistent path id sets shared with child levels;
+            # additions rebind the attribute of the level at hand.
+            self.disable_semi_join = immutables.Map()
+            self.unique_paths = immutables.Map()
+            self.force_optional = immutables.Map()
 
             self.path_scope = collections.ChainMap()
             self.scope_tree = None
@@ -91,9 +95,9 @@ class CompilerContextLevel(compiler.ContextLevel):
             self.volatility_ref = prevlevel.volatility_ref
             self.group_by_rels = prevlevel.group_by_rels
 
-            self.disable_semi_join = prevlevel.disable_semi_join.copy()
-            self.unique_paths = prevlevel.unique_paths.copy()
-            self.force_optional = prevlevel.force_optional.copy()
+            self.disable_semi_join = prevlevel.disable_semi_join
+            self.unique_paths = prevlevel.unique_paths
+            self.force_optional = prevlevel.force_optional
 
             self.path_scope = prevlevel.path_scope
             self.scope_tree = prevlevel.scope_tree
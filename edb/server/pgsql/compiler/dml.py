@@ -423,7 +423,8 @@ def compile_insert_shape_element(
         ctx: context.CompilerContextLevel) -> pgast.Query:
 
     with ctx.newscope() as insvalctx:
-        insvalctx.force_optional.add(shape_el.path_id)
+        insvalctx.force_optional = insvalctx.force_optional.set(
+            shape_el.path_id, True)
         if iterator_id is not None:
             insvalctx.volatility_ref = iterator_id
         else:
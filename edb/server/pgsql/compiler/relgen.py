@@ -672,8 +672,10 @@ def process_set_as_path(
     elif not source_is_visible:
         with ctx.subrel() as srcctx:
             if is_linkprop:
-                srcctx.disable_semi_join.add(ir_source.path_id)
-                srcctx.unique_paths.add(ir_source.path_id)
+                srcctx.disable_semi_join = srcctx.disable_semi_join.set(
+                    ir_source.path_id, True)
+                srcctx.unique_paths = srcctx.unique_paths.set(
+                    ir_source.path_id, True)
 
             get_set_rvar(ir_source, ctx=srcctx)
 
@@ -1022,7 +1024,8 @@ def process_set_as_coalesce(
             left = dispatch.compile(expr.left, ctx=newctx)
 
             with newctx.new() as rightctx:
-                rightctx.force_optional.add(expr.right.path_id)
+                rightctx.force_optional = rightctx.force_optional.set(
+                    expr.right.path_id, True)
                 right = dispatch.compile(expr.right, ctx=rightctx)
 
             set_expr = pgast.CoalesceExpr(args=[left, right])
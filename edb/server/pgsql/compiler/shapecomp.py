@@ -42,7 +42,8 @@ def compile_shape(
     elements = []
 
     with ctx.newscope() as shapectx:
-        shapectx.disable_semi_join.add(ir_set.path_id)
+        shapectx.disable_semi_join = shapectx.disable_semi_join.set(
+            ir_set.path_id, True)
 
         if (isinstance(ir_set.expr, irast.Stmt) and
                 ir_set.expr.iterator_stmt is not None):
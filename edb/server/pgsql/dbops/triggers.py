@@ -56,7 +56,8 @@ class Trigger(tables.InheritableTableObject):
     def __init__(
             self, name, *, table_name, events, timing='after',
             granularity='row', procedure, condition=None, is_constraint=False,
-            deferred=False, inherit=False, metadata=None):
+            deferred=False, old_table=None, new_table=None, inherit=False,
+            metadata=None):
         super().__init__(inherit=inherit, metadata=metadata)
 
         self.name = name
@@ -68,6 +69,8 @@ class Trigger(tables.InheritableTableObject):
         self.condition = condition
         self.is_constraint = is_constraint
         self.deferred = deferred
+        self.old_table = old_table
+        self.new_table = new_table
 
         if is_constraint and granularity != 'row':
             msg = 'invalid granularity for ' \
@@ -77,6 +80,18 @@ class Trigger(tables.InheritableTableObject):
         if deferred and not is_constraint:
             raise ValueError('only constraint triggers can be deferred')
 
+        if old_table is not None or new_table is not None:
+            if is_constraint or timing != 'after':
+                raise ValueError(
+                    'transition tables are only supported by '
+                    'non-constraint AFTER triggers')
+            if inherit:
+                # Trigger inheritance propagation recreates triggers
+                # from their introspected description, which does not
+                # include transition tables.
+                raise ValueError(
+                    'triggers with transition tables cannot be inherited')
+
     def rename(self, new_name):
         self.name = new_name
 
@@ -172,6 +187,7 @@ class Trigger(tables.InheritableTableObject):
             timing=self.timing, granularity=self.granularity,
             procedure=self.procedure, condition=self.condition,
             is_constraint=self.is_constraint, deferred=self.deferred,
+            old_table=self.old_table, new_table=self.new_table,
             metadata=self.metadata.copy())
 
     def __repr__(self):
@@ -194,10 +210,17 @@ class CreateTrigger(tables.CreateInheritableTableObject):
                 TriggerExists(self.trigger.name, self.trigger.table_name))
 
     def code(self, block: base.PLBlock) -> str:
+        referencing = []
+        if self.trigger.old_table is not None:
+            referencing.append(f'OLD TABLE AS {qi(self.trigger.old_table)}')
+        if self.trigger.new_table is not None:
+            referencing.append(f'NEW TABLE AS {qi(self.trigger.new_table)}')
+
         return textwrap.dedent('''\
             CREATE {constr}TRIGGER {trigger_name} {timing} {events}
                    ON {table_name}
                    {deferred}
+                   {referencing}
                    FOR EACH {granularity} {condition}
                    EXECUTE PROCEDURE {procedure}
         ''').format(
@@ -208,6 +231,8 @@ class CreateTrigger(tables.CreateInheritableTableObject):
             table_name=qn(*self.trigger.table_name),
             deferred=('DEFERRABLE INITIALLY DEFERRED'
                       if self.trigger.deferred else ''),
+            referencing=('REFERENCING ' + ' '.join(referencing)
+                         if referencing else ''),
             granularity=self.trigger.granularity, condition=(
                 'WHEN ({})'.format(self.trigger.condition)
                 if self.trigger.condition else ''),
@@ -66,7 +66,7 @@ from . import schemamech
 from . import types
 
 
-BACKEND_FORMAT_VERSION = 30
+BACKEND_FORMAT_VERSION = 31
 
 
 class CommandMeta(sd.CommandMeta):
@@ -1666,6 +1666,13 @@ class ObjectTypeMetaCommand(ViewCapableObjectMetaCommand,
             objtype.get_is_derived(schema)
         )
 
+    def schedule_endpoint_delete_action_update(
+            self, objtype, orig_schema, schema, context):
+        endpoint_delete_actions = context.get(
+            sd.DeltaRootContext).op.update_endpoint_delete_actions
+        endpoint_delete_actions.objtype_ops.append(
+            (self, objtype, orig_schema))
+
 
 class CreateObjectType(ObjectTypeMetaCommand,
                        adapts=s_objtypes.CreateObjectType):
@@ -1743,6 +1750,9 @@ class CreateObjectType(ObjectTypeMetaCommand,
         self.pgops.add(
             dbops.Comment(object=objtype_table, text=self.classname))
 
+        self.schedule_endpoint_delete_action_update(
+            objtype, None, schema, context)
+
         return schema, objtype
 
 
@@ -1804,6 +1814,9 @@ class RebaseObjectType(ObjectTypeMetaCommand,
             schema = self.apply_base_delta(
                 source, orig_schema, schema, context)
 
+            self.schedule_endpoint_delete_action_update(
+                source, orig_schema, schema, context)
+
         return schema, result
 
 
@@ -2715,9 +2728,26 @@ class DeleteProperty(
 
 
 class UpdateEndpointDeleteActions(MetaCommand):
+    """Maintain the triggers enforcing link endpoint delete actions.
+
+    Immediate actions are enforced by statement-level triggers that
+    process all deleted objects at once through the OLD transition
+    table.  A DELETE on a type table also removes the rows of its
+    descendant tables, but only fires the statement-level triggers
+    of the table it names, so the trigger of every type table covers
+    the links of the whole type hierarchy the table belongs to.
+
+    Deferred restrictions are checked by row-level constraint
+    triggers, as transition tables are not available to those.
+    """
+
+    deleted_table = 'deleted_objects'
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.link_ops = []
+        self.objtype_ops = []
+        self._hierarchies = {}
 
     def _get_link_table_union(self, schema, links) -> str:
         selects = []
@@ -2764,7 +2794,16 @@ class UpdateEndpointDeleteActions(MetaCommand):
         return common.get_backend_name(
             schema, target, catenate=False, aspect=aspect)
 
-    def get_trigger_proc_text(self, target, links, disposition, schema):
+    def get_trigger_proc_text(self, target, links, disposition, schema,
+                              deferred=False):
+        if deferred:
+            return self._get_row_trigger_proc_text(
+                target, links, disposition, schema)
+        else:
+            return self._get_statement_trigger_proc_text(
+                links, disposition, schema)
+
+    def _get_row_trigger_proc_text(self, target, links, disposition, schema):
         chunks = []
 
         DA = s_links.LinkTargetDeleteAction
@@ -2878,8 +2917,201 @@ class UpdateEndpointDeleteActions(MetaCommand):
 
         return text
 
+    def _get_statement_trigger_proc_text(self, links, disposition, schema):
+        chunks = []
+
+        DA = s_links.LinkTargetDeleteAction
+
+        if disposition == 'target':
+            groups = itertools.groupby(
+                links, lambda l: l.get_on_target_delete(schema))
+            near_endpoint, far_endpoint = 'target', 'source'
+        else:
+            groups = [(DA.SET_EMPTY, links)]
+            near_endpoint, far_endpoint = 'source', 'target'
+
+        deleted = common.quote_ident(self.deleted_table)
+
+        for action, links in groups:
+            if action is DA.RESTRICT:
+                # The error message names the target type of the
+                # link, as the type of the deleted object is not
+                # known from the transition table.
+                targets = collections.defaultdict(list)
+                for link in links:
+                    targets[link.get_target(schema)].append(link)
+
+                for target, target_links in targets.items():
+                    tables = self._get_link_table_union(schema, target_links)
+
+                    text = textwrap.dedent('''\
+                        SELECT
+                            q.ptr_item_id, q.source, q.target
+                            INTO link_type_id, srcid, tgtid
+                        FROM
+                            {tables}
+                        WHERE
+                            q.{near_endpoint} IN (
+                                SELECT {id} FROM {deleted}
+                            )
+                        LIMIT 1;
+
+                        IF FOUND THEN
+                            SELECT
+                                edgedb.shortname_from_fullname(link.name),
+                                edgedb._resolve_type_name(link.{far_endpoint})
+                                INTO linkname, endname
+                            FROM
+                                edgedb.Link AS link
+                            WHERE
+                                link.id = link_type_id;
+                            RAISE foreign_key_violation
+                                USING
+                                    TABLE = TG_TABLE_NAME,
+                                    SCHEMA = TG_TABLE_SCHEMA,
+                                    MESSAGE = 'deletion of {tgtname} ('
+                                        || tgtid || ') is prohibited by '
+                                        || 'link target policy',
+                                    DETAIL = 'Object is still referenced in '
+                                        || 'link ' || linkname || ' of '
+                                        || endname || ' (' || srcid || ').';
+                        END IF;
+                    ''').format(
+                        tables=tables,
+                        id='id',
+                        deleted=deleted,
+                        tgtname=target.get_displayname(schema),
+                        near_endpoint=near_endpoint,
+                        far_endpoint=far_endpoint,
+                    )
+
+                    chunks.append(text)
+
+            elif action == s_links.LinkTargetDeleteAction.SET_EMPTY:
+                for link in links:
+                    link_table = common.get_backend_name(
+                        schema, link)
+
+                    text = textwrap.dedent('''\
+                        DELETE FROM
+                            {link_table}
+                        WHERE
+                            {endpoint} IN (
+                                SELECT {id} FROM {deleted}
+                            );
+                    ''').format(
+                        link_table=link_table,
+                        endpoint=common.quote_ident(near_endpoint),
+                        id='id',
+                        deleted=deleted,
+                    )
+
+                    chunks.append(text)
+
+            elif action == s_links.LinkTargetDeleteAction.DELETE_SOURCE:
+                sources = collections.defaultdict(list)
+                for link in links:
+                    sources[link.get_source(schema)].append(link)
+
+                for source, source_links in sources.items():
+                    tables = self._get_link_table_union(schema, source_links)
+
+                    text = textwrap.dedent('''\
+                        DELETE FROM
+                            {source_table}
+                        WHERE
+                            {source_table}.{id} IN (
+                                SELECT q.source
+                                FROM {tables}
+                                WHERE q.target IN (
+                                    SELECT {id} FROM {deleted}
+                                )
+                            );
+                    ''').format(
+                        source_table=common.get_backend_name(schema, source),
+                        id='id',
+                        deleted=deleted,
+                        tables=tables,
+                    )
+
+                    chunks.append(text)
+
+        # Statement-level triggers fire even if no rows were deleted,
+        # so return early to end delete source cascades.
+        text = textwrap.dedent('''\
+            DECLARE
+                link_type_id uuid;
+                srcid uuid;
+                tgtid uuid;
+                linkname text;
+                endname text;
+            BEGIN
+                IF NOT EXISTS (SELECT 1 FROM {deleted}) THEN
+                    RETURN NULL;
+                END IF;
+
+                {chunks}
+                RETURN NULL;
+            END;
+        ''').format(deleted=deleted, chunks='\n\n'.join(chunks))
+
+        return text
+
+    def _get_hierarchy(self, objtype, orig_schema, schema):
+        """Return the current object types that share rows with *objtype*.
+
+        These are *objtype* itself, its ancestors and its descendants,
+        as found in *orig_schema*.
+        """
+        key = (objtype.id, id(orig_schema), id(schema))
+        try:
+            return self._hierarchies[key]
+        except KeyError:
+            pass
+
+        hierarchy = {objtype}
+        hierarchy.update(objtype.get_mro(orig_schema).objects(orig_schema))
+
+        pending = [objtype]
+        while pending:
+            for child in pending.pop().children(orig_schema):
+                if child not in hierarchy:
+                    hierarchy.add(child)
+                    pending.append(child)
+
+        result = set()
+        for obj in hierarchy:
+            current = schema.get_by_id(obj.id, None)
+            if (current is not None
+                    and not current.is_view(schema)
+                    and ObjectTypeMetaCommand.has_table(current, schema)):
+                result.add(current)
+
+        self._hierarchies[key] = result
+        return result
+
+    def _get_target_links(self, schema, target):
+        # Links to union types are enforced by the triggers
+        # of the union members.
+        targets = [target]
+        targets.extend(schema.get_referrers(
+            target, scls_type=s_objtypes.ObjectType,
+            field_name='_virtual_children'))
+
+        links = set()
+
+        for t in targets:
+            for l in schema.get_referrers(t, scls_type=s_links.Link,
+                                          field_name='target'):
+                ptr_stor_info = types.get_pointer_storage_info(
+                    l, schema=schema)
+                if ptr_stor_info.table_type == 'link':
+                    links.add(l)
+
+        return links
+
     def apply(self, schema, context):
-        if not self.link_ops:
+        if not self.link_ops and not self.objtype_ops:
             return schema, None
 
         DA = s_links.LinkTargetDeleteAction
@@ -2892,14 +3124,12 @@ class UpdateEndpointDeleteActions(MetaCommand):
                 if link.generic(orig_schema):
                     continue
                 source = link.get_source(orig_schema)
-                current_source = schema.get_by_id(source.id, None)
-                if (current_source is not None
-                        and not current_source.is_view(schema)):
-                    affected_sources.add(current_source)
+                if not source.is_view(orig_schema):
+                    affected_sources.update(
+                        self._get_hierarchy(source, orig_schema, schema))
                 target = link.get_target(orig_schema)
-                current_target = schema.get_by_id(target.id, None)
-                if current_target is not None:
-                    affected_targets.add(current_target)
+                affected_targets.update(
+                    self._get_hierarchy(target, orig_schema, schema))
             else:
                 if link.generic(schema):
                     continue
@@ -2907,33 +3137,44 @@ class UpdateEndpointDeleteActions(MetaCommand):
                 if source.is_view(schema):
                     continue
 
-                affected_sources.add(source)
+                affected_sources.update(
+                    self._get_hierarchy(source, schema, schema))
 
                 target = link.get_target(schema)
-                affected_targets.add(target)
+                affected_targets.update(
+                    self._get_hierarchy(target, schema, schema))
 
                 if isinstance(link_op, AlterLink):
                     orig_target = link.get_target(orig_schema)
                     if target != orig_target:
-                        current_orig_target = schema.get_by_id(
-                            orig_target.id, None)
-                        if current_orig_target is not None:
-                            affected_targets.add(current_orig_target)
+                        affected_targets.update(
+                            self._get_hierarchy(
+                                orig_target, orig_schema, schema))
+
+        for objtype_op, objtype, orig_schema in self.objtype_ops:
+            hierarchy = self._get_hierarchy(objtype, schema, schema)
+            if orig_schema is not None:
+                hierarchy.update(
+                    self._get_hierarchy(objtype, orig_schema, schema))
+            affected_sources.update(hierarchy)
+            affected_targets.update(hierarchy)
 
         for source in affected_sources:
-            links = []
+            links = set()
 
-            for l in source.get_own_pointers(schema).objects(schema):
-                if not isinstance(l, s_links.Link):
-                    continue
-                ptr_stor_info = types.get_pointer_storage_info(
-                    l, schema=schema)
-                if ptr_stor_info.table_type != 'link':
-                    continue
+            for objtype in self._get_hierarchy(source, schema, schema):
+                for l in objtype.get_own_pointers(schema).objects(schema):
+                    if not isinstance(l, s_links.Link):
+                        continue
+                    ptr_stor_info = types.get_pointer_storage_info(
+                        l, schema=schema)
+                    if ptr_stor_info.table_type != 'link':
+                        continue
 
-                links.append(l)
+                    links.add(l)
 
-            links.sort(
+            links = sorted(
+                links,
                 key=lambda l: (l.get_on_target_delete(schema),
                                l.get_name(schema)))
 
@@ -2941,22 +3182,21 @@ class UpdateEndpointDeleteActions(MetaCommand):
                 schema, source, links, disposition='source')
 
         for target in affected_targets:
-            deferred_links = []
-            links = []
-
-            for l in schema.get_referrers(target, scls_type=s_links.Link,
-                                          field_name='target'):
-                ptr_stor_info = types.get_pointer_storage_info(
-                    l, schema=schema)
-                if ptr_stor_info.table_type != 'link':
-                    continue
-
-                if l.get_on_target_delete(schema) is DA.DEFERRED_RESTRICT:
-                    deferred_links.append(l)
-                else:
-                    links.append(l)
+            deferred_links = [
+                l for l in self._get_target_links(schema, target)
+                if l.get_on_target_delete(schema) is DA.DEFERRED_RESTRICT
+            ]
+
+            links = set()
+            for objtype in self._get_hierarchy(target, schema, schema):
+                links.update(
+                    l for l in self._get_target_links(schema, objtype)
+                    if l.get_on_target_delete(schema)
+                    is not DA.DEFERRED_RESTRICT
+                )
 
-            links.sort(
+            links = sorted(
+                links,
                 key=lambda l: (l.get_on_target_delete(schema),
                                l.get_name(schema)))
 
@@ -2980,38 +3220,39 @@ class UpdateEndpointDeleteActions(MetaCommand):
             disposition: str,
             deferred: bool=False) -> None:
 
-        if objtype.get_is_virtual(schema):
-            objtypes = tuple(objtype.children(schema))
-        else:
-            objtypes = (objtype,)
-
-        for objtype in objtypes:
-            table_name = common.get_backend_name(
-                schema, objtype, catenate=False)
+        table_name = common.get_backend_name(
+            schema, objtype, catenate=False)
 
-            trigger_name = self.get_trigger_name(
-                schema, objtype, disposition=disposition, deferred=deferred)
-            proc_name = self.get_trigger_proc_name(
-                schema, objtype, disposition=disposition, deferred=deferred)
-            proc_text = self.get_trigger_proc_text(
-                objtype, links, disposition=disposition, schema=schema)
+        trigger_name = self.get_trigger_name(
+            schema, objtype, disposition=disposition, deferred=deferred)
+        proc_name = self.get_trigger_proc_name(
+            schema, objtype, disposition=disposition, deferred=deferred)
+        proc_text = self.get_trigger_proc_text(
+            objtype, links, disposition=disposition, schema=schema,
+            deferred=deferred)
 
-            trig_func = dbops.Function(
-                name=proc_name, text=proc_text, volatility='volatile',
-                returns='trigger', language='plpgsql')
+        trig_func = dbops.Function(
+            name=proc_name, text=proc_text, volatility='volatile',
+            returns='trigger', language='plpgsql')
 
-            self.pgops.add(dbops.CreateOrReplaceFunction(trig_func))
+        self.pgops.add(dbops.CreateOrReplaceFunction(trig_func))
 
+        if deferred:
+            trigger = dbops.Trigger(
+                name=trigger_name, table_name=table_name,
+                events=('delete',), procedure=proc_name,
+                is_constraint=True, inherit=True, deferred=True)
+        else:
             trigger = dbops.Trigger(
                 name=trigger_name, table_name=table_name,
                 events=('delete',), procedure=proc_name,
-                is_constraint=True, inherit=True, deferred=deferred)
+                granularity='statement', old_table=self.deleted_table)
 
-            self.pgops.add(dbops.CreateTrigger(
-                trigger, neg_conditions=[dbops.TriggerExists(
-                    trigger_name=trigger_name, table_name=table_name
-                )]
-            ))
+        self.pgops.add(dbops.CreateTrigger(
+            trigger, neg_conditions=[dbops.TriggerExists(
+                trigger_name=trigger_name, table_name=table_name
+            )]
+        ))
 
 
 class ModuleMetaCommand(ObjectMetaCommand):
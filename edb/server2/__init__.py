@@ -17,12 +17,22 @@
 #
 
 
+import hashlib
 import os
 import typing
 import urllib.parse
 
+from edb import errors
+from edb.lang.common import lru
+
 from . import backend
 from . import edgecon
+from . import metrics
+from . import supervisor
+
+
+# The maximum number of persisted GraphQL queries to keep around.
+PERSISTED_GRAPHQL_CACHE_SIZE = 1000
 
 
 class PGConParams(typing.NamedTuple):
@@ -33,10 +43,11 @@ class PGConParams(typing.NamedTuple):
 
 class Interface:
 
-    def __init__(self, server, host, port):
+    def __init__(self, server, host, port, *, reuse_port=False):
         self.server = server
         self.host = host
         self.port = port
+        self.reuse_port = reuse_port
 
     def make_protocol(self):
         raise NotImplementedError
@@ -48,10 +59,18 @@ class BinaryInterface(Interface):
         return edgecon.EdgeConnection(self.server)
 
 
+class MetricsInterface(Interface):
+
+    def make_protocol(self):
+        return metrics.MetricsProtocol(self.server.get_metrics())
+
+
 class Server:
 
     def __init__(self, *, loop, cluster, runstate_dir,
-                 max_backend_connections):
+                 max_backend_connections, compiler_pool_size,
+                 persistent_query_cache=False,
+                 frontend_id=None, supervisor_sock=None):
 
         self._loop = loop
 
@@ -60,12 +79,41 @@ class Server:
         self._servers = []
         self._cluster = cluster
 
-        self._dbindex = backend.DatabaseIndex()
+        self._query_cache = None
+        if persistent_query_cache:
+            self._query_cache = backend.PersistentQueryCache(
+                os.path.join(runstate_dir, 'edgedb-query-cache.db'))
+
+        # When the server runs in several front-end processes, schema
+        # changes, query cancellation requests and persisted GraphQL
+        # queries are announced to the other front-ends through
+        # the supervisor.
+        self._frontend_id = frontend_id
+        self._supervisor = None
+        if supervisor_sock is not None:
+            self._supervisor = supervisor.SupervisorChannel(
+                supervisor_sock,
+                on_ddl=self._on_external_ddl,
+                on_cancel=self._cancel_local_edgecon,
+                on_persisted_graphql=self._persist_graphql)
+
+        self._metrics = metrics.ServerMetrics()
+
+        self._dbindex = backend.DatabaseIndex(
+            query_cache=self._query_cache,
+            on_ddl=self._on_local_ddl if self._supervisor else None,
+            metrics=self._metrics)
 
         self._runstate_dir = runstate_dir
         self._max_backend_connections = max_backend_connections
+        self._compiler_pool_size = compiler_pool_size
 
         self._edgecon_id = 0
+        self._edgecons = {}
+
+        # Persisted GraphQL queries: SHA-256 hex digest -> document.
+        self._persisted_graphql = lru.LRUMapping(
+            maxsize=PERSISTED_GRAPHQL_CACHE_SIZE)
 
         self._cpool = None
         self._pgpool = None
@@ -73,20 +121,94 @@ class Server:
     def get_loop(self):
         return self._loop
 
+    def get_metrics(self):
+        return self._metrics
+
     def new_view(self, *, dbname, user):
         return self._dbindex.new_view(dbname, user=user)
 
-    async def new_backend(self, *, dbname: str, dbver: int):
-        return await self._backend_manager.new_backend(
-            dbname=dbname, dbver=dbver)
-
-    def add_binary_interface(self, host, port):
-        self._add_interface(BinaryInterface(self, host, port))
+    async def new_backend(self, *, dbname: str):
+        return await self._backend_manager.new_backend(dbname=dbname)
+
+    def add_binary_interface(self, host, port, *, reuse_port=False):
+        self._add_interface(
+            BinaryInterface(self, host, port, reuse_port=reuse_port))
+
+    def add_metrics_interface(self, host, port, *, reuse_port=False):
+        self._add_interface(
+            MetricsInterface(self, host, port, reuse_port=reuse_port))
+
+    def resolve_persisted_graphql(self, request: bytes) -> bytes:
+        """Return the GraphQL document of a persisted query request.
+
+        The request is the SHA-256 hex digest of the document,
+        optionally followed by a newline and the document itself.
+        Clients send the digest alone, and the document only once
+        the server reports that it does not know the digest.
+        """
+        query_id, _, document = request.partition(b'\n')
+        query_id = query_id.decode().lower()
+
+        if document:
+            if hashlib.sha256(document).hexdigest() != query_id:
+                raise errors.QueryError(
+                    'persisted query id does not match the document')
+            if (self._supervisor is not None and
+                    query_id not in self._persisted_graphql):
+                self._supervisor.announce_persisted_graphql(document)
+            self._persisted_graphql[query_id] = document
+            return document
+
+        try:
+            return self._persisted_graphql[query_id]
+        except KeyError:
+            raise errors.QueryError(
+                f'persisted query {query_id!r} not found') from None
+
+    def record_paused_writing(self, duration: float):
+        # Client connections had to stop streaming results because
+        # the clients did not read them fast enough.
+        self._metrics.client_paused_writing.inc()
+        self._metrics.client_paused_writing_duration.inc(duration)
 
     def new_edgecon_id(self):
         self._edgecon_id += 1
         return str(self._edgecon_id)
 
+    def edgecon_register(self, con_id: str, conn):
+        self._edgecons[con_id] = conn
+
+    def edgecon_unregister(self, con_id: str):
+        self._edgecons.pop(con_id, None)
+
+    def cancel_edgecon(self, con_id: int, secret: int):
+        """Cancel the query running on a client connection.
+
+        Connection ids are only unique within a front-end process,
+        so unless the connection is found here, the request is
+        relayed to the other front-ends.
+        """
+        if (not self._cancel_local_edgecon(con_id, secret) and
+                self._supervisor is not None):
+            self._supervisor.request_cancel(con_id, secret)
+
+    def _cancel_local_edgecon(self, con_id: int, secret: int) -> bool:
+        conn = self._edgecons.get(str(con_id))
+        if conn is None:
+            return False
+        return conn.cancel(secret)
+
+    def _on_local_ddl(self, dbname: str):
+        self._supervisor.signal_ddl(dbname)
+
+    def _on_external_ddl(self, dbname: str):
+        self._dbindex.signal_external_ddl(dbname)
+
+    def _persist_graphql(self, document: bytes):
+        # A persisted query registered with another front-end.
+        self._persisted_graphql[
+            hashlib.sha256(document).hexdigest()] = document
+
     def _add_interface(self, iface: Interface):
         if self._serving:
             raise RuntimeError(
@@ -98,6 +220,9 @@ class Server:
             raise RuntimeError('already serving')
         self._serving = True
 
+        if self._query_cache is not None:
+            self._query_cache.open()
+
         pg_con_spec = self._cluster.get_connection_spec()
         if 'host' not in pg_con_spec and 'dsn' in pg_con_spec:
             # XXX
@@ -111,16 +236,36 @@ class Server:
 
         pgaddr = os.path.join(host, f'.s.PGSQL.{port}')
 
+        compiler_pool_name = 'edgedb-compiler'
+        if self._frontend_id is not None:
+            compiler_pool_name += f'-{self._frontend_id}'
+
         self._backend_manager = backend.BackendManager(
+            dbindex=self._dbindex,
+            metrics=self._metrics,
             runstate_dir=self._runstate_dir,
             data_dir=self._cluster.get_data_dir(),
-            pgaddr=pgaddr)
+            pgaddr=pgaddr,
+            max_backend_connections=self._max_backend_connections,
+            compiler_pool_size=self._compiler_pool_size,
+            compiler_pool_name=compiler_pool_name,
+            query_cache=self._query_cache is not None)
         await self._backend_manager.start()
 
+        if self._supervisor is not None:
+            await self._supervisor.connect()
+
         for iface in self._interfaces:
             srv = await self._loop.create_server(
-                iface.make_protocol, host=iface.host, port=iface.port)
+                iface.make_protocol, host=iface.host, port=iface.port,
+                reuse_port=iface.reuse_port)
             self._servers.append(srv)
 
     async def stop(self):
-        await self._backend_manager.stop()
+        try:
+            if self._supervisor is not None:
+                self._supervisor.close()
+            await self._backend_manager.stop()
+        finally:
+            if self._query_cache is not None:
+                self._query_cache.close()
@@ -17,57 +17,216 @@
 #
 
 
+import asyncio
+import functools
+import logging
+import time
 import weakref
 
 from edb.lang.common import taskgroup
 
 from edb.server2 import pgcon
+from edb.server2 import pgpool
 from edb.server2 import procpool
 
 from . import compiler
+from . import ipc
 
 from .dbview import DatabaseIndex
+from .querycache import PersistentQueryCache
 
 
-__all__ = ('DatabaseIndex', 'BackendManager')
+__all__ = ('DatabaseIndex', 'BackendManager', 'PersistentQueryCache')
+
+
+logger = logging.getLogger('edb.server')
 
 
 class Backend:
 
-    def __init__(self, pgcon, compiler):
-        self._pgcon = pgcon
-        self._compiler = compiler
+    def __init__(self, manager, dbname):
+        self._manager = manager
+        self._dbname = dbname
+        self._pgcon_pool = manager._pgcon_pool
+        self._compiler_pool = manager._compiler_pool
+
+        # A backend connection is only held for the duration of
+        # a query or an explicit transaction.
+        self._pgcon = None
+
+        # Set when a cancellation request was sent for the query
+        # running on the backend connection.
+        self._pgcon_cancelled = False
+
+        # A compiler worker that is currently reserved for this
+        # backend.  Compiler workers are shared between all client
+        # connections, but the state of an explicit transaction lives
+        # in the worker, so a worker has to stay pinned for as long as
+        # the transaction is open.
+        self._pinned_compiler = None
+
+        # Set while a call to the pinned worker is in flight: the
+        # worker cannot be released before the call is over.
+        self._pinned_compiler_busy = False
+        self._release_compiler_pending = False
 
     @property
     def pgcon(self):
         return self._pgcon
 
-    @property
-    def compiler(self):
-        return self._compiler
+    async def acquire_pgcon(self):
+        if self._pgcon is None:
+            self._pgcon = await self._pgcon_pool.acquire(self._dbname)
+        return self._pgcon
+
+    def release_pgcon(self):
+        """Return the backend connection to the pool.
+
+        The connection is kept if it is in a transaction.
+        """
+        con = self._pgcon
+        if con is not None and not con.in_tx():
+            self._pgcon = None
+            # Postgres processes cancellation requests asynchronously,
+            # so a late one could interrupt a query of another client:
+            # such connections are never reused.
+            discard = self._pgcon_cancelled
+            self._pgcon_cancelled = False
+            self._pgcon_pool.release(self._dbname, con, discard=discard)
+
+    async def cancel_query(self):
+        """Cancel the query running on the backend connection, if any."""
+        con = self._pgcon
+        if con is None or not con.is_executing():
+            return
+        self._pgcon_cancelled = True
+        await self._manager.cancel_pgcon(con)
+
+    async def compile(self, method_name, *args, dbver=None):
+        """Call a compiler method, pinning the worker to this backend.
+
+        The worker stays pinned until release_compiler() is called.
+        If *dbver* is specified, the worker is brought up to date
+        with that version of the database schema first.
+        """
+        worker = self._pinned_compiler
+        if worker is None:
+            worker = await self._manager.acquire_compiler()
+            self._pinned_compiler = worker
+
+        discard = False
+        self._pinned_compiler_busy = True
+        try:
+            if dbver is not None:
+                await self._manager.ensure_compiler_schema(
+                    worker, self._dbname, dbver)
+            return await self._manager.call_compiler(
+                worker, method_name, *args)
+        except (asyncio.CancelledError, OSError):
+            # The worker might still be busy with the interrupted
+            # call, or the connection to it is broken: either way
+            # it cannot be used again.
+            discard = True
+            raise
+        finally:
+            self._pinned_compiler_busy = False
+            if discard or self._release_compiler_pending:
+                self.release_compiler(discard=discard)
+
+    async def call_compiler(self, method_name, *args, dbver):
+        """Call a stateless compiler method on any available worker."""
+        if self._pinned_compiler is not None:
+            return await self.compile(method_name, *args, dbver=dbver)
+
+        worker = await self._manager.acquire_compiler()
+        discard = False
+        try:
+            await self._manager.ensure_compiler_schema(
+                worker, self._dbname, dbver)
+            return await self._manager.call_compiler(
+                worker, method_name, *args)
+        except (asyncio.CancelledError, OSError):
+            discard = True
+            raise
+        finally:
+            self._compiler_pool.release(worker, discard=discard)
+
+    def release_compiler(self, *, discard=False):
+        if self._pinned_compiler_busy:
+            # Released by compile() once the call is over.
+            self._release_compiler_pending = True
+            return
+
+        self._release_compiler_pending = False
+        worker = self._pinned_compiler
+        if worker is not None:
+            self._pinned_compiler = None
+            self._compiler_pool.release(worker, discard=discard)
 
     async def close(self):
-        self._pgcon.terminate()
-        self._compiler.close()
+        con = self._pgcon
+        if con is not None:
+            # The connection might be in the middle of a query or
+            # a transaction, so it cannot be reused.
+            self._pgcon = None
+            if con.is_executing():
+                # Nobody is waiting for the results anymore; closing
+                # the connection alone would not stop Postgres until
+                # it tries to send them.
+                await self._manager.cancel_pgcon(con)
+            self._pgcon_pool.release(self._dbname, con, discard=True)
+        self.release_compiler()
 
 
 class BackendManager:
 
-    def __init__(self, *, pgaddr, runstate_dir, data_dir):
+    # The number of schema deltas after which a full snapshot
+    # of the database schema is taken.
+    _MAX_SCHEMA_DELTAS = 16
+
+    def __init__(self, *, pgaddr, runstate_dir, data_dir, dbindex, metrics,
+                 max_backend_connections, compiler_pool_size,
+                 compiler_pool_name='edgedb-compiler',
+                 query_cache=False):
+        self._dbindex = dbindex
+        self._metrics = metrics
         self._pgaddr = pgaddr
         self._runstate_dir = runstate_dir
         self._data_dir = data_dir
+        self._max_backend_connections = max_backend_connections
+        self._compiler_pool_size = compiler_pool_size
+        self._compiler_pool_name = compiler_pool_name
+        self._query_cache = query_cache
 
         self._backends = weakref.WeakSet()
 
-        self._compiler_manager = None
+        self._pgcon_pool = None
+        self._compiler_pool = None
+
+        # A database is introspected by one compiler worker once per
+        # version, and the snapshot is then sent to the other workers.
+        # Versions produced by DDL commands are sent as deltas.
+        # Both are kept by the Database objects of the dbindex.
+        self._introspections = {}
+
+        # Versions of database schemas known to compiler workers.
+        self._compiler_dbvers = weakref.WeakKeyDictionary()
 
     async def start(self):
-        self._compiler_manager = await procpool.create_manager(
+        self._pgcon_pool = await pgpool.create_pool(
+            connect=functools.partial(pgcon.connect, self._pgaddr),
+            max_capacity=self._max_backend_connections)
+
+        self._compiler_pool = await procpool.create_pool(
+            min_capacity=1,
+            max_capacity=self._compiler_pool_size,
             runstate_dir=self._runstate_dir,
-            name='edgedb-compiler',
+            name=self._compiler_pool_name,
             worker_cls=compiler.Compiler,
-            worker_args=(dict(host=self._pgaddr), self._data_dir))
+            worker_args=(dict(host=self._pgaddr), self._data_dir,
+                         self._query_cache),
+            codec_cls=ipc.CompilerCodec,
+            on_call_stats=self._on_compiler_call_stats)
 
     async def stop(self):
         # TODO: Make a graceful version of this.
@@ -76,31 +235,97 @@ class BackendManager:
                 for backend in self._backends:
                     g.create_task(backend.close())
         finally:
-            await self._compiler_manager.stop()
+            try:
+                await self._pgcon_pool.close()
+            finally:
+                await self._compiler_pool.stop()
 
-    async def new_backend(self, *, dbname: str, dbver: int):
+    async def cancel_pgcon(self, con):
         try:
-            compiler = None
-            async with taskgroup.TaskGroup() as g:
-                new_pgcon = g.create_task(
-                    pgcon.connect(self._pgaddr, dbname))
+            await pgcon.cancel(
+                self._pgaddr, con.backend_pid, con.backend_secret)
+        except OSError as ex:
+            logger.warning('could not cancel a backend query: %s', ex)
 
-                compiler = await self._compiler_manager.spawn_worker()
-                g.create_task(
-                    compiler.call('connect', dbname, dbver))
+    def _on_compiler_call_stats(self, method_name, stage_timings):
+        observe = self._metrics.compile_duration.observe
+        for stage, duration in stage_timings:
+            observe(duration, stage)
 
-        except Exception:
-            try:
-                if compiler is not None:
-                    compiler.close()
-            finally:
-                if (new_pgcon.done() and
-                        not new_pgcon.cancelled() and
-                        not new_pgcon.exception()):
-                    con = new_pgcon.result()
-                    con.abort()
-            raise
+    async def acquire_compiler(self):
+        started = time.monotonic()
+        worker = await self._compiler_pool.acquire()
+        self._metrics.compiler_pool_wait.observe(time.monotonic() - started)
+        return worker
+
+    async def call_compiler(self, worker, method_name, *args):
+        started = time.monotonic()
+        try:
+            return await worker.call(method_name, *args)
+        finally:
+            self._metrics.compiler_call_duration.observe(
+                time.monotonic() - started, method_name)
+
+    async def _introspect(self, worker, dbname, dbver):
+        key = (dbname, dbver)
+        introspection = asyncio.get_running_loop().create_future()
+        self._introspections[key] = introspection
+
+        snapshot = None
+        try:
+            snapshot, fingerprint = await worker.call(
+                'introspect_database', dbname, dbver)
+        finally:
+            # On failure the waiters get None and let their workers
+            # introspect the database on their own.
+            introspection.set_result(snapshot)
+            del self._introspections[key]
+
+        db = self._dbindex.get_db(dbname)
+        db._set_schema_snapshot(dbver, snapshot)
+        db._set_schema_fingerprint(dbver, fingerprint)
+
+    async def ensure_compiler_schema(self, worker, dbname, dbver):
+        known = self._compiler_dbvers.setdefault(worker, {})
+        known_dbver = known.get(dbname)
+        if known_dbver == dbver:
+            return
+
+        db = self._dbindex.get_db(dbname)
+        updates = db._get_schema_updates(known_dbver, dbver)
+        if updates is None:
+            introspection = self._introspections.get((dbname, dbver))
+            if introspection is None:
+                # Let this worker introspect the database and share
+                # the result with the others.
+                await self._introspect(worker, dbname, dbver)
+                known[dbname] = dbver
+                return
+
+            snapshot = await asyncio.shield(introspection)
+            if snapshot is None:
+                return
+            updates = [(dbver, None, snapshot)]
+
+        # Forget the known version in case the call fails midway.
+        known.pop(dbname, None)
+        await worker.call('set_database_schema', dbname, updates)
+        known[dbname] = dbver
+
+        if len(db._schema_deltas) > self._MAX_SCHEMA_DELTAS:
+            # Take a snapshot of the current version so that
+            # the deltas can be dropped.  The worker has the schema
+            # cached, so this does not introspect the database.
+            snapshot, _ = await worker.call(
+                'introspect_database', dbname, dbver)
+            db._set_schema_snapshot(dbver, snapshot)
+
+    async def new_backend(self, *, dbname: str):
+        backend = Backend(self, dbname)
+
+        # Make sure that the database is accessible.
+        await backend.acquire_pgcon()
+        backend.release_pgcon()
 
-        backend = Backend(new_pgcon.result(), compiler)
         self._backends.add(backend)
         return backend
@@ -18,9 +18,11 @@
 
 
 import collections
+import contextlib
 import hashlib
 import pathlib
 import pickle
+import time
 import typing
 
 import asyncpg
@@ -34,7 +36,9 @@ from edb.server.pgsql import intromech
 
 from edb.lang import edgeql
 from edb.lang import graphql
+from edb.lang.common import ast
 from edb.lang.common import debug
+from edb.lang.common import devmode
 
 from edb.lang.edgeql import ast as qlast
 from edb.lang.edgeql import compiler as ql_compiler
@@ -72,6 +76,9 @@ class CompileContext(typing.NamedTuple):
     single_query_mode: bool
     legacy_mode: bool
     graphql_mode: bool
+    # The number of trailing positional parameters that replace
+    # constants of a normalized query.
+    implicit_params: int = 0
 
 
 EMPTY_MAP = immutables.Map()
@@ -80,27 +87,55 @@ EMPTY_MAP = immutables.Map()
 class Compiler:
 
     _connect_args: dict
-    _dbname: typing.Optional[str]
-    _cached_db: typing.Optional[CompilerDatabaseState]
+    _cached_dbs: typing.Dict[str, CompilerDatabaseState]
 
-    def __init__(self, connect_args: dict, data_dir: str):
+    def __init__(self, connect_args: dict, data_dir: str,
+                 query_cache: bool=False):
         self._connect_args = connect_args
         self._data_dir = pathlib.Path(data_dir)
-        self._dbname = None
-        self._cached_db = None
+        # Schema fingerprints are only used to look up queries
+        # in the persistent query cache.
+        self._query_cache = query_cache
+        self._cached_dbs = {}
         self._cached_std_schema = None
+        self._std_fingerprint = None
         self._current_db_state = None
 
-    async def _get_database(self, dbver: int) -> CompilerDatabaseState:
-        if self._cached_db is not None and self._cached_db.dbver == dbver:
-            return self._cached_db
+        # Time spent in each compilation stage by the current call;
+        # reported to the server along with the result of the call.
+        self._stage_timings = {}
 
-        self._cached_db = None
+        if not devmode.is_in_dev_mode():
+            # Compiler workers trust the ASTs they build; skip the
+            # runtime validation of AST nodes.
+            ast.set_production_mode()
 
-        con_args = self._connect_args.copy()
-        con_args['user'] = defines.EDGEDB_SUPERUSER
-        con_args['database'] = self._dbname
+    @contextlib.contextmanager
+    def _timeit(self, stage: str):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._stage_timings[stage] = (
+                self._stage_timings.get(stage, 0) +
+                time.monotonic() - started)
+
+    def pop_call_stats(self):
+        timings = self._stage_timings
+        if not timings:
+            return None
+        self._stage_timings = {}
+        return tuple(timings.items())
+
+    async def _get_database(self, dbname: str,
+                            dbver: int) -> CompilerDatabaseState:
+        db = self._cached_dbs.get(dbname)
+        if db is not None and db.dbver == dbver:
+            return db
+
+        self._cached_dbs.pop(dbname, None)
 
+        con_args = self._get_con_args(dbname)
         con = await asyncpg.connect(**con_args)
         try:
             im = intromech.IntrospectionMech(con)
@@ -113,22 +148,80 @@ class Compiler:
                 con_args=con_args,
                 schema=schema)
 
-            self._cached_db = db
+            self._cached_dbs[dbname] = db
             return db
         finally:
             await con.close()
 
+    def _get_con_args(self, dbname: str) -> dict:
+        con_args = self._connect_args.copy()
+        con_args['user'] = defines.EDGEDB_SUPERUSER
+        con_args['database'] = dbname
+        return con_args
+
+    def _dump_schema(self, schema: s_schema.Schema) -> bytes:
+        # Only the difference from the standard schema is serialized,
+        # as every worker has the standard schema loaded already.
+        delta = self._get_schema_delta(schema, self._get_std_schema())
+        return pickle.dumps(delta, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _load_schema(self, snapshot: bytes) -> s_schema.Schema:
+        delta = pickle.loads(snapshot)
+        return self._get_std_schema().apply_delta(delta)
+
+    def _dump_schema_delta(self, schema: s_schema.Schema,
+                           base_schema: s_schema.Schema) -> bytes:
+        delta = self._get_schema_delta(schema, base_schema)
+        return pickle.dumps(delta, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _get_schema_delta(
+            self, schema: s_schema.Schema,
+            base_schema: s_schema.Schema) -> s_schema.SchemaDelta:
+        delta = schema.get_delta(base_schema)
+        if delta.id_to_type is None:
+            return delta
+
+        # Migrations keep their DDL commands in the schema, and those
+        # cannot be unpickled.  Migrations are not introspected either,
+        # so leave them out: the other workers get the same schema as
+        # if they had introspected the database.  Schemas of workers
+        # never have migrations, and the standard schema has none,
+        # so only new objects are checked.
+        new_objects, _ = delta.id_to_type
+        migrations = [obj for obj in new_objects.values()
+                      if isinstance(obj, s_deltas.Delta)]
+        if not migrations:
+            return delta
+
+        for migration in migrations:
+            schema = schema.discard(migration)
+        return schema.get_delta(base_schema)
+
+    def _get_schema_fingerprint(
+            self, schema: s_schema.Schema) -> typing.Optional[bytes]:
+        if not self._query_cache:
+            return None
+        std_schema = self._get_std_schema()
+        h = hashlib.sha1(self._std_fingerprint)
+        h.update(schema.get_fingerprint(std_schema))
+        return h.digest()
+
     def _get_std_schema(self):
         if self._cached_std_schema is not None:
             return self._cached_std_schema
 
         with open(self._data_dir / 'stdschema.pickle', 'rb') as f:
+            data = f.read()
             try:
-                self._cached_std_schema = pickle.load(f)
+                self._cached_std_schema = pickle.loads(data)
             except Exception as e:
                 raise RuntimeError(
                     'could not load std schema pickle') from e
 
+        # The standard schema is produced by bootstrap, so its
+        # fingerprint is derived from the pickle.
+        self._std_fingerprint = hashlib.sha1(data).digest()
+
         return self._cached_std_schema
 
     def _hash_sql(self, sql: bytes, **kwargs: bytes):
@@ -170,17 +263,19 @@ class Compiler:
 
         current_tx = ctx.state.current_tx()
 
-        ir = ql_compiler.compile_ast_to_ir(
-            ql,
-            schema=current_tx.get_schema(),
-            modaliases=current_tx.get_modaliases(),
-            implicit_id_in_shapes=False)
+        with self._timeit('compile_eql_to_ir'):
+            ir = ql_compiler.compile_ast_to_ir(
+                ql,
+                schema=current_tx.get_schema(),
+                modaliases=current_tx.get_modaliases(),
+                implicit_id_in_shapes=False)
 
-        sql_text, argmap = pg_compiler.compile_ir_to_sql(
-            ir,
-            schema=ir.schema,
-            pretty=debug.flags.edgeql_compile,
-            output_format=ctx.output_format)
+        with self._timeit('compile_ir_to_sql'):
+            sql_text, argmap = pg_compiler.compile_ir_to_sql(
+                ir,
+                schema=ir.schema,
+                pretty=debug.flags.edgeql_compile,
+                output_format=ctx.output_format)
 
         sql_bytes = sql_text.encode(defines.EDGEDB_ENCODING)
 
@@ -199,6 +294,10 @@ class Compiler:
                     named = False
                     for param_name, param_type in ir.params.items():
                         subtypes[int(param_name)] = (param_name, param_type)
+                    if ctx.implicit_params:
+                        # Parameters that replace constants are
+                        # supplied by the server, not by the client.
+                        del subtypes[-ctx.implicit_params:]
                 else:
                     named = True
                     for param_name, param_type in ir.params.items():
@@ -453,12 +552,16 @@ class Compiler:
 
         eql = eql.decode()
         if ctx.graphql_mode:
-            eql = graphql.translate(
-                ctx.state.current_tx().get_schema(),
-                eql,
-                variables={}) + ';'
-
-        statements = edgeql.parse_block(eql)
+            # The translator produces EdgeQL ASTs, which are compiled
+            # directly rather than rendered and parsed again.
+            with self._timeit('graphql_translation'):
+                statements = graphql.translate_ast(
+                    ctx.state.current_tx().get_schema(),
+                    eql,
+                    variables={})
+        else:
+            with self._timeit('parse_eql'):
+                statements = edgeql.parse_block(eql)
 
         if ctx.single_query_mode and len(statements) > 1:
             raise errors.ProtocolError(
@@ -472,12 +575,13 @@ class Compiler:
             txid = ctx.state.current_tx().id
 
         for stmt in statements:
-            comp: dbstate.BaseQuery = self._compile_dispatch_ql(ctx, stmt)
-
             if ctx.legacy_mode and unit is not None:
+                self._finish_unit(ctx, unit)
                 units.append(unit)
                 unit = None
 
+            comp: dbstate.BaseQuery = self._compile_dispatch_ql(ctx, stmt)
+
             if unit is None:
                 unit = dbstate.QueryUnit(txid=txid, dbver=ctx.state.dbver)
 
@@ -512,6 +616,7 @@ class Compiler:
                     else:
                         unit.rollbacks_tx = True
 
+                    self._finish_unit(ctx, unit)
                     units.append(unit)
                     unit = None
 
@@ -523,20 +628,39 @@ class Compiler:
                 raise RuntimeError('unknown compile state')
 
         if unit is not None:
+            self._finish_unit(ctx, unit)
             units.append(unit)
 
         return units
 
-    async def _ctx_new_con_state(self, *, dbver: int, json_mode: bool,
+    def _finish_unit(self, ctx: CompileContext, unit: dbstate.QueryUnit):
+        if unit.commits_tx or (unit.has_ddl and unit.txid is None):
+            # The unit produces a new version of the schema once
+            # committed.  Attach the difference from the version the
+            # unit was compiled against, so that the other workers
+            # do not have to introspect the database.
+            schema = ctx.state.current_tx().get_schema()
+            if schema is ctx.state.base_schema and not unit.has_ddl:
+                # A transaction that has not changed the schema.
+                return
+            unit.schema_delta = self._dump_schema_delta(
+                schema, ctx.state.base_schema)
+            if self._query_cache and schema is not ctx.state.base_schema:
+                unit.schema_fingerprint = self._get_schema_fingerprint(
+                    schema)
+
+    async def _ctx_new_con_state(self, *, dbname: str, dbver: int,
+                                 json_mode: bool,
                                  single_query_mode: bool,
                                  modaliases, config,
                                  legacy_mode: bool,
-                                 graphql_mode: bool=False):
+                                 graphql_mode: bool=False,
+                                 implicit_params: int=0):
 
         assert isinstance(modaliases, immutables.Map)
         assert isinstance(config, immutables.Map)
 
-        db = await self._get_database(dbver)
+        db = await self._get_database(dbname, dbver)
         self._current_db_state = dbstate.CompilerConnectionState(
             dbver, db.schema, modaliases, config)
 
@@ -552,14 +676,16 @@ class Compiler:
             output_format=of,
             single_query_mode=single_query_mode,
             legacy_mode=legacy_mode,
-            graphql_mode=graphql_mode)
+            graphql_mode=graphql_mode,
+            implicit_params=implicit_params)
 
         return ctx
 
     async def _ctx_from_con_state(self, *, txid: int, json_mode: bool,
                                   single_query_mode: bool,
                                   legacy_mode: bool,
-                                  graphql_mode: bool=False):
+                                  graphql_mode: bool=False,
+                                  implicit_params: int=0):
         if (self._current_db_state is None or
                 self._current_db_state.current_tx().id != txid):
             self._current_db_state = None
@@ -578,32 +704,68 @@ class Compiler:
             output_format=of,
             single_query_mode=single_query_mode,
             legacy_mode=legacy_mode,
-            graphql_mode=graphql_mode)
+            graphql_mode=graphql_mode,
+            implicit_params=implicit_params)
 
         return ctx
 
     # API
 
-    async def connect(self, dbname: str, dbver: int) -> CompilerDatabaseState:
-        self._dbname = dbname
-        self._cached_db = None
-        await self._get_database(dbver)
+    async def introspect_database(
+            self, dbname: str,
+            dbver: int) -> typing.Tuple[bytes, typing.Optional[bytes]]:
+        """Introspect the database schema.
+
+        Return the schema snapshot and its fingerprint, if the
+        persistent query cache is enabled.
+        """
+        db = await self._get_database(dbname, dbver)
+        return (self._dump_schema(db.schema),
+                self._get_schema_fingerprint(db.schema))
+
+    async def set_database_schema(self, dbname: str, updates: list):
+        """Bring the database schema up to date.
+
+        *updates* is a list of (dbver, base dbver, data) tuples, where
+        data is either a full schema snapshot (base dbver is None),
+        or a delta from the schema of the base version.
+        """
+        for dbver, base_dbver, data in updates:
+            if base_dbver is None:
+                schema = self._load_schema(data)
+            else:
+                db = self._cached_dbs.get(dbname)
+                if db is None or db.dbver != base_dbver:
+                    # Out of sync; the schema will be introspected
+                    # on the next use.
+                    self._cached_dbs.pop(dbname, None)
+                    return
+                schema = db.schema.apply_delta(pickle.loads(data))
+
+            self._cached_dbs[dbname] = CompilerDatabaseState(
+                dbver=dbver,
+                con_args=self._get_con_args(dbname),
+                schema=schema)
 
     async def compile_eql(
             self,
+            dbname: str,
             dbver: int,
             eql: bytes,
             sess_modaliases: immutables.Map,
             sess_config: immutables.Map,
-            json_mode: bool) -> dbstate.QueryUnit:
+            json_mode: bool,
+            implicit_params: int=0) -> dbstate.QueryUnit:
 
         ctx = await self._ctx_new_con_state(
+            dbname=dbname,
             dbver=dbver,
             json_mode=json_mode,
             single_query_mode=True,
             modaliases=sess_modaliases,
             config=sess_config,
-            legacy_mode=False)
+            legacy_mode=False,
+            implicit_params=implicit_params)
 
         units = self._compile(ctx=ctx, eql=eql)
 
@@ -614,13 +776,15 @@ class Compiler:
             self,
             txid: int,
             eql: bytes,
-            json_mode: bool) -> dbstate.QueryUnit:
+            json_mode: bool,
+            implicit_params: int=0) -> dbstate.QueryUnit:
 
         ctx = await self._ctx_from_con_state(
             txid=txid,
             json_mode=json_mode,
             single_query_mode=True,
-            legacy_mode=False)
+            legacy_mode=False,
+            implicit_params=implicit_params)
 
         units = self._compile(ctx=ctx, eql=eql)
 
@@ -629,6 +793,7 @@ class Compiler:
 
     async def compile_eql_script(
             self,
+            dbname: str,
             dbver: int,
             eql: bytes,
             sess_modaliases: immutables.Map,
@@ -638,6 +803,7 @@ class Compiler:
             graphql_mode: bool) -> typing.List[dbstate.QueryUnit]:
 
         ctx = await self._ctx_new_con_state(
+            dbname=dbname,
             dbver=dbver,
             json_mode=json_mode,
             single_query_mode=False,
@@ -665,6 +831,6 @@ class Compiler:
 
         return self._compile(ctx=ctx, eql=eql)
 
-    async def interpret_backend_error(self, dbver, fields):
-        db = await self._get_database(dbver)
+    async def interpret_backend_error(self, dbname, dbver, fields):
+        db = await self._get_database(dbname, dbver)
         return errormech.interpret_backend_error(db.schema, fields)
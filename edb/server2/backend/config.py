@@ -33,4 +33,7 @@ class setting(typing.NamedTuple):
 
 configs = immutables.Map(
     __internal_testmode=setting(type=bool, default=False),
+
+    # Maximum time a query may run, in milliseconds; 0 means no limit.
+    statement_timeout=setting(type=int, default=0),
 )
@@ -104,6 +104,14 @@ class QueryUnit:
     config: typing.Optional[immutables.Map] = None
     modaliases: typing.Optional[immutables.Map] = None
 
+    # Serialized delta between the schema of the `dbver` version
+    # and the schema produced by DDL commands of this unit, which
+    # becomes the next version of the database once the unit
+    # is committed.
+    schema_delta: bytes = b''
+    # Fingerprint of the schema produced by the DDL commands.
+    schema_fingerprint: bytes = b''
+
     def is_preparable(self):
         """Answers the question: can this query be prepared and cached?"""
         prep = bool(self.sql and self.sql_hash and self.out_type_data)
@@ -204,6 +212,7 @@ class CompilerConnectionState:
                  modaliases: immutables.Map,
                  config: immutables.Map):
         self._dbver = dbver
+        self._base_schema = schema
         self._schema = schema
         self._modaliases = modaliases
         self._config = config
@@ -217,6 +226,10 @@ class CompilerConnectionState:
     def dbver(self):
         return self._dbver
 
+    @property
+    def base_schema(self) -> s_schema.Schema:
+        return self._base_schema
+
     def current_tx(self) -> Transaction:
         return self._current_tx
 
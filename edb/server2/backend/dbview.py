@@ -17,8 +17,11 @@
 #
 
 
+import dataclasses
+import hashlib
 import time
 import typing
+import weakref
 
 import immutables
 
@@ -26,34 +29,203 @@ from edb.server import defines
 from edb.lang.common import lru
 
 from . import dbstate
+from . import normalizer
+from . import querycache
 
 
 __all__ = ('DatabaseIndex', 'DatabaseConnectionView')
 
 
+class SessionState:
+    """Interned module aliases and config of a session.
+
+    Queries are compiled against the session state, so it is a part
+    of the compiled query cache key.  Connections with equal session
+    states share the same SessionState object, which makes the key
+    cheap to hash and compare.
+    """
+
+    __slots__ = ('modaliases', 'config', 'fingerprint', 'hits', 'misses',
+                 '__weakref__')
+
+    def __init__(self, modaliases: immutables.Map, config: immutables.Map):
+        self.modaliases = modaliases
+        self.config = config
+
+        h = hashlib.sha1()
+        h.update(repr(sorted(modaliases.items(), key=str)).encode())
+        h.update(repr(sorted(config.items())).encode())
+        self.fingerprint = h.hexdigest()[:16]
+
+        # Compiled query cache statistics.
+        self.hits = 0
+        self.misses = 0
+
+
 class Database:
 
     # Global LRU cache of compiled anonymous queries
-    _eql_to_compiled: typing.Mapping[bytes, dbstate.QueryUnit]
+    _eql_to_compiled: typing.Mapping[
+        typing.Tuple[bytes, bool, SessionState], dbstate.QueryUnit]
 
-    def __init__(self, name):
+    def __init__(self, name, *,
+                 query_cache: querycache.PersistentQueryCache=None,
+                 on_ddl: typing.Callable[[str], None]=None,
+                 metrics=None):
         self._name = name
         self._dbver = time.monotonic_ns()
+        self._metrics = metrics
+
+        # Called with the name of the database whenever its schema
+        # is changed by this server process.
+        self._on_ddl = on_ddl
+
+        # Fingerprint of the current version of the schema, if known;
+        # used to look up queries in the persistent query cache.
+        self._fingerprint = None
+        self._query_cache = query_cache
 
         self._eql_to_compiled = lru.LRUMapping(
+            maxsize=defines._MAX_QUERIES_CACHE,
+            on_evict=self._on_compiled_query_evicted)
+
+        # Compiled GraphQL documents run by the legacy protocol:
+        # (document, SessionState) -> tuple of QueryUnits.
+        self._graphql_to_compiled = lru.LRUMapping(
             maxsize=defines._MAX_QUERIES_CACHE)
 
-    def _signal_ddl(self):
+        # (modaliases, config) -> SessionState.  A state is forgotten
+        # once no connection or cached query refers to it.
+        self._session_states = weakref.WeakValueDictionary()
+
+        # Normalized queries that failed to compile while the
+        # original queries did not: some of their constants cannot
+        # be replaced with parameters.  All queries normalized into
+        # the same text have constants of the same types in the same
+        # places, so they are compiled as is.
+        self._not_normalizable = lru.LRUMapping(
+            maxsize=defines._MAX_QUERIES_CACHE)
+
+        # The serialized schema of a recent version of the database
+        # as a (dbver, snapshot) pair, and the deltas of the versions
+        # produced by DDL commands since then:
+        # dbver -> (base dbver, delta).
+        self._schema_snapshot = None
+        self._schema_deltas = {}
+
+    def _signal_ddl(self, qu: dbstate.QueryUnit):
+        base_dbver = self._dbver
         self._dbver = time.monotonic_ns()  # Advance the version
+        self._fingerprint = None
+        self._invalidate_caches()
+
+        if qu.schema_delta and qu.dbver == base_dbver:
+            # The DDL was compiled against the current version of the
+            # schema, so the delta can be applied by the compilers.
+            # Otherwise the database schema has been changed by
+            # someone else in the meantime and needs to be
+            # introspected.
+            self._schema_deltas[self._dbver] = (base_dbver, qu.schema_delta)
+            self._fingerprint = qu.schema_fingerprint or None
+
+        if self._on_ddl is not None:
+            self._on_ddl(self._name)
+
+    def _signal_external_ddl(self):
+        # The schema has been changed by another server process,
+        # so the new version can only be introspected.
+        self._dbver = time.monotonic_ns()
+        self._fingerprint = None
         self._invalidate_caches()
 
+    def _set_schema_fingerprint(self, dbver: int, fingerprint: bytes):
+        if dbver == self._dbver:
+            self._fingerprint = fingerprint
+
+    def _set_schema_snapshot(self, dbver: int, snapshot: bytes):
+        if (self._schema_snapshot is not None and
+                self._schema_snapshot[0] >= dbver):
+            return
+
+        self._schema_snapshot = (dbver, snapshot)
+        self._schema_deltas = {
+            ver: delta for ver, delta in self._schema_deltas.items()
+            if ver > dbver
+        }
+
+    def _get_schema_updates(self, known_dbver: typing.Optional[int],
+                            dbver: int):
+        """Return schema updates to go from *known_dbver* to *dbver*.
+
+        The result is a list of (dbver, base dbver, data) tuples,
+        where base dbver is None if data is a full snapshot.  None is
+        returned if *dbver* can only be obtained by introspection.
+        """
+        updates = []
+        while dbver != known_dbver:
+            delta = self._schema_deltas.get(dbver)
+            if delta is not None:
+                base_dbver, data = delta
+                updates.append((dbver, base_dbver, data))
+                dbver = base_dbver
+            elif (self._schema_snapshot is not None and
+                    self._schema_snapshot[0] == dbver):
+                updates.append((dbver, None, self._schema_snapshot[1]))
+                break
+            else:
+                return None
+
+        updates.reverse()
+        return updates
+
     def _invalidate_caches(self):
+        if self._metrics is not None and self._eql_to_compiled:
+            self._metrics.query_cache_evictions.inc(
+                len(self._eql_to_compiled), self._name, 'ddl')
         self._eql_to_compiled.clear()
+        self._graphql_to_compiled.clear()
+
+    def _on_compiled_query_evicted(self, key, compiled):
+        if self._metrics is not None:
+            self._metrics.query_cache_evictions.inc(1, self._name, 'lru')
+
+    def _record_query_cache_lookup(self, state: SessionState, hit: bool):
+        if hit:
+            state.hits += 1
+        else:
+            state.misses += 1
+        if self._metrics is not None:
+            self._metrics.query_cache_lookups.inc(
+                1, self._name, 'hit' if hit else 'miss')
+
+    def _intern_session_state(self, modaliases: immutables.Map,
+                              config: immutables.Map) -> SessionState:
+        key = (modaliases, config)
+        state = self._session_states.get(key)
+        if state is None:
+            state = SessionState(modaliases, config)
+            self._session_states[key] = state
+        return state
+
+    def _get_query_cache_stats(self) -> typing.List[dict]:
+        stats = []
+        for state in list(self._session_states.values()):
+            lookups = state.hits + state.misses
+            stats.append({
+                'fingerprint': state.fingerprint,
+                'modaliases': dict(state.modaliases),
+                'config': dict(state.config),
+                'hits': state.hits,
+                'misses': state.misses,
+                'hit_rate': state.hits / lookups if lookups else 0.0,
+            })
+        return stats
 
     def _cache_compiled_query(self, eql: bytes, json_mode: bool,
-                              compiled: dbstate.QueryUnit):
+                              compiled: dbstate.QueryUnit,
+                              state: SessionState):
         assert compiled.is_preparable()
-        key = (eql, json_mode)
+        key = (eql, json_mode, state)
         existing = self._eql_to_compiled.get(key)
         if existing is not None and existing.dbver > compiled.dbver:
             # We already have a cached query for a more recent DB version.
@@ -61,6 +233,43 @@ class Database:
 
         self._eql_to_compiled[key] = compiled
 
+        if (self._query_cache is not None and
+                self._fingerprint is not None and
+                compiled.dbver == self._dbver):
+            self._query_cache.set(
+                self._query_cache.make_key(
+                    self._fingerprint, eql, json_mode,
+                    state.modaliases, state.config),
+                compiled)
+
+    async def _lookup_persisted_query(self, eql: bytes, json_mode: bool,
+                                      state: SessionState):
+        if self._query_cache is None or self._fingerprint is None:
+            return None
+
+        dbver = self._dbver
+        compiled = await self._query_cache.get(
+            self._query_cache.make_key(
+                self._fingerprint, eql, json_mode,
+                state.modaliases, state.config))
+        if compiled is None or dbver != self._dbver:
+            # Not cached, or the schema has changed in the meantime.
+            return None
+
+        compiled = dataclasses.replace(compiled, dbver=dbver)
+        self._eql_to_compiled[(eql, json_mode, state)] = compiled
+        return compiled
+
+    def _normalize_query(self, eql: bytes) -> normalizer.NormalizedQuery:
+        # The result is not memoized: it could only be looked up by
+        # the original text, and the queries that benefit from
+        # normalization are exactly the ones whose texts differ.
+        normalized = normalizer.normalize(eql)
+        if (normalized.implicit_params and
+                self._not_normalizable.get(normalized.eql)):
+            return normalizer.not_normalized(eql)
+        return normalized
+
     def _new_view(self, *, user):
         return DatabaseConnectionView(self, user=user)
 
@@ -76,6 +285,7 @@ class DatabaseConnectionView:
 
         self._config = immutables.Map()
         self._modaliases = immutables.Map({None: 'default'})
+        self._set_session_state(self._modaliases, self._config)
 
         # Whenever we are in a transaction that had executed a
         # DDL command, we use this cache for compiled queries.
@@ -84,6 +294,15 @@ class DatabaseConnectionView:
 
         self._new_tx_state()
 
+    def _set_session_state(self, modaliases: immutables.Map,
+                           config: immutables.Map):
+        self._session_state = self._db._intern_session_state(
+            modaliases, config)
+        # Use the interned maps, so that equal session states are
+        # passed to the compiler as the same objects.
+        self._modaliases = self._session_state.modaliases
+        self._config = self._session_state.config
+
     def _invalidate_local_cache(self):
         self._eql_to_compiled.clear()
 
@@ -128,16 +347,34 @@ class DatabaseConnectionView:
                              json_mode: bool,
                              compiled: dbstate.QueryUnit):
         if self._in_tx_with_ddl:
-            self._eql_to_compiled[(eql, json_mode)] = compiled
+            self._eql_to_compiled[
+                (eql, json_mode, self._session_state)] = compiled
         else:
-            self._db._cache_compiled_query(eql, json_mode, compiled)
+            self._db._cache_compiled_query(
+                eql, json_mode, compiled, self._session_state)
+
+    def normalize_query(self, eql: bytes) -> normalizer.NormalizedQuery:
+        return self._db._normalize_query(eql)
+
+    def disable_query_normalization(
+            self, eql: bytes,
+            normalized: normalizer.NormalizedQuery
+    ) -> normalizer.NormalizedQuery:
+        """Make queries normalized as *normalized* compiled as is.
+
+        Used when a normalized query fails to compile: some constants
+        cannot be replaced with parameters.  Return *eql* as is.
+        """
+        self._db._not_normalizable[normalized.eql] = True
+        return normalizer.not_normalized(eql)
 
     def lookup_compiled_query(
             self, eql: bytes,
             json_mode: bool) -> typing.Optional[dbstate.QueryUnit]:
 
         compiled: dbstate.QueryUnit
-        key = (eql, json_mode)
+        state = self._session_state
+        key = (eql, json_mode, state)
 
         if self._in_tx_with_ddl:
             compiled = self._eql_to_compiled.get(key)
@@ -146,8 +383,45 @@ class DatabaseConnectionView:
             if compiled is not None and compiled.dbver != self.dbver:
                 compiled = None
 
+        self._db._record_query_cache_lookup(state, compiled is not None)
         return compiled
 
+    def lookup_compiled_graphql(
+            self, document: bytes
+    ) -> typing.Optional[typing.Tuple[dbstate.QueryUnit, ...]]:
+        """Look up the compiled queries of a GraphQL document.
+
+        Units compiled in a transaction carry its id, so the cache
+        is only used outside of transactions.
+        """
+        if self._in_tx:
+            return None
+
+        state = self._session_state
+        units = self._db._graphql_to_compiled.get((document, state))
+        if units is not None and units[0].dbver != self.dbver:
+            units = None
+
+        self._db._record_query_cache_lookup(state, units is not None)
+        return units
+
+    def cache_compiled_graphql(self, document: bytes,
+                               units: typing.List[dbstate.QueryUnit]):
+        if (self._in_tx or not units or units[0].dbver != self.dbver or
+                not all(unit.is_preparable() for unit in units)):
+            return
+        self._db._graphql_to_compiled[(document, self._session_state)] = (
+            tuple(units))
+
+    async def lookup_persisted_query(
+            self, eql: bytes,
+            json_mode: bool) -> typing.Optional[dbstate.QueryUnit]:
+        """Look up a query missing from the in-memory cache on disk."""
+        if self._in_tx_with_ddl:
+            return None
+        return await self._db._lookup_persisted_query(
+            eql, json_mode, self._session_state)
+
     def tx_error(self):
         if self._in_tx:
             self._tx_error = True
@@ -156,43 +430,68 @@ class DatabaseConnectionView:
         self._txid = qu.txid
         if qu.starts_tx:
             self._in_tx = True
-            if qu.has_ddl:
-                self._in_tx_with_ddl
+        if self._in_tx and qu.has_ddl:
+            self._in_tx_with_ddl = True
 
     def on_error(self, qu: dbstate.QueryUnit):
         self.tx_error()
 
     def on_success(self, qu: dbstate.QueryUnit):
         if not self._in_tx and qu.has_ddl:
-            self._db._signal_ddl()
+            self._db._signal_ddl(qu)
 
         if qu.commits_tx:
             assert self._in_tx
             if self._in_tx_with_ddl:
-                self._db._signal_ddl()
+                self._db._signal_ddl(qu)
             self._new_tx_state()
 
         elif qu.rollbacks_tx:
             assert self._in_tx
             self._new_tx_state()
 
-        if qu.config:
-            self._config = qu.config
-
-        if qu.modaliases:
-            self._modaliases = qu.modaliases
+        if qu.config or qu.modaliases:
+            self._set_session_state(
+                qu.modaliases or self._modaliases,
+                qu.config or self._config)
 
 
 class DatabaseIndex:
 
-    def __init__(self):
+    def __init__(self, *,
+                 query_cache: querycache.PersistentQueryCache=None,
+                 on_ddl: typing.Callable[[str], None]=None,
+                 metrics=None):
         self._dbs = {}
+        self._query_cache = query_cache
+        self._on_ddl = on_ddl
+        self._metrics = metrics
+
+    def get_db(self, dbname: str) -> Database:
+        return self._dbs[dbname]
+
+    def signal_external_ddl(self, dbname: str):
+        """Advance the version of a database changed by another process."""
+        db = self._dbs.get(dbname)
+        if db is not None:
+            db._signal_external_ddl()
+
+    def get_query_cache_stats(self) -> typing.Dict[str, typing.List[dict]]:
+        """Return compiled query cache statistics of every database.
+
+        The statistics are broken down by session state.
+        """
+        return {
+            dbname: db._get_query_cache_stats()
+            for dbname, db in self._dbs.items()
+        }
 
     def new_view(self, dbname: str, *, user: str) -> DatabaseConnectionView:
         try:
             db = self._dbs[dbname]
         except KeyError:
-            db = Database(dbname)
+            db = Database(dbname, query_cache=self._query_cache,
+                          on_ddl=self._on_ddl, metrics=self._metrics)
             self._dbs[dbname] = db
 
         return db._new_view(user=user)
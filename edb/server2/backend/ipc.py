@@ -0,0 +1,289 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""Encoding of the messages exchanged with compiler workers.
+
+Compiler calls are dominated by two kinds of values: the session state
+(module aliases and config) that is sent with every compile request,
+and the compiled QueryUnits.  Both are highly repetitive: session
+state rarely changes, and type descriptors and ids are shared by many
+queries.  CompilerCodec sends a value like that in full only once per
+worker connection, and refers to it by a slot number afterwards.
+
+A message is a pickled tuple of the method name and the arguments of
+a request, or of the status and the result of a response.  Session
+state maps and QueryUnits among those are replaced by slot numbers and
+fixed-layout tuples respectively.  Nested values are pickled as is.
+"""
+
+
+import pickle
+
+import immutables
+
+from edb.server2 import procpool
+
+from . import dbstate
+
+
+__all__ = ('CompilerCodec',)
+
+
+# Message flags.
+
+# The sender has forgotten the values that it had sent before.
+_FLAG_RESET = 1 << 0
+
+
+# Kinds of the values of a message.
+_K_PLAIN = ord('v')
+_K_MAP = ord('m')
+_K_UNIT = ord('U')
+_K_UNIT_LIST = ord('L')
+
+
+# QueryUnit flags.
+_UNIT_HAS_DDL = 1 << 0
+_UNIT_COMMITS_TX = 1 << 1
+_UNIT_ROLLBACKS_TX = 1 << 2
+_UNIT_STARTS_TX = 1 << 3
+
+
+class _OutgoingTable:
+    """Values that have been sent to the other end of the connection.
+
+    The table has a fixed number of slots that are reused in a round
+    robin fashion, so the receiving end can mirror it without slot
+    numbers being sent along with new values.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._slots = [None] * size
+        self._index = {}
+        self._next = 0
+
+    def lookup(self, key) -> int:
+        return self._index.get(key, -1)
+
+    def add(self, key, value):
+        slot = self._next
+        self._next = (slot + 1) % self._size
+
+        evicted = self._slots[slot]
+        if evicted is not None:
+            del self._index[evicted[0]]
+
+        # Keep a reference to the value: some keys are object ids,
+        # which must not be reused while they are in the table.
+        self._slots[slot] = (key, value)
+        self._index[key] = slot
+
+
+class _IncomingTable:
+    """A mirror of the _OutgoingTable of the other end."""
+
+    def __init__(self, size):
+        self._size = size
+        self._slots = [None] * size
+        self._next = 0
+
+    def __getitem__(self, slot):
+        return self._slots[slot]
+
+    def add(self, value):
+        slot = self._next
+        self._next = (slot + 1) % self._size
+        self._slots[slot] = value
+
+
+class CompilerCodec(procpool.PickleCodec):
+
+    # The number of session states (module aliases and config maps)
+    # remembered by each end of the connection.
+    MAPS_TABLE_SIZE = 1024
+    # The number of type descriptors, type ids and SQL hashes
+    # remembered by each end of the connection.
+    BYTES_TABLE_SIZE = 8192
+
+    def __init__(self):
+        self._clear_outgoing()
+        self._clear_incoming()
+        self._reset_sent = False
+
+    def _clear_outgoing(self):
+        # Session state is interned by identity: the maps are
+        # immutable, and a connection sends the same map object
+        # for as long as its state does not change.
+        self._out_maps = _OutgoingTable(self.MAPS_TABLE_SIZE)
+        self._out_bytes = _OutgoingTable(self.BYTES_TABLE_SIZE)
+        self._reset_sent = True
+
+    def _clear_incoming(self):
+        self._in_maps = _IncomingTable(self.MAPS_TABLE_SIZE)
+        self._in_bytes = _IncomingTable(self.BYTES_TABLE_SIZE)
+
+    def encode_request(self, method_name: str, args: tuple) -> bytes:
+        return self._encode((method_name,) + args)
+
+    def decode_request(self, data: bytes) -> tuple:
+        values = self._decode(data)
+        return values[0], values[1:]
+
+    def encode_response(self, data: tuple) -> bytes:
+        return self._encode(data)
+
+    def decode_response(self, data: bytes) -> tuple:
+        return self._decode(data)
+
+    def _encode(self, values: tuple) -> bytes:
+        flags = 0
+        if self._reset_sent:
+            flags |= _FLAG_RESET
+
+        kinds = bytearray()
+        encoded = []
+        try:
+            for value in values:
+                cls = type(value)
+                if cls is immutables.Map:
+                    kinds.append(_K_MAP)
+                    value = self._encode_map(value)
+                elif cls is dbstate.QueryUnit:
+                    kinds.append(_K_UNIT)
+                    value = self._encode_unit(value)
+                elif (cls is list and value and
+                        all(type(v) is dbstate.QueryUnit for v in value)):
+                    kinds.append(_K_UNIT_LIST)
+                    value = [self._encode_unit(v) for v in value]
+                else:
+                    kinds.append(_K_PLAIN)
+                encoded.append(value)
+
+            data = pickle.dumps(
+                (flags, bytes(kinds), encoded),
+                protocol=pickle.HIGHEST_PROTOCOL)
+        except BaseException:
+            # Some values might have been added to the outgoing
+            # tables, but they are never going to reach the other end.
+            self._clear_outgoing()
+            raise
+
+        self._reset_sent = False
+        return data
+
+    def _decode(self, data: bytes) -> tuple:
+        flags, kinds, encoded = pickle.loads(data)
+        if flags & _FLAG_RESET:
+            self._clear_incoming()
+
+        values = []
+        for kind, value in zip(kinds, encoded):
+            if kind == _K_MAP:
+                value = self._decode_map(value)
+            elif kind == _K_UNIT:
+                value = self._decode_unit(value)
+            elif kind == _K_UNIT_LIST:
+                value = [self._decode_unit(v) for v in value]
+            values.append(value)
+        return tuple(values)
+
+    def _encode_map(self, value: immutables.Map):
+        key = id(value)
+        slot = self._out_maps.lookup(key)
+        if slot >= 0:
+            return slot
+        else:
+            self._out_maps.add(key, value)
+            return tuple(value.items())
+
+    def _decode_map(self, value):
+        if type(value) is int:
+            return self._in_maps[value]
+        else:
+            value = immutables.Map(value)
+            self._in_maps.add(value)
+            return value
+
+    def _encode_bytes(self, value: bytes):
+        slot = self._out_bytes.lookup(value)
+        if slot >= 0:
+            return slot
+        else:
+            self._out_bytes.add(value, value)
+            return value
+
+    def _decode_bytes(self, value):
+        if type(value) is int:
+            return self._in_bytes[value]
+        else:
+            self._in_bytes.add(value)
+            return value
+
+    def _encode_unit(self, unit: dbstate.QueryUnit) -> tuple:
+        flags = 0
+        if unit.has_ddl:
+            flags |= _UNIT_HAS_DDL
+        if unit.commits_tx:
+            flags |= _UNIT_COMMITS_TX
+        if unit.rollbacks_tx:
+            flags |= _UNIT_ROLLBACKS_TX
+        if unit.starts_tx:
+            flags |= _UNIT_STARTS_TX
+
+        encode_bytes = self._encode_bytes
+        return (
+            flags,
+            unit.dbver,
+            unit.txid,
+            unit.sql,
+            encode_bytes(unit.sql_hash),
+            encode_bytes(unit.out_type_data),
+            encode_bytes(unit.out_type_id),
+            encode_bytes(unit.in_type_data),
+            encode_bytes(unit.in_type_id),
+            unit.config,
+            unit.modaliases,
+            unit.schema_delta,
+            unit.schema_fingerprint,
+        )
+
+    def _decode_unit(self, value: tuple) -> dbstate.QueryUnit:
+        (flags, dbver, txid, sql, sql_hash,
+         out_type_data, out_type_id, in_type_data, in_type_id,
+         config, modaliases, schema_delta, schema_fingerprint) = value
+
+        decode_bytes = self._decode_bytes
+        return dbstate.QueryUnit(
+            dbver=dbver,
+            txid=txid,
+            sql=sql,
+            sql_hash=decode_bytes(sql_hash),
+            has_ddl=bool(flags & _UNIT_HAS_DDL),
+            commits_tx=bool(flags & _UNIT_COMMITS_TX),
+            rollbacks_tx=bool(flags & _UNIT_ROLLBACKS_TX),
+            starts_tx=bool(flags & _UNIT_STARTS_TX),
+            out_type_data=decode_bytes(out_type_data),
+            out_type_id=decode_bytes(out_type_id),
+            in_type_data=decode_bytes(in_type_data),
+            in_type_id=decode_bytes(in_type_id),
+            config=config,
+            modaliases=modaliases,
+            schema_delta=schema_delta,
+            schema_fingerprint=schema_fingerprint)
@@ -0,0 +1,209 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""Extraction of constants from EdgeQL queries.
+
+Queries that only differ in the values of literal constants are
+normalized into the same text, in which the constants are replaced
+with positional parameters following the parameters of the query
+itself.  Such queries share one compiled QueryUnit and one backend
+prepared statement; the extracted values are sent to the backend
+along with the arguments supplied by the client.
+
+Normalization works on tokens rather than on the AST, as it is done
+for every query in the server process, before the compiled query
+cache is looked up.
+"""
+
+
+import struct
+import typing
+
+from edb.lang.common import lexer as base_lexer
+from edb.lang.edgeql.parser.grammar import lexer
+from edb.lang.edgeql.parser.grammar import lexutils
+
+
+__all__ = ('NormalizedQuery', 'normalize', 'not_normalized')
+
+
+class NormalizedQuery(typing.NamedTuple):
+
+    eql: bytes
+    # The number of parameters that replace constants in `eql`;
+    # they are not exposed to the client.
+    implicit_params: int
+    # The values of the constants encoded as backend bind arguments.
+    implicit_args: bytes
+
+
+# Only queries are normalized, DDL and commands that are evaluated
+# by the compiler (e.g. SET) must see the actual values.
+_QUERY_TOKENS = frozenset(
+    ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'FOR', 'GROUP'))
+
+_NON_QUERY_TOKENS = frozenset(
+    ('CREATE', 'ALTER', 'DROP', 'START', 'COMMIT', 'ROLLBACK',
+     'DECLARE', 'RELEASE'))
+
+# Integers that follow these tokens are tuple element references
+# or parameter numbers rather than constants.
+_NON_CONSTANT_PREFIXES = frozenset(('.', '.<', '.>', '@', '$'))
+
+# The values of these clauses have to be known at compile time
+# to infer the cardinality of the query.
+_INLINE_CLAUSES = frozenset(('LIMIT', 'OFFSET'))
+
+_OPEN_BRACKETS = frozenset(('(', '[', '{'))
+_CLOSE_BRACKETS = frozenset((')', ']', '}'))
+
+_INT64_MAX = 2 ** 63 - 1
+
+_int64_arg = struct.Struct('!iq')
+_float64_arg = struct.Struct('!id')
+_length = struct.Struct('!i')
+
+_edgeql_lexer = lexer.EdgeQLLexer()
+
+
+def not_normalized(eql: bytes) -> NormalizedQuery:
+    return NormalizedQuery(eql=eql, implicit_params=0, implicit_args=b'')
+
+
+def _extract_constant(tok):
+    """Return (type name, encoded argument) for a constant token."""
+
+    if tok.type == 'ICONST':
+        value = int(tok.value)
+        if value > _INT64_MAX:
+            # Becomes a std::decimal constant.
+            return None
+        return 'std::int64', _int64_arg.pack(8, value)
+
+    elif tok.type == 'FCONST':
+        return 'std::float64', _float64_arg.pack(8, float(tok.value))
+
+    elif tok.type == 'SCONST':
+        match = lexutils.VALID_STRING_RE.match(tok.value)
+        if match is None:
+            return None
+        body = match.group('body')
+        if '\\' in body:
+            # Leave escape sequences to the compiler.
+            return None
+        value = body.encode('utf-8')
+        return 'std::str', _length.pack(len(value)) + value
+
+    elif tok.type == 'RSCONST':
+        match = lexutils.VALID_RAW_STRING_RE.match(tok.value)
+        if match is None:
+            return None
+        value = match.group('body').encode('utf-8')
+        return 'std::str', _length.pack(len(value)) + value
+
+    elif tok.type == 'BCONST':
+        match = lexutils.VALID_BYTES_RE.match(tok.value)
+        if match is None:
+            return None
+        body = match.group('body')
+        if '\\' in body or not body.isascii():
+            return None
+        value = body.encode('ascii')
+        return 'std::bytes', _length.pack(len(value)) + value
+
+    return None
+
+
+def normalize(eql: bytes) -> NormalizedQuery:
+    """Replace constants in an EdgeQL query with parameters.
+
+    Queries that cannot be normalized (e.g. DDL, queries with named
+    parameters or invalid queries) are returned as is.
+    """
+
+    try:
+        text = eql.decode('utf-8')
+        _edgeql_lexer.setinputstr(text)
+        tokens = list(_edgeql_lexer.lex())
+    except (UnicodeDecodeError, base_lexer.LexError):
+        return not_normalized(eql)
+
+    if not tokens or tokens[0].type not in _QUERY_TOKENS:
+        return not_normalized(eql)
+
+    constants = []
+    num_params = 0
+    depth = 0
+    # The nesting depth of a LIMIT or OFFSET clause being lexed.
+    inline_depth = None
+    prev = None
+
+    for tok in tokens:
+        tok_type = tok.type
+
+        if tok_type in _NON_QUERY_TOKENS:
+            return not_normalized(eql)
+
+        elif prev is not None and prev.type == '$':
+            if tok_type != 'ICONST':
+                # Named parameters cannot be mixed with the
+                # positional ones that replace the constants.
+                return not_normalized(eql)
+            num_params = max(num_params, int(tok.value) + 1)
+
+        elif tok_type in _OPEN_BRACKETS:
+            depth += 1
+
+        elif tok_type in _CLOSE_BRACKETS:
+            depth -= 1
+            if inline_depth is not None and depth < inline_depth:
+                inline_depth = None
+
+        elif tok_type == ';':
+            inline_depth = None
+
+        elif tok_type in _INLINE_CLAUSES:
+            if inline_depth is None:
+                inline_depth = depth
+
+        elif (inline_depth is None and
+                (prev is None or prev.type not in _NON_CONSTANT_PREFIXES)):
+            constant = _extract_constant(tok)
+            if constant is not None:
+                constants.append((tok, constant))
+
+        prev = tok
+
+    if not constants:
+        return not_normalized(eql)
+
+    chunks = []
+    args = []
+    pos = 0
+    for i, (tok, (type_name, arg)) in enumerate(constants, num_params):
+        chunks.append(text[pos:tok.start.pointer])
+        chunks.append(f'<{type_name}>${i}')
+        args.append(arg)
+        pos = tok.end.pointer
+    chunks.append(text[pos:])
+
+    return NormalizedQuery(
+        eql=''.join(chunks).encode('utf-8'),
+        implicit_params=len(constants),
+        implicit_args=b''.join(args))
@@ -0,0 +1,190 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import pickle
+import sqlite3
+import threading
+import typing
+
+import immutables
+
+from . import dbstate
+
+
+__all__ = ('PersistentQueryCache',)
+
+
+logger = logging.getLogger('edb.server')
+
+
+# Bump this whenever the layout of QueryUnit or the way queries
+# are compiled changes incompatibly.
+_CACHE_FORMAT_VERSION = b'1'
+
+
+class PersistentQueryCache:
+    """On-disk cache of compiled queries.
+
+    The cache is an SQLite database, so it can be shared by multiple
+    server processes, and it survives server restarts.  Entries are
+    keyed by the fingerprint of the database schema rather than by
+    its version, as the latter is local to the server process.
+
+    The database is only accessed from a dedicated thread, so that
+    a slow disk or a lock held by another process never blocks the
+    event loop.  Writes are queued and committed in batches.
+    """
+
+    def __init__(self, path: str, *, max_size: int=100_000):
+        self._path = path
+        self._max_size = max_size
+        self._db = None
+        self._executor = None
+
+        # Entries not yet written to the database; guarded by
+        # self._lock as they are consumed by the worker thread.
+        self._pending = {}
+        self._flush_scheduled = False
+        self._lock = threading.Lock()
+
+    def open(self):
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='edgedb-query-cache')
+        self._executor.submit(self._open).result()
+
+    def close(self):
+        if self._executor is not None:
+            # Waits for the queued writes to be flushed.
+            self._executor.submit(self._close)
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @staticmethod
+    def make_key(fingerprint: bytes, eql: bytes, json_mode: bool,
+                 modaliases: immutables.Map,
+                 config: immutables.Map) -> bytes:
+        h = hashlib.sha1(_CACHE_FORMAT_VERSION)
+        h.update(fingerprint)
+        h.update(b'j' if json_mode else b'n')
+        h.update(repr(sorted(modaliases.items(), key=str)).encode())
+        h.update(repr(sorted(config.items())).encode())
+        h.update(eql)
+        return h.digest()
+
+    async def get(self, key: bytes) -> typing.Optional[dbstate.QueryUnit]:
+        if self._executor is None:
+            return None
+
+        with self._lock:
+            data = self._pending.get(key)
+        if data is None:
+            loop = asyncio.get_event_loop()
+            data = await loop.run_in_executor(self._executor, self._get, key)
+            if data is None:
+                return None
+
+        try:
+            return pickle.loads(data)
+        except Exception as e:
+            # Most likely the entry was written by an incompatible
+            # version of the server.
+            logger.warning('could not load a query from the cache: %s', e)
+            self._executor.submit(self._delete, key)
+            return None
+
+    def set(self, key: bytes, unit: dbstate.QueryUnit):
+        if self._executor is None:
+            return
+
+        data = pickle.dumps(unit, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._pending[key] = data
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        self._executor.submit(self._flush)
+
+    # The methods below run in the worker thread.
+
+    def _open(self):
+        # Autocommit mode: transactions are started explicitly.
+        self._db = sqlite3.connect(
+            self._path, timeout=0.1, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS queries (
+                key BLOB PRIMARY KEY,
+                unit BLOB NOT NULL
+            )
+        ''')
+
+        # Evict the oldest entries.
+        self._db.execute('''
+            DELETE FROM queries WHERE rowid <= (
+                SELECT max(rowid) FROM queries) - ?
+        ''', (self._max_size,))
+
+    def _close(self):
+        self._flush()
+        self._db.close()
+        self._db = None
+
+    def _get(self, key: bytes) -> typing.Optional[bytes]:
+        try:
+            row = self._db.execute(
+                'SELECT unit FROM queries WHERE key = ?',
+                (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning('could not read from the query cache: %s', e)
+            return None
+
+        if row is None:
+            return None
+        return row[0]
+
+    def _delete(self, key: bytes):
+        try:
+            self._db.execute('DELETE FROM queries WHERE key = ?', (key,))
+        except sqlite3.Error as e:
+            logger.warning('could not write to the query cache: %s', e)
+
+    def _flush(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._flush_scheduled = False
+
+        if not pending:
+            return
+
+        try:
+            with self._db:
+                self._db.execute('BEGIN')
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO queries (key, unit) '
+                    'VALUES (?, ?)',
+                    pending.items())
+        except sqlite3.Error as e:
+            # Most likely the database is locked by another process.
+            logger.warning('could not write to the query cache: %s', e)
@@ -47,11 +47,13 @@ cdef class EdgeConnection:
         bint _parsing
         bint _reading_messages
         str _id
+        int32_t _secret
         object _transport
 
         object server
         object backend
         object loop
+        object metrics
         readonly object dbview
 
         ReadBuffer buffer
@@ -62,15 +64,42 @@ cdef class EdgeConnection:
         object _main_task
 
         object _last_anon_compiled
+        object _last_anon_normalized
+        dict _prepared_stmts
         WriteBuffer _write_buf
 
+        object _write_waiter
+        double _write_paused_at
+
+        # When the query that is being executed was sent to the
+        # backend, and how much of its data has been relayed so far.
+        double _query_started_at
+        int64_t _query_relayed_bytes
+
+        # Fires when the query that is being executed runs longer
+        # than the statement_timeout setting allows.
+        object _statement_timer
+        bint _statement_timed_out
+
     cdef write(self, WriteBuffer buf)
+    cdef write_data(self, WriteBuffer buf)
     cdef flush(self)
+    cdef bint is_writing_paused(self)
 
     cdef fallthrough(self, bint ignore_unhandled)
 
     cdef pgcon_last_sync_status(self)
 
-    cdef WriteBuffer recode_bind_args(self, bytes bind_args)
+    cdef WriteBuffer recode_bind_args(self, bytes bind_args, normalized)
 
     cdef make_describe_response(self, compiled)
+
+    cdef on_batch_query_complete(self, query)
+
+    cdef start_query_metrics(self)
+    cdef finish_query_metrics(self)
+
+    cdef start_statement_timer(self)
+    cdef stop_statement_timer(self)
+
+    cdef release_compiler_if_idle(self, units)
@@ -41,12 +41,15 @@ from edb.server2.pgcon cimport pgcon
 from edb.server2.pgcon import errors as pgerror
 
 import asyncio
+import secrets
+import time
 
 from edb import errors
 from edb.lang.common import debug
 
 
 DEF FLUSH_BUFFER_AFTER = 100_000
+DEF WRITE_BUFFER_HIGH_WATER = 4 * FLUSH_BUFFER_AFTER
 
 
 @cython.final
@@ -55,9 +58,12 @@ cdef class EdgeConnection:
     def __init__(self, server):
         self._con_status = EDGECON_NEW
         self._id = server.new_edgecon_id()
+        # Authorizes requests to cancel queries of this connection.
+        self._secret = secrets.randbits(31)
         self.server = server
 
         self.loop = server.get_loop()
+        self.metrics = server.get_metrics()
         self.dbview = None
         self.backend = None
 
@@ -72,9 +78,24 @@ cdef class EdgeConnection:
         self._msg_take_waiter = None
 
         self._last_anon_compiled = None
+        self._last_anon_normalized = None
+        # Named prepared statements:
+        # name -> (eql, normalized query, compiled query).
+        self._prepared_stmts = {}
 
         self._write_buf = None
 
+        # Set while the transport is paused: the client does not
+        # read the data fast enough.
+        self._write_waiter = None
+        self._write_paused_at = 0
+
+        self._query_started_at = 0
+        self._query_relayed_bytes = 0
+
+        self._statement_timer = None
+        self._statement_timed_out = False
+
     cdef write(self, WriteBuffer buf):
         # One rule for this method: don't write partial messages.
         if self._write_buf is not None:
@@ -84,19 +105,40 @@ cdef class EdgeConnection:
         else:
             self._write_buf = buf
 
+    cdef write_data(self, WriteBuffer buf):
+        # Query results relayed from the backend.
+        self._query_relayed_bytes += buf.len()
+        self.write(buf)
+
     cdef flush(self):
         if self._write_buf is not None and self._write_buf.len():
             buf = self._write_buf
             self._write_buf = None
             self._transport.write(buf)
 
+    cdef bint is_writing_paused(self):
+        return self._write_waiter is not None
+
+    async def wait_for_writing(self):
+        """Wait until the client has read enough of the sent data."""
+        if self._write_waiter is not None:
+            await self._write_waiter
+
     async def wait_for_message(self):
         if self.buffer.take_message():
             return
+        if self._transport is None:
+            # The client disconnected while a query was running.
+            raise ConnectionAbortedError()
         self._msg_take_waiter = self.loop.create_future()
         await self._msg_take_waiter
 
     async def auth(self):
+        """Authenticate the client.
+
+        Return False if the client sent a cancellation request
+        instead, in which case the connection is closed.
+        """
         cdef:
             int16_t hi
             int16_t lo
@@ -124,8 +166,7 @@ cdef class EdgeConnection:
             # XXX implement auth
             self.dbview = self.server.new_view(
                 dbname=database, user=user)
-            self.backend = await self.server.new_backend(
-                dbname=database, dbver=self.dbview.dbver)
+            self.backend = await self.server.new_backend(dbname=database)
 
             buf = WriteBuffer()
 
@@ -134,8 +175,10 @@ cdef class EdgeConnection:
             msg_buf.end_message()
             buf.write_buffer(msg_buf)
 
+            # The client needs these to cancel its queries.
             msg_buf = WriteBuffer.new_message(b'K')
-            msg_buf.write_int32(0)  # TODO: should send ID of this connection
+            msg_buf.write_int32(int(self._id))
+            msg_buf.write_int32(self._secret)
             msg_buf.end_message()
             buf.write_buffer(msg_buf)
 
@@ -148,49 +191,99 @@ cdef class EdgeConnection:
             self.flush()
 
             self.buffer.finish_message()
+            return True
+
+        elif mtype == b'c':
+            # CancelRequest: the connection that runs the query is
+            # busy, so the client sends the request over a new one.
+            con_id = self.buffer.read_int32()
+            secret = self.buffer.read_int32()
+            self.buffer.finish_message()
+
+            self.server.cancel_edgecon(con_id, secret)
+            self._transport.close()
+            return False
 
         else:
             self.fallthrough(False)
 
     #############
 
-    async def _compile(self, bytes eql, bint json_mode):
-        if self.dbview.in_tx:
-            return await self.backend.compiler.call(
-                'compile_eql_in_tx',
-                self.dbview.txid,
-                eql,
-                json_mode)
-        else:
-            return await self.backend.compiler.call(
-                'compile_eql',
-                self.dbview.dbver,
-                eql,
-                self.dbview.modaliases,
-                self.dbview.config,
-                json_mode)
+    cdef release_compiler_if_idle(self, units):
+        # Compiler workers are shared by all connections, except for
+        # the worker that holds the state of an open explicit
+        # transaction: it stays pinned to this connection until the
+        # transaction is over.
+        cdef bint in_tx = self.dbview.in_tx
+
+        if units is not None:
+            for unit in units:
+                if unit.starts_tx:
+                    in_tx = True
+                if unit.commits_tx or unit.rollbacks_tx:
+                    in_tx = False
+
+        if not in_tx:
+            self.backend.release_compiler()
+
+    async def _compile(self, bytes eql, bint json_mode,
+                       int implicit_params=0):
+        try:
+            if self.dbview.in_tx:
+                unit = await self.backend.compile(
+                    'compile_eql_in_tx',
+                    self.dbview.txid,
+                    eql,
+                    json_mode,
+                    implicit_params)
+            else:
+                unit = await self.backend.compile(
+                    'compile_eql',
+                    self.dbview.dbname,
+                    self.dbview.dbver,
+                    eql,
+                    self.dbview.modaliases,
+                    self.dbview.config,
+                    json_mode,
+                    implicit_params,
+                    dbver=self.dbview.dbver)
+        except Exception:
+            self.release_compiler_if_idle(None)
+            raise
+
+        self.release_compiler_if_idle((unit,))
+        return unit
 
     async def _compile_script(self, bytes eql, bint json_mode,
                               bint legacy_mode, bint graphql_mode):
 
-        if self.dbview.in_tx:
-            return await self.backend.compiler.call(
-                'compile_eql_script_in_tx',
-                self.dbview.txid,
-                eql,
-                json_mode,
-                legacy_mode,
-                graphql_mode)
-        else:
-            return await self.backend.compiler.call(
-                'compile_eql_script',
-                self.dbview.dbver,
-                eql,
-                self.dbview.modaliases,
-                self.dbview.config,
-                json_mode,
-                legacy_mode,
-                graphql_mode)
+        try:
+            if self.dbview.in_tx:
+                units = await self.backend.compile(
+                    'compile_eql_script_in_tx',
+                    self.dbview.txid,
+                    eql,
+                    json_mode,
+                    legacy_mode,
+                    graphql_mode)
+            else:
+                units = await self.backend.compile(
+                    'compile_eql_script',
+                    self.dbview.dbname,
+                    self.dbview.dbver,
+                    eql,
+                    self.dbview.modaliases,
+                    self.dbview.config,
+                    json_mode,
+                    legacy_mode,
+                    graphql_mode,
+                    dbver=self.dbview.dbver)
+        except Exception:
+            self.release_compiler_if_idle(None)
+            raise
+
+        self.release_compiler_if_idle(units)
+        return units
 
     async def legacy(self):
         cdef:
@@ -198,28 +291,42 @@ cdef class EdgeConnection:
             WriteBuffer packet
 
         lang = self.buffer.read_byte()
-        graphql = lang == b'g'
+        # b'p' is a persisted GraphQL query.
+        graphql = lang == b'g' or lang == b'p'
 
         eql = self.buffer.read_null_str()
         if not eql:
             raise errors.BinaryProtocolError('empty query')
-
-        units = await self._compile_script(eql, True, True, graphql)
+        if lang == b'p':
+            eql = self.server.resolve_persisted_graphql(eql)
+
+        units = None
+        if graphql:
+            # The legacy protocol carries neither variables nor an
+            # operation name, so the document alone determines the
+            # compiled queries.
+            units = self.dbview.lookup_compiled_graphql(eql)
+        if units is None:
+            units = await self._compile_script(eql, True, True, graphql)
+            if graphql:
+                self.dbview.cache_compiled_graphql(eql, units)
 
         resbuf = []
         for unit in units:
             self.dbview.start(unit)
             if unit.sql:
+                con = await self.backend.acquire_pgcon()
                 try:
-                    res = await self.backend.pgcon.simple_query(
+                    res = await con.simple_query(
                         unit.sql, ignore_data=False)
                 except Exception as ex:
                     self.dbview.on_error(unit)
-                    if not self.backend.pgcon.in_tx():
+                    if not con.in_tx():
                         # COMMIT command can fail, in which case the
                         # transaction is finished.  This check workarounds
                         # that (until a better solution is found.)
                         self.dbview._new_tx_state()
+                        self.release_compiler_if_idle(None)
                     raise
                 else:
                     self.dbview.on_success(unit)
@@ -243,34 +350,84 @@ cdef class EdgeConnection:
         packet.write_buffer(msg.end_message())
         packet.write_buffer(self.pgcon_last_sync_status())
         self.write(packet)
+        self.backend.release_pgcon()
+
+    async def _lookup_or_compile(self, bytes eql, bint json_mode):
+        # Queries that differ only in constants share the compiled
+        # query: look it up by the normalized text.
+        normalized = self.dbview.normalize_query(eql)
+        compiled = self.dbview.lookup_compiled_query(
+            normalized.eql, json_mode)
+        if compiled is None:
+            compiled = await self.dbview.lookup_persisted_query(
+                normalized.eql, json_mode)
+        if compiled is not None:
+            return compiled, normalized, True
+
+        if normalized.implicit_params:
+            try:
+                compiled = await self._compile(
+                    normalized.eql, json_mode, normalized.implicit_params)
+            except errors.QueryError:
+                # Either the query is invalid and the error should be
+                # reported against its original text, or some of its
+                # constants cannot be replaced with parameters.
+                # Cancellation and failures of the compiler itself
+                # are not query errors and propagate as is.
+                pass
+            else:
+                return compiled, normalized, False
+
+            compiled = await self._compile(eql, json_mode)
+            # The original query is valid, so the error was caused
+            # by the parameters.
+            normalized = self.dbview.disable_query_normalization(
+                eql, normalized)
+            return compiled, normalized, False
+
+        return await self._compile(eql, json_mode), normalized, False
 
     async def parse(self):
         json_mode = False
 
-        self._last_anon_compiled = None
-
         stmt_name = self.buffer.read_utf8()
         if stmt_name:
-            raise errors.UnsupportedFeatureError(
-                'prepared statements are not yet supported')
+            if stmt_name in self._prepared_stmts:
+                raise errors.BinaryProtocolError(
+                    f'prepared statement {stmt_name!r} already exists')
+        else:
+            self._last_anon_compiled = None
+            self._last_anon_normalized = None
 
         eql = self.buffer.read_null_str()
         if not eql:
             raise errors.BinaryProtocolError('empty query')
 
-        compiled = self.dbview.lookup_compiled_query(eql, json_mode)
-        cached = True
-        if compiled is None:
-            cached = False
-            compiled = await self._compile(eql, json_mode)
+        compiled, normalized, cached = await self._lookup_or_compile(
+            eql, json_mode)
 
-        await self.backend.pgcon.parse_execute(
-            1, 0, compiled, self, None, 0, 0)
+        if stmt_name and not compiled.is_preparable():
+            # Transaction control, DDL and session state commands
+            # are bound to the state they were compiled in.
+            raise errors.UnsupportedFeatureError(
+                'only queries can be prepared as named statements')
+
+        con = await self.backend.acquire_pgcon()
+        # Queries are executed as backend prepared statements, so
+        # prepare the statement right away: the Execute message does
+        # not have to parse it again if it gets the same connection.
+        await con.parse_execute(
+            1, 0, compiled, self, None, 0, compiled.is_preparable())
 
         if not cached and compiled.is_preparable():
-            self.dbview.cache_compiled_query(eql, json_mode, compiled)
+            self.dbview.cache_compiled_query(
+                normalized.eql, json_mode, compiled)
 
-        self._last_anon_compiled = compiled
+        if stmt_name:
+            self._prepared_stmts[stmt_name] = (eql, normalized, compiled)
+        else:
+            self._last_anon_compiled = compiled
+            self._last_anon_normalized = normalized
 
         buf = WriteBuffer.new_message(b'1')  # ParseComplete
         buf.write_bytes(compiled.in_type_id)
@@ -300,6 +457,37 @@ cdef class EdgeConnection:
         msg.end_message()
         return msg
 
+    async def _get_prepared_stmt(self, str stmt_name, bint check_types):
+        """Return (normalized query, compiled query) of a statement."""
+        try:
+            eql, normalized, compiled = self._prepared_stmts[stmt_name]
+        except KeyError:
+            raise errors.BinaryProtocolError(
+                f'prepared statement {stmt_name!r} does not exist'
+            ) from None
+
+        if compiled.dbver != self.dbview.dbver:
+            # The schema has changed since the statement was prepared.
+            recompiled, normalized, cached = await self._lookup_or_compile(
+                eql, False)
+            if not cached:
+                self.dbview.cache_compiled_query(
+                    normalized.eql, False, recompiled)
+            if check_types and (
+                    recompiled.in_type_id != compiled.in_type_id or
+                    recompiled.out_type_id != compiled.out_type_id):
+                # The client has outdated information about the types
+                # of arguments or results.
+                del self._prepared_stmts[stmt_name]
+                raise errors.TypeSpecNotFoundError(
+                    f'prepared statement {stmt_name!r} has been '
+                    f'invalidated by a schema change')
+
+            compiled = recompiled
+            self._prepared_stmts[stmt_name] = (eql, normalized, compiled)
+
+        return normalized, compiled
+
     async def describe(self):
         cdef:
             char rtype
@@ -311,8 +499,9 @@ cdef class EdgeConnection:
             stmt_name = self.buffer.read_utf8()
 
             if stmt_name:
-                raise errors.UnsupportedFeatureError(
-                    'prepared statements are not yet supported')
+                _, compiled = await self._get_prepared_stmt(stmt_name, False)
+                msg = self.make_describe_response(compiled)
+                self.write(msg)
             else:
                 if self._last_anon_compiled is None:
                     raise errors.TypeSpecNotFoundError(
@@ -325,51 +514,104 @@ cdef class EdgeConnection:
             raise errors.BinaryProtocolError(
                 f'unsupported "describe" message mode {chr(rtype)!r}')
 
-    async def execute(self):
-        cdef:
-            WriteBuffer bound_args_buf
-            bint send_sync
-
+    async def _read_execute_message(self):
         stmt_name = self.buffer.read_utf8()
         bind_args = self.buffer.consume_message()
         compiled = None
 
         if stmt_name:
-            raise errors.UnsupportedFeatureError(
-                'prepared statements are not yet supported')
+            normalized, compiled = await self._get_prepared_stmt(
+                stmt_name, True)
         else:
             if self._last_anon_compiled is None:
                 raise errors.BinaryProtocolError(
                     'no prepared anonymous statement found')
 
             compiled = self._last_anon_compiled
+            normalized = self._last_anon_normalized
+
+        return compiled, self.recode_bind_args(bind_args, normalized)
+
+    async def execute(self):
+        cdef:
+            WriteBuffer bound_args_buf
+            bint send_sync
+            list queries
+            list bind_datas
+
+        compiled, bound_args_buf = await self._read_execute_message()
+
+        # Collect the "Execute" messages that the client has
+        # pipelined after this one, so that they are sent to the
+        # backend in a single round trip.  Only queries are batched.
+        queries = [compiled]
+        bind_datas = [bound_args_buf]
+        pending_exc = None
+        while (compiled.is_preparable() and
+                self.buffer.take_message_type(b'E')):
+            try:
+                compiled, bound_args_buf = await self._read_execute_message()
+            except Exception as ex:
+                # Execute the preceding messages first.
+                pending_exc = ex
+                break
+            queries.append(compiled)
+            bind_datas.append(bound_args_buf)
 
-        bound_args_buf = self.recode_bind_args(bind_args)
+        last = None
+        if len(queries) > 1 and not queries[-1].is_preparable():
+            last = queries.pop()
+            bound_args_buf = bind_datas.pop()
 
         send_sync = False
-        if self.buffer.take_message_type(b'S'):
+        if pending_exc is None and self.buffer.take_message_type(b'S'):
             # A "Sync" message follows this "Execute" message;
             # send it right away.
             send_sync = True
             self.buffer.finish_message()
 
+        if len(queries) > 1:
+            await self._execute_batch(
+                queries, bind_datas, send_sync and last is None)
+        else:
+            await self._execute(
+                queries[0], bind_datas[0], send_sync and last is None)
+
+        if last is not None:
+            await self._execute(last, bound_args_buf, send_sync)
+
+        if pending_exc is not None:
+            raise pending_exc
+
+    async def _execute(self, compiled, WriteBuffer bound_args_buf,
+                       bint send_sync):
         self.dbview.start(compiled)
         if compiled.sql:
+            # The backend connection that has parsed the query might
+            # have been returned to the pool since then, so parse it
+            # again (prepared statements are cached per connection.)
+            con = await self.backend.acquire_pgcon()
+            self.start_query_metrics()
+            self.start_statement_timer()
             try:
-                await self.backend.pgcon.parse_execute(
-                    0, 1, compiled,
+                await con.parse_execute(
+                    1, 1, compiled,
                     self, bound_args_buf,
-                    send_sync, 0)
+                    send_sync, compiled.is_preparable())
             except Exception:
                 self.dbview.on_error(compiled)
-                if not self.backend.pgcon.in_tx():
+                if not con.in_tx():
                     # COMMIT command can fail, in which case the
                     # transaction is finished.  This check workarounds
                     # that (until a better solution is found.)
                     self.dbview._new_tx_state()
+                    self.release_compiler_if_idle(None)
                 raise
             else:
+                self.finish_query_metrics()
                 self.dbview.on_success(compiled)
+            finally:
+                self.stop_statement_timer()
         else:
             # SET command or something else that doesn't involve
             # executing SQL.
@@ -380,6 +622,76 @@ cdef class EdgeConnection:
         if send_sync:
             self.write(self.pgcon_last_sync_status())
             self.flush()
+            self.backend.release_pgcon()
+
+    async def _execute_batch(self, list queries, list bind_datas,
+                             bint send_sync):
+        for compiled in queries:
+            self.dbview.start(compiled)
+
+        con = await self.backend.acquire_pgcon()
+        self.start_query_metrics()
+        self.start_statement_timer()
+        try:
+            await con.execute_batch(queries, bind_datas, self, send_sync)
+        except Exception:
+            # Batches contain only queries, so the failed one
+            # does not matter for the state of the view.
+            self.dbview.on_error(queries[0])
+            raise
+        finally:
+            self.stop_statement_timer()
+
+        if send_sync:
+            self.write(self.pgcon_last_sync_status())
+            self.flush()
+            self.backend.release_pgcon()
+
+    cdef on_batch_query_complete(self, query):
+        self.finish_query_metrics()
+        self.start_query_metrics()
+        # The timeout applies to every query of the batch.
+        self.stop_statement_timer()
+        self.start_statement_timer()
+        self.dbview.on_success(query)
+        self.write(WriteBuffer.new_message(b'C').end_message())
+
+    cdef start_query_metrics(self):
+        self._query_started_at = time.monotonic()
+        self._query_relayed_bytes = 0
+
+    cdef finish_query_metrics(self):
+        self.metrics.backend_query_duration.observe(
+            time.monotonic() - self._query_started_at)
+        self.metrics.query_result_bytes.observe(self._query_relayed_bytes)
+
+    cdef start_statement_timer(self):
+        self._statement_timed_out = False
+        timeout = self.dbview.config.get('statement_timeout', 0)
+        if timeout > 0:
+            self._statement_timer = self.loop.call_later(
+                timeout / 1000, self._on_statement_timeout)
+
+    cdef stop_statement_timer(self):
+        if self._statement_timer is not None:
+            self._statement_timer.cancel()
+            self._statement_timer = None
+
+    def _on_statement_timeout(self):
+        self._statement_timer = None
+        self._statement_timed_out = True
+        self.loop.create_task(self.backend.cancel_query())
+
+    def cancel(self, int32_t secret):
+        """Cancel the query that is being executed, if any.
+
+        Return False if *secret* is not the secret of this connection.
+        """
+        if secret != self._secret:
+            return False
+        if self.backend is not None:
+            self.loop.create_task(self.backend.cancel_query())
+        return True
 
     async def opportunistic_execute(self):
         cdef:
@@ -399,22 +711,23 @@ cdef class EdgeConnection:
         if not query:
             raise errors.BinaryProtocolError('empty query')
 
-        compiled = self.dbview.lookup_compiled_query(query, json_mode)
-        if (compiled is None or
+        compiled, normalized, cached = await self._lookup_or_compile(
+            query, json_mode)
+        if (not cached or
                 compiled.in_type_id != in_tid or
                 compiled.out_type_id != out_tid):
 
             # Either the query is no longer compiled or the client has
             # outdated information about type specs.
 
-            # Check if we need to compile this query.
-            cached = True
-            if compiled is None:
-                cached = False
-                compiled = await self._compile(query, json_mode)
-
             if not cached and compiled.is_preparable():
-                self.dbview.cache_compiled_query(query, json_mode, compiled)
+                self.dbview.cache_compiled_query(
+                    normalized.eql, json_mode, compiled)
+
+            # The client is going to execute the query once it gets
+            # its description.
+            self._last_anon_compiled = compiled
+            self._last_anon_normalized = normalized
 
             send_sync = False
             if self.buffer.take_message_type(b'S'):
@@ -425,16 +738,18 @@ cdef class EdgeConnection:
 
             self.dbview.start(compiled)
             if compiled.sql:
+                con = await self.backend.acquire_pgcon()
                 try:
-                    await self.backend.pgcon.parse_execute(
+                    await con.parse_execute(
                         1, 0, compiled, self, None, 0, 0)
                 except Exception:
                     self.dbview.on_error(compiled)
-                    if not self.backend.pgcon.in_tx():
+                    if not con.in_tx():
                         # COMMIT command can fail, in which case the
                         # transaction is finished.  This check workarounds
                         # that (until a better solution is found.)
                         self.dbview._new_tx_state()
+                        self.release_compiler_if_idle(None)
                     raise
                 else:
                     self.dbview.on_success(compiled)
@@ -445,6 +760,7 @@ cdef class EdgeConnection:
             if send_sync:
                 self.write(self.pgcon_last_sync_status())
                 self.flush()
+                self.backend.release_pgcon()
 
             while True:
                 if not self.buffer.take_message():
@@ -469,39 +785,62 @@ cdef class EdgeConnection:
                 self.buffer.finish_message()
 
             if compiled.sql:
+                con = await self.backend.acquire_pgcon()
+                self.start_query_metrics()
+                self.start_statement_timer()
                 try:
-                    await self.backend.pgcon.parse_execute(
+                    await con.parse_execute(
                         1, 1,
                         compiled, self,
-                        self.recode_bind_args(bound_args),
+                        self.recode_bind_args(bound_args, normalized),
                         send_sync, compiled.is_preparable())
                 except Exception:
                     self.dbview.on_error(compiled)
                     raise
                 else:
+                    self.finish_query_metrics()
                     self.dbview.on_success(compiled)
+                finally:
+                    self.stop_statement_timer()
             else:
                 self.dbview.on_success(compiled)
 
             if send_sync:
                 self.write(self.pgcon_last_sync_status())
                 self.flush()
+                self.backend.release_pgcon()
+
+    async def close_stmt(self):
+        stmt_name = self.buffer.read_utf8()
+
+        # Closing a statement that does not exist is not an error.
+        # The backend statement is not deallocated: backend
+        # connections are shared, so other clients might be using
+        # it; the statements cache of the connection evicts it
+        # eventually.
+        self._prepared_stmts.pop(stmt_name, None)
+
+        self.write(WriteBuffer.new_message(b'3').end_message())
 
     async def sync(self):
         cdef:
             WriteBuffer buf
 
-        await self.backend.pgcon.sync()
+        con = self.backend.pgcon
+        if con is not None:
+            await con.sync()
         self.write(self.pgcon_last_sync_status())
 
         self.flush()
+        self.backend.release_pgcon()
 
     async def main(self):
         cdef:
             char mtype
 
         try:
-            await self.auth()
+            if not await self.auth():
+                return
         except Exception as ex:
             await self.write_error(ex)
             self._transport.abort()
@@ -539,6 +878,9 @@ cdef class EdgeConnection:
                     elif mtype == b'O':
                         await self.opportunistic_execute()
 
+                    elif mtype == b'C':
+                        await self.close_stmt()
+
                     elif mtype == b'S':
                         await self.sync()
 
@@ -559,6 +901,7 @@ cdef class EdgeConnection:
                     if legacy_mode:
                         self.write(self.pgcon_last_sync_status())
                         self.flush()
+                        self.backend.release_pgcon()
                     else:
                         await self.recover_from_error()
 
@@ -594,8 +937,9 @@ cdef class EdgeConnection:
                 await self.wait_for_message()
             mtype = self.buffer.get_message_type()
 
-            if mtype == b'Z':
-                self.sync()
+            if mtype == b'S':
+                self.buffer.finish_message()
+                await self.sync()
                 return
             else:
                 self.fallthrough(True)
@@ -616,12 +960,21 @@ cdef class EdgeConnection:
 
         exc_code = None
 
-        if isinstance(exc, pgerror.BackendError):
+        if (isinstance(exc, pgerror.BackendError) and
+                self._statement_timed_out and
+                exc.fields.get('C') == '57014'):
+            # The query was cancelled by the statement timer.
+            exc = errors.QueryTimeoutError(
+                'canceling statement due to statement timeout')
+
+        elif isinstance(exc, pgerror.BackendError):
             try:
-                exc = await self.backend.compiler.call(
+                exc = await self.backend.call_compiler(
                     'interpret_backend_error',
+                    self.dbview.dbname,
                     self.dbview.dbver,
-                    exc.fields)
+                    exc.fields,
+                    dbver=self.dbview.dbver)
             except Exception as ex:
                 exc = RuntimeError(
                     'unhandled error while calling interpret_backend_error()')
@@ -657,8 +1010,14 @@ cdef class EdgeConnection:
             pgcon.PGTransactionStatus xact_status
             WriteBuffer buf
 
-        xact_status = <pgcon.PGTransactionStatus>(
-            (<pgcon.PGProto>self.backend.pgcon).xact_status)
+        con = self.backend.pgcon
+        if con is None:
+            # Backend connections are only released back to the pool
+            # outside of transactions.
+            xact_status = pgcon.PQTRANS_IDLE
+        else:
+            xact_status = <pgcon.PGTransactionStatus>(
+                (<pgcon.PGProto>con).xact_status)
 
         buf = WriteBuffer.new_message(b'Z')
         if xact_status == pgcon.PQTRANS_IDLE:
@@ -688,11 +1047,12 @@ cdef class EdgeConnection:
             raise errors.BinaryProtocolError(
                 f'unexpected message type {chr(mtype)!r}')
 
-    cdef WriteBuffer recode_bind_args(self, bytes bind_args):
+    cdef WriteBuffer recode_bind_args(self, bytes bind_args, normalized):
         cdef:
             FRBuffer in_buf
             WriteBuffer out_buf = WriteBuffer.new()
             int32_t argsnum
+            int32_t implicit_params = 0
             ssize_t in_len
 
         assert cpython.PyBytes_CheckExact(bind_args)
@@ -709,11 +1069,19 @@ cdef class EdgeConnection:
         # number of elements in the tuple
         argsnum = hton.unpack_int32(frb_read(&in_buf, 4))
 
-        out_buf.write_int16(<int16_t>argsnum)
+        if normalized is not None:
+            implicit_params = normalized.implicit_params
+
+        out_buf.write_int16(<int16_t>(argsnum + implicit_params))
 
         in_len = frb_get_len(&in_buf)
         out_buf.write_cstr(frb_read_all(&in_buf), in_len)
 
+        if implicit_params:
+            # Values of the constants extracted from the query
+            # follow the arguments supplied by the client.
+            out_buf.write_bytes(normalized.implicit_args)
+
         # All columns are in binary format
         out_buf.write_int32(0x00010001)
         return out_buf
@@ -723,8 +1091,11 @@ cdef class EdgeConnection:
             raise errors.BinaryProtocolError(
                 'invalid connection status while establishing the connection')
         self._transport = transport
+        self._transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH_WATER)
         self._main_task = self.loop.create_task(self.main())
-        # self.server.edgecon_register(self)
+        self.metrics.client_connections.inc()
+        self.metrics.client_connections_total.inc()
+        self.server.edgecon_register(self._id, self)
 
     def connection_lost(self, exc):
         if (self._msg_take_waiter is not None and
@@ -732,16 +1103,34 @@ cdef class EdgeConnection:
             self._msg_take_waiter.set_exception(ConnectionAbortedError())
             self._msg_take_waiter = None
 
+        if self._write_waiter is not None:
+            if not self._write_waiter.done():
+                self._write_waiter.set_exception(ConnectionAbortedError())
+            self._write_waiter = None
+
         self._transport = None
+        self.metrics.client_connections.dec()
+        self.server.edgecon_unregister(self._id)
+        self.stop_statement_timer()
 
         if self.backend is not None:
             self.loop.create_task(self.backend.close())
 
     def pause_writing(self):
-        pass
+        if self._write_waiter is None:
+            self._write_waiter = self.loop.create_future()
+            self._write_paused_at = time.monotonic()
 
     def resume_writing(self):
-        pass
+        waiter = self._write_waiter
+        if waiter is None:
+            return
+
+        self._write_waiter = None
+        self.server.record_paused_writing(
+            time.monotonic() - self._write_paused_at)
+        if not waiter.done():
+            waiter.set_result(True)
 
     def data_received(self, data):
         self.buffer.feed_data(data)
@@ -0,0 +1,316 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""Server metrics in the Prometheus text exposition format.
+
+Metrics are plain counters, gauges and histograms kept in memory by
+the server process; they are rendered on request by MetricsProtocol,
+a minimal HTTP server that answers "GET /metrics".
+
+Label values are passed positionally after the value, in the order
+of the label names given when the metric was created:
+
+    compile_duration.observe(0.015, 'parse_eql')
+"""
+
+
+import asyncio
+import bisect
+import math
+import typing
+
+
+__all__ = ('Registry', 'ServerMetrics', 'MetricsProtocol')
+
+
+# Buckets of duration histograms, in seconds.
+DURATION_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Buckets of size histograms, in bytes.
+SIZE_BUCKETS = (
+    256, 1024, 4096, 16384, 65536, 262144,
+    1048576, 4194304, 16777216, 67108864,
+)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape_help(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n')
+
+
+def _escape(value: str) -> str:
+    return _escape_help(value).replace('"', r'\"')
+
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(pairs) + '}'
+
+
+class BaseMetric:
+
+    type: str
+
+    def __init__(self, name: str, desc: str, labels: typing.Tuple[str]):
+        self._name = name
+        self._desc = desc
+        self._labels = labels
+
+    def _check_labels(self, labels: tuple):
+        if len(labels) != len(self._labels):
+            raise ValueError(
+                f'{self._name} expects {len(self._labels)} label values, '
+                f'got {len(labels)}')
+
+    def _render_samples(self) -> typing.Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> typing.Iterator[str]:
+        yield f'# HELP {self._name} {_escape_help(self._desc)}'
+        yield f'# TYPE {self._name} {self.type}'
+        yield from self._render_samples()
+
+
+class Counter(BaseMetric):
+
+    type = 'counter'
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._values = {}
+
+    def inc(self, value: float=1, *labels: str):
+        if value < 0:
+            raise ValueError('counters can only be increased')
+        self._check_labels(labels)
+        self._values[labels] = self._values.get(labels, 0) + value
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def _render_samples(self):
+        for labels, value in self._values.items():
+            yield (f'{self._name}{_format_labels(self._labels, labels)} '
+                   f'{_format_value(value)}')
+
+
+class Gauge(Counter):
+
+    type = 'gauge'
+
+    def inc(self, value: float=1, *labels: str):
+        self._check_labels(labels)
+        self._values[labels] = self._values.get(labels, 0) + value
+
+    def dec(self, value: float=1, *labels: str):
+        self.inc(-value, *labels)
+
+    def set(self, value: float, *labels: str):
+        self._check_labels(labels)
+        self._values[labels] = value
+
+
+class Histogram(BaseMetric):
+
+    type = 'histogram'
+
+    def __init__(self, name, desc, labels, buckets):
+        super().__init__(name, desc, labels)
+        self._buckets = tuple(sorted(buckets)) + (math.inf,)
+        # labels -> [bucket counts, sum]
+        self._values = {}
+
+    def observe(self, value: float, *labels: str):
+        try:
+            counts = self._values[labels]
+        except KeyError:
+            self._check_labels(labels)
+            counts = self._values[labels] = [[0] * len(self._buckets), 0]
+
+        counts[0][bisect.bisect_left(self._buckets, value)] += 1
+        counts[1] += value
+
+    def get_count(self, *labels: str) -> int:
+        counts = self._values.get(labels)
+        return sum(counts[0]) if counts is not None else 0
+
+    def get_sum(self, *labels: str) -> float:
+        counts = self._values.get(labels)
+        return counts[1] if counts is not None else 0
+
+    def _render_samples(self):
+        name = self._name
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for le, count in zip(self._buckets, counts):
+                cumulative += count
+                lbl = _format_labels(
+                    self._labels, labels, f'le="{_format_value(le)}"')
+                yield f'{name}_bucket{lbl} {cumulative}'
+            lbl = _format_labels(self._labels, labels)
+            yield f'{name}_sum{lbl} {_format_value(total)}'
+            yield f'{name}_count{lbl} {cumulative}'
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric: BaseMetric):
+        if metric._name in self._metrics:
+            raise ValueError(f'metric {metric._name!r} is already defined')
+        self._metrics[metric._name] = metric
+        return metric
+
+    def new_counter(self, name: str, desc: str, *,
+                    labels: typing.Tuple[str]=()) -> Counter:
+        return self._add(Counter(name, desc, labels))
+
+    def new_gauge(self, name: str, desc: str, *,
+                  labels: typing.Tuple[str]=()) -> Gauge:
+        return self._add(Gauge(name, desc, labels))
+
+    def new_histogram(self, name: str, desc: str, *,
+                      labels: typing.Tuple[str]=(),
+                      buckets: typing.Sequence[float]=DURATION_BUCKETS
+                      ) -> Histogram:
+        return self._add(Histogram(name, desc, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        lines.append('')
+        return '\n'.join(lines)
+
+
+class ServerMetrics(Registry):
+
+    def __init__(self):
+        super().__init__()
+
+        self.compile_duration = self.new_histogram(
+            'edgedb_compile_duration_seconds',
+            'Time spent by compiler workers in each compilation stage.',
+            labels=('stage',))
+        self.compiler_call_duration = self.new_histogram(
+            'edgedb_compiler_call_duration_seconds',
+            'Round trip time of compiler worker calls.',
+            labels=('method',))
+        self.compiler_pool_wait = self.new_histogram(
+            'edgedb_compiler_pool_wait_seconds',
+            'Time spent waiting for an idle compiler worker.')
+
+        self.query_cache_lookups = self.new_counter(
+            'edgedb_query_cache_lookups_total',
+            'Compiled query cache lookups.',
+            labels=('database', 'result'))
+        self.query_cache_evictions = self.new_counter(
+            'edgedb_query_cache_evictions_total',
+            'Compiled queries dropped from the cache.',
+            labels=('database', 'reason'))
+
+        self.backend_query_duration = self.new_histogram(
+            'edgedb_backend_query_duration_seconds',
+            'Time from sending a query to Postgres until its results '
+            'are relayed to the client.')
+        self.query_result_bytes = self.new_histogram(
+            'edgedb_query_result_bytes',
+            'Size of the data relayed to the client per query.',
+            buckets=SIZE_BUCKETS)
+
+        self.client_connections = self.new_gauge(
+            'edgedb_client_connections',
+            'Number of open client connections.')
+        self.client_connections_total = self.new_counter(
+            'edgedb_client_connections_total',
+            'Number of accepted client connections.')
+        self.client_paused_writing = self.new_counter(
+            'edgedb_client_paused_writing_total',
+            'Number of times result streaming waited for a slow client.')
+        self.client_paused_writing_duration = self.new_counter(
+            'edgedb_client_paused_writing_seconds_total',
+            'Time result streaming spent waiting for slow clients.')
+
+
+class MetricsProtocol(asyncio.Protocol):
+    """Serves the metrics over HTTP/1.0: one request per connection."""
+
+    # Requests are tiny; anything larger is not a metrics scrape.
+    MAX_REQUEST_SIZE = 8192
+
+    def __init__(self, registry: Registry):
+        self._registry = registry
+        self._transport = None
+        self._data = b''
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def data_received(self, data):
+        self._data += data
+        if b'\r\n\r\n' not in self._data and b'\n\n' not in self._data:
+            if len(self._data) > self.MAX_REQUEST_SIZE:
+                self._respond(413, 'Request Entity Too Large')
+            return
+
+        request_line = self._data.split(b'\n', 1)[0].strip()
+        parts = request_line.split()
+        if len(parts) != 3 or parts[0] not in (b'GET', b'HEAD'):
+            self._respond(405, 'Method Not Allowed')
+        elif parts[1].split(b'?', 1)[0] != b'/metrics':
+            self._respond(404, 'Not Found')
+        else:
+            self._respond(
+                200, 'OK', self._registry.render(),
+                head=parts[0] == b'HEAD')
+
+    def _respond(self, status: int, reason: str, body: str='', *,
+                 head: bool=False):
+        if self._transport is None:
+            return
+        body = body.encode()
+        headers = (
+            f'HTTP/1.0 {status} {reason}\r\n'
+            f'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: close\r\n'
+            f'\r\n'
+        ).encode()
+        self._transport.write(headers if head else headers + body)
+        self._transport.close()
+        self._transport = None
+
+    def connection_lost(self, exc):
+        self._transport = None
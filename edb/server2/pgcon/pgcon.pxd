@@ -60,10 +60,16 @@ cdef class PGProto:
         bint waiting_for_sync
         PGTransactionStatus xact_status
 
+        # Whether a command has been sent and its results
+        # are not received yet.
+        bint executing
+
         readonly int32_t backend_pid
         readonly int32_t backend_secret
 
         StatementsCache prep_stmts
+        # The query currently parsed as the unnamed statement.
+        object anon_stmt
 
     cdef write(self, buf)
 
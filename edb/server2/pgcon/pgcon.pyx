@@ -50,6 +50,7 @@ include './stmt_cache.pyx'
 
 DEF DATA_BUFFER_SIZE = 100_000
 DEF PREP_STMTS_CACHE = 100
+DEF CANCEL_REQUEST_CODE = 80877102
 
 
 async def connect(addr, dbname):
@@ -62,6 +63,29 @@ async def connect(addr, dbname):
     return protocol
 
 
+async def cancel(addr, int32_t backend_pid, int32_t backend_secret):
+    """Ask Postgres to cancel the command that a backend is running.
+
+    The request is sent over a new connection, as the backend
+    does not read from its own connection while executing a command.
+    """
+    cdef WriteBuffer buf
+
+    reader, writer = await asyncio.open_unix_connection(addr)
+    try:
+        buf = WriteBuffer.new()
+        buf.write_int32(16)
+        buf.write_int32(CANCEL_REQUEST_CODE)
+        buf.write_int32(backend_pid)
+        buf.write_int32(backend_secret)
+        writer.write(bytes(buf))
+        # Postgres closes the connection once the request
+        # is processed; it never replies.
+        await reader.read()
+    finally:
+        writer.close()
+
+
 @cython.final
 cdef class PGProto:
 
@@ -76,12 +100,14 @@ cdef class PGProto:
         self.msg_waiter = None
 
         self.prep_stmts = StatementsCache(maxsize=PREP_STMTS_CACHE)
+        self.anon_stmt = None
 
         self.connected_fut = loop.create_future()
         self.connected = False
 
         self.waiting_for_sync = False
         self.xact_status = PQTRANS_UNKNOWN
+        self.executing = False
 
         self.backend_pid = -1
         self.backend_secret = -1
@@ -92,6 +118,9 @@ cdef class PGProto:
             self.xact_status == PQTRANS_INERROR
         )
 
+    def is_executing(self):
+        return self.executing
+
     def is_connected(self):
         return bool(self.connected and self.transport is not None)
 
@@ -169,14 +198,19 @@ cdef class PGProto:
         packet = WriteBuffer.new()
 
         if use_prep_stmt:
-            assert parse and execute
+            assert parse
+
+            stmt_name = query.sql_hash
+            if (not execute and stmt_name in self.prep_stmts and
+                    self.prep_stmts[stmt_name] == query.dbver):
+                # The statement has already been prepared.
+                return
 
             while self.prep_stmts.needs_cleanup():
                 stmt_name_to_clean = self.prep_stmts.cleanup_one()
                 packet.write_buffer(
                     self.make_clean_stmt_message(stmt_name_to_clean))
 
-            stmt_name = query.sql_hash
             if stmt_name in self.prep_stmts:
                 if self.prep_stmts[stmt_name] == query.dbver:
                     parse = 0
@@ -190,6 +224,16 @@ cdef class PGProto:
 
         else:
             stmt_name = b''
+            if self.anon_stmt is query:
+                # The query has just been parsed, most likely when
+                # the client asked to prepare it.
+                if not execute:
+                    return
+                parse = 0
+            else:
+                # Parsing replaces the unnamed statement, even if it
+                # fails.
+                self.anon_stmt = None
 
         if parse:
             buf = WriteBuffer.new_message(b'P')
@@ -218,6 +262,7 @@ cdef class PGProto:
         else:
             packet.write_bytes(FLUSH_MESSAGE)
         self.write(packet)
+        self.executing = True
 
         try:
             buf = None
@@ -234,14 +279,16 @@ cdef class PGProto:
 
                         self.buffer.redirect_messages(buf, b'D')
                         if buf.len() >= DATA_BUFFER_SIZE:
-                            edgecon.write(buf)
+                            edgecon.write_data(buf)
                             buf = None
+                            if edgecon.is_writing_paused():
+                                await self.wait_for_client(edgecon)
 
                     elif mtype == b'C' and execute:  ## result
                         # CommandComplete
                         self.buffer.discard_message()
                         if buf is not None:
-                            edgecon.write(buf)
+                            edgecon.write_data(buf)
                             buf = None
                         return
 
@@ -250,6 +297,8 @@ cdef class PGProto:
                         self.buffer.discard_message()
                         if store_stmt:
                             self.prep_stmts[stmt_name] = query.dbver
+                        elif not stmt_name:
+                            self.anon_stmt = query
                         if not execute:
                             return
 
@@ -286,9 +335,153 @@ cdef class PGProto:
                 finally:
                     self.buffer.finish_message()
         finally:
+            self.executing = False
+            if send_sync:
+                await self.wait_for_sync()
+
+    async def execute_batch(self,
+                            list queries,
+                            list bind_datas,
+                            edgecon.EdgeConnection edgecon,
+                            bint send_sync):
+        """Execute a pipelined batch of prepared queries.
+
+        All queries are sent in a single packet followed by one Sync
+        (or Flush).  edgecon.on_batch_query_complete() is called after
+        the results of each query have been written.
+        """
+
+        cdef:
+            WriteBuffer packet
+            WriteBuffer buf
+            bytes stmt_name
+            set parsed = set()
+            list to_store = []
+            ssize_t completed = 0
+            ssize_t nqueries = len(queries)
+
+        self.before_command()
+
+        packet = WriteBuffer.new()
+
+        while self.prep_stmts.needs_cleanup():
+            stmt_name_to_clean = self.prep_stmts.cleanup_one()
+            packet.write_buffer(
+                self.make_clean_stmt_message(stmt_name_to_clean))
+
+        for query, bind_data in zip(queries, bind_datas):
+            stmt_name = query.sql_hash
+
+            if stmt_name not in parsed:
+                parsed.add(stmt_name)
+
+                if stmt_name in self.prep_stmts:
+                    if self.prep_stmts[stmt_name] != query.dbver:
+                        packet.write_buffer(
+                            self.make_clean_stmt_message(stmt_name))
+                        del self.prep_stmts[stmt_name]
+
+                if stmt_name not in self.prep_stmts:
+                    buf = WriteBuffer.new_message(b'P')
+                    buf.write_bytestring(stmt_name)
+                    buf.write_bytestring(query.sql)
+                    buf.write_int16(0)
+                    packet.write_buffer(buf.end_message())
+                    to_store.append(query)
+
+            buf = WriteBuffer.new_message(b'B')
+            buf.write_bytestring(b'')  # portal name
+            buf.write_bytestring(stmt_name)  # statement name
+            buf.write_buffer(bind_data)
+            packet.write_buffer(buf.end_message())
+
+            buf = WriteBuffer.new_message(b'E')
+            buf.write_bytestring(b'')  # portal name
+            buf.write_int32(0)  # limit: number of rows to return; 0 - all
+            packet.write_buffer(buf.end_message())
+
+        if send_sync:
+            packet.write_bytes(SYNC_MESSAGE)
+            self.waiting_for_sync = True
+        else:
+            packet.write_bytes(FLUSH_MESSAGE)
+        self.write(packet)
+        self.executing = True
+
+        # ParseComplete messages arrive in the order of Parse messages.
+        to_store.reverse()
+
+        try:
+            buf = None
+            while True:
+                if not self.buffer.take_message():
+                    await self.wait_for_message()
+                mtype = self.buffer.get_message_type()
+
+                try:
+                    if mtype == b'D':
+                        # DataRow
+                        if buf is None:
+                            buf = WriteBuffer.new()
+
+                        self.buffer.redirect_messages(buf, b'D')
+                        if buf.len() >= DATA_BUFFER_SIZE:
+                            edgecon.write_data(buf)
+                            buf = None
+                            if edgecon.is_writing_paused():
+                                await self.wait_for_client(edgecon)
+
+                    elif (mtype == b'C' or  ## result
+                            mtype == b's' or
+                            mtype == b'I'):
+                        # CommandComplete, PortalSuspended or
+                        # EmptyQueryResponse
+                        self.buffer.discard_message()
+                        if buf is not None:
+                            edgecon.write_data(buf)
+                            buf = None
+                        edgecon.on_batch_query_complete(queries[completed])
+                        completed += 1
+                        if completed == nqueries:
+                            return
+
+                    elif mtype == b'1':
+                        # ParseComplete
+                        self.buffer.discard_message()
+                        query = to_store.pop()
+                        self.prep_stmts[query.sql_hash] = query.dbver
+
+                    elif mtype == b'E':  ## result
+                        # ErrorResponse; the rest of the batch is
+                        # skipped by the server until the Sync.
+                        er = self.parse_error_message()
+                        raise pgerror.BackendError(fields=er)
+
+                    elif mtype == b'n' or mtype == b'2' or mtype == b'3':
+                        # NoData, BindComplete or CloseComplete
+                        self.buffer.discard_message()
+
+                    else:
+                        self.fallthrough()
+
+                finally:
+                    self.buffer.finish_message()
+        finally:
+            self.executing = False
             if send_sync:
                 await self.wait_for_sync()
 
+    async def wait_for_client(self, edgecon.EdgeConnection edgecon):
+        # The client does not keep up with the results: stop reading
+        # from the backend until it does, so that the results are
+        # not buffered in memory.
+        self.transport.pause_reading()
+        try:
+            await edgecon.wait_for_writing()
+        finally:
+            if self.transport is not None:
+                self.transport.resume_reading()
+
     async def simple_query(self, bytes sql, bint ignore_data):
         cdef:
             WriteBuffer packet
@@ -296,6 +489,8 @@ cdef class PGProto:
 
         self.before_command()
 
+        # A simple query destroys the unnamed statement.
+        self.anon_stmt = None
         buf = WriteBuffer.new_message(b'Q')
         buf.write_bytestring(sql)
         self.write(buf.end_message())
@@ -304,6 +499,7 @@ cdef class PGProto:
         result = None
 
         self.waiting_for_sync = True
+        self.executing = True
 
         while True:
             if not self.buffer.take_message():
@@ -342,6 +538,7 @@ cdef class PGProto:
 
                 elif mtype == b'Z':
                     self.parse_sync_message()
+                    self.executing = False
                     break
 
                 else:
@@ -0,0 +1,210 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import asyncio
+import collections
+
+
+class PoolClosedError(Exception):
+    pass
+
+
+class Pool:
+
+    # The pool hands out backend connections for the duration of a
+    # query or an explicit transaction.  Idle connections are kept
+    # per database, but the total number of open connections
+    # across all databases never exceeds max_capacity.
+    #
+    # Clients that cannot get a connection right away are queued in
+    # a single FIFO shared by all databases.  When a connection is
+    # released and the next waiter in line wants a different database,
+    # the connection is closed and its capacity slot is handed over
+    # to that waiter, which then opens a new connection by itself.
+
+    def __init__(self, *, connect, max_capacity, loop):
+        if max_capacity <= 0:
+            raise ValueError('max_capacity must be greater than 0')
+
+        self._connect = connect
+        self._max_capacity = max_capacity
+        self._loop = loop
+
+        # Number of open connections, including the ones that
+        # are being connected.
+        self._capacity = 0
+
+        self._idle = {}
+        self._waiters = collections.deque()
+
+        self._closed = False
+
+        self._stats_connected = 0
+        self._stats_disconnected = 0
+        self._stats_waited = 0
+
+    @property
+    def max_capacity(self):
+        return self._max_capacity
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def _get_idle(self, dbname):
+        idle = self._idle.get(dbname)
+        while idle:
+            con = idle.pop()
+            if con.is_connected():
+                return con
+            self._discard(con)
+        return None
+
+    def _steal_idle(self, dbname):
+        # Close an idle connection to some other database to
+        # free up a capacity slot.
+        for other_dbname, idle in self._idle.items():
+            if other_dbname != dbname and idle:
+                con = idle.popleft()
+                con.terminate()
+                self._stats_disconnected += 1
+                return True
+        return False
+
+    def _discard(self, con):
+        con.abort()
+        self._stats_disconnected += 1
+        self._capacity -= 1
+        self._on_slot_freed()
+
+    def _on_slot_freed(self):
+        while self._waiters:
+            _, waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._capacity += 1
+                waiter.set_result(None)
+                return
+
+    async def _connect_new(self, dbname):
+        # The capacity slot must already be reserved by the caller.
+        try:
+            con = await self._connect(dbname)
+        except BaseException:
+            self._capacity -= 1
+            self._on_slot_freed()
+            raise
+
+        self._stats_connected += 1
+        return con
+
+    async def acquire(self, dbname):
+        if self._closed:
+            raise PoolClosedError('the connection pool is closed')
+
+        if not self._waiters:
+            con = self._get_idle(dbname)
+            if con is not None:
+                return con
+
+            if self._capacity < self._max_capacity:
+                self._capacity += 1
+                return await self._connect_new(dbname)
+
+            if self._steal_idle(dbname):
+                return await self._connect_new(dbname)
+
+        self._stats_waited += 1
+        waiter = self._loop.create_future()
+        self._waiters.append((dbname, waiter))
+
+        try:
+            con = await waiter
+        except asyncio.CancelledError:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self._waiters.remove((dbname, waiter))
+                except ValueError:
+                    pass
+            else:
+                # We were handed a connection or a capacity slot
+                # right before the cancellation.
+                con = waiter.result()
+                if con is None:
+                    self._capacity -= 1
+                    self._on_slot_freed()
+                else:
+                    self.release(dbname, con)
+            raise
+
+        if con is None:
+            # A capacity slot was handed to us.
+            return await self._connect_new(dbname)
+        return con
+
+    def release(self, dbname, con, *, discard=False):
+        if (discard or self._closed or not con.is_connected() or
+                con.in_tx()):
+            self._discard(con)
+            return
+
+        while self._waiters:
+            waiter_dbname, waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+
+            if waiter_dbname == dbname:
+                waiter.set_result(con)
+            else:
+                # Recycle the capacity slot for a waiter that
+                # wants another database.
+                con.terminate()
+                self._stats_disconnected += 1
+                waiter.set_result(None)
+            return
+
+        try:
+            idle = self._idle[dbname]
+        except KeyError:
+            idle = self._idle[dbname] = collections.deque()
+        idle.append(con)
+
+    async def close(self):
+        self._closed = True
+
+        while self._waiters:
+            _, waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(
+                    PoolClosedError('the connection pool is closed'))
+
+        for idle in self._idle.values():
+            while idle:
+                con = idle.pop()
+                con.terminate()
+                self._stats_disconnected += 1
+                self._capacity -= 1
+        self._idle.clear()
+
+
+async def create_pool(*, connect, max_capacity: int) -> Pool:
+    loop = asyncio.get_running_loop()
+    return Pool(
+        connect=connect,
+        max_capacity=max_capacity,
+        loop=loop)
@@ -17,7 +17,8 @@
 #
 
 
-__all__ = 'create_pool',
+__all__ = 'create_pool', 'PickleCodec'
 
 
+from .codec import PickleCodec  # NoQA
 from .pool import create_pool, create_manager  # NoQA
@@ -22,43 +22,90 @@ import os
 import struct
 
 
-_len_unpacker = struct.Struct('!I').unpack
+_len_unpacker = struct.Struct('!I').unpack_from
 _len_packer = struct.Struct('!I').pack
 
 
+# The size of the receive buffer.  Messages that do not fit into it
+# are received directly into a buffer of their own.
+_BUFFER_SIZE = 2 ** 16
+
+
 class PoolClosedError(Exception):
     pass
 
 
-class BaseFramedProtocol(asyncio.Protocol):
+class BaseFramedProtocol(asyncio.BufferedProtocol):
 
     def __init__(self, *, loop, con_waiter=None):
         self._loop = loop
-        self._buffer = b''
         self._transport = None
         self._con_waiter = con_waiter
-        self._curmsg_len = -1
         self._closed = False
 
+        # Small messages are accumulated in a reusable buffer:
+        # _buffer[_pos:_len] is the data that has not been parsed yet.
+        self._buffer = bytearray(_BUFFER_SIZE)
+        # Slicing a memoryview does not copy the data.
+        self._view = memoryview(self._buffer)
+        self._pos = 0
+        self._len = 0
+
+        # A large message that is being streamed into a buffer of its
+        # own, and how much of it has been received so far.
+        self._curmsg = None
+        self._curmsg_len = 0
+
     def process_message(self, msg):
         raise NotImplementedError
 
-    def data_received(self, data):
-        # TODO: rewrite to avoid buffer copies.
-        self._buffer += data
-        while self._buffer:
-            if self._curmsg_len == -1:
-                if len(self._buffer) >= 4:
-                    self._curmsg_len = _len_unpacker(self._buffer[:4])[0]
-                    self._buffer = self._buffer[4:]
-                else:
-                    return
-
-            if self._curmsg_len > 0 and len(self._buffer) >= self._curmsg_len:
-                msg = self._buffer[:self._curmsg_len]
-                self._buffer = self._buffer[self._curmsg_len:]
-                self._curmsg_len = -1
+    def get_buffer(self, sizehint):
+        if self._curmsg is not None:
+            return memoryview(self._curmsg)[self._curmsg_len:]
+
+        if self._len == len(self._buffer):
+            # Move the unparsed data to the beginning of the buffer;
+            # it is less than a message long, so this is cheap.
+            tail = self._len - self._pos
+            self._view[:tail] = self._view[self._pos:self._len]
+            self._pos = 0
+            self._len = tail
+
+        return self._view[self._len:]
+
+    def buffer_updated(self, nbytes):
+        if self._curmsg is not None:
+            self._curmsg_len += nbytes
+            if self._curmsg_len == len(self._curmsg):
+                msg = self._curmsg
+                self._curmsg = None
+                self._curmsg_len = 0
                 self.process_message(msg)
+            return
+
+        self._len += nbytes
+
+        buf = self._view
+        while self._len - self._pos >= 4:
+            msg_len = _len_unpacker(buf, self._pos)[0]
+            start = self._pos + 4
+            end = start + msg_len
+
+            if end <= self._len:
+                self._pos = end
+                if self._pos == self._len:
+                    self._pos = self._len = 0
+                self.process_message(bytes(buf[start:end]))
+
+            elif msg_len + 4 > len(buf):
+                # The message does not fit into the buffer: stream it
+                # into a dedicated one to avoid copying it around.
+                self._curmsg = bytearray(msg_len)
+                self._curmsg_len = self._len - start
+                self._curmsg[:self._curmsg_len] = buf[start:self._len]
+                self._pos = self._len = 0
+                return
+
             else:
                 return
 
@@ -95,21 +142,16 @@ class HubProtocol(BaseFramedProtocol):
         self._transport.writelines((_len_packer(len(payload)), payload))
 
     def process_message(self, msg):
+        if self._pid is None:
+            # The first message of a worker is its PID.
+            self._pid = _len_unpacker(msg)[0]
+            self._on_pid(self, self._transport, self._pid)
+            return
+
         if self._msg_waiter is not None and not self._msg_waiter.done():
             self._msg_waiter.set_result(msg)
             self._msg_waiter = None
 
-    def data_received(self, data):
-        if self._pid is None:
-            pid_data = data[:4]
-            data = data[4:]
-            self._pid = _len_unpacker(pid_data)[0]
-            self._on_pid(self, self._transport, self._pid)
-            if data:
-                super().data_received(data)
-        else:
-            super().data_received(data)
-
     def connection_lost(self, exc):
         super().connection_lost(exc)
 
@@ -137,7 +179,7 @@ class WorkerProtocol(BaseFramedProtocol):
 
     def connection_made(self, tr):
         super().connection_made(tr)
-        tr.write(_len_packer(os.getpid()))
+        self.reply(_len_packer(os.getpid()))
 
     def connection_lost(self, exc):
         super().connection_lost(exc)
@@ -0,0 +1,52 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import pickle
+
+
+__all__ = ('PickleCodec',)
+
+
+class PickleCodec:
+    """Encodes the messages exchanged with a worker process.
+
+    A new codec instance is created for every worker process on both
+    ends of the connection, so subclasses are free to keep state that
+    is shared by the messages of one connection (e.g. to avoid sending
+    the same values over and over again).  Requests and responses are
+    encoded and decoded strictly in order.
+    """
+
+    def encode_request(self, method_name: str, args: tuple) -> bytes:
+        return self._dumps((method_name, args))
+
+    def decode_request(self, data: bytes) -> tuple:
+        return self._loads(data)
+
+    def encode_response(self, data: tuple) -> bytes:
+        return self._dumps(data)
+
+    def decode_response(self, data: bytes) -> tuple:
+        return self._loads(data)
+
+    def _dumps(self, obj) -> bytes:
+        return pickle.dumps(obj)
+
+    def _loads(self, data: bytes):
+        return pickle.loads(data)
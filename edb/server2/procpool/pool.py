@@ -28,6 +28,7 @@ import time
 from edb.lang.common import taskgroup
 
 from . import amsg
+from . import codec as _codec
 
 
 GC_INTERVAL = 60.0 * 3
@@ -50,6 +51,7 @@ class Worker:
         self._command_args = command_args
         self._proc = None
         self._con = None
+        self._codec = None
         self._last_used = time.monotonic()
 
     async def _kill_proc(self, proc):
@@ -83,20 +85,37 @@ class Worker:
             self._proc.kill()
             raise
 
+        # The state of the codec is specific to the worker process.
+        self._codec = self._manager._codec_cls()
+
     def get_pid(self):
         return self._proc.pid
 
     async def call(self, method_name, *args):
-        if self._con.is_closed():
+        if self._con is None or self._con.is_closed():
             await self._spawn()
 
-        msg = pickle.dumps((method_name, args))
-        data = await self._con.request(msg)
-        status, *data = pickle.loads(data)
+        msg = self._codec.encode_request(method_name, args)
+        try:
+            data = await self._con.request(msg)
+        except BaseException:
+            # The process could still reply to the interrupted
+            # request, and the reply would be taken for the reply
+            # to the next one: the process has to be replaced.
+            self._con = None
+            try:
+                self._proc.kill()
+            except ProcessLookupError:
+                pass
+            raise
+        status, *data = self._codec.decode_response(data)
 
         self._last_used = time.monotonic()
 
         if status == 0:
+            on_call_stats = self._manager._on_call_stats
+            if len(data) > 1 and on_call_stats is not None:
+                on_call_stats(method_name, data[1])
             return data[0]
         elif status == 1:
             exc, tb = data
@@ -108,15 +127,23 @@ class Worker:
     def close(self):
         self._manager._stats_killed += 1
         self._manager._workers.discard(self)
-        self._proc.kill()
+        try:
+            self._proc.kill()
+        except ProcessLookupError:
+            pass
 
 
 class Manager:
 
-    def __init__(self, *, worker_cls, worker_args, loop, name, runstate_dir):
+    def __init__(self, *, worker_cls, worker_args, loop, name, runstate_dir,
+                 codec_cls=_codec.PickleCodec, on_call_stats=None):
 
         self._worker_cls = worker_cls
         self._worker_args = worker_args
+        self._codec_cls = codec_cls
+        # Called with the method name and the statistics of every
+        # call that the worker has reported statistics for.
+        self._on_call_stats = on_call_stats
 
         self._loop = loop
 
@@ -142,6 +169,10 @@ class Manager:
             f'{self._worker_cls.__module__}.{self._worker_cls.__name__}',
 
             '--cls-args', base64.b64encode(pickle.dumps(self._worker_args)),
+
+            '--codec-name',
+            f'{self._codec_cls.__module__}.{self._codec_cls.__name__}',
+
             '--sockname', self._poolsock_name
         ]
 
@@ -185,7 +216,9 @@ class Pool:
                  min_capacity,
                  runstate_dir,
                  name,
-                 gc_interval):
+                 gc_interval,
+                 codec_cls=_codec.PickleCodec,
+                 on_call_stats=None):
 
         if min_capacity > max_capacity:
             raise ValueError(
@@ -202,7 +235,9 @@ class Pool:
             worker_cls=worker_cls,
             worker_args=worker_args,
             name=name,
-            runstate_dir=runstate_dir)
+            runstate_dir=runstate_dir,
+            codec_cls=codec_cls,
+            on_call_stats=on_call_stats)
 
         self._max_capacity = max_capacity
         self._min_capacity = min_capacity
@@ -272,9 +307,28 @@ class Pool:
 
         return await self._workers_queue.get()
 
-    def release(self, worker):
+    def release(self, worker, *, discard=False):
+        if discard:
+            # The worker is killed, and a new one takes its place
+            # so that the callers waiting in acquire() get a worker.
+            worker.close()
+            self._capacity -= 1
+            self._loop.create_task(self._replace_worker())
+            return
+
         self._workers_queue.put_nowait(worker)
 
+    async def _replace_worker(self):
+        if (not self._manager.is_running() or
+                self._capacity >= self._max_capacity):
+            return
+        try:
+            await self._spawn_worker()
+        except Exception:
+            # The capacity slot stays free, so the next acquire()
+            # tries to spawn a worker again.
+            pass
+
     async def call(self, method_name, *args):
         worker = await self.acquire()
         try:
@@ -316,7 +370,9 @@ class Pool:
 async def create_pool(*, max_capacity: int, min_capacity: int,
                       runstate_dir: str, name: str,
                       worker_cls: type, worker_args: tuple,
-                      gc_interval: float=GC_INTERVAL) -> Pool:
+                      gc_interval: float=GC_INTERVAL,
+                      codec_cls: type=_codec.PickleCodec,
+                      on_call_stats=None) -> Pool:
 
     loop = asyncio.get_running_loop()
     pool = Pool(
@@ -327,14 +383,18 @@ async def create_pool(*, max_capacity: int, min_capacity: int,
         worker_cls=worker_cls,
         worker_args=worker_args,
         name=name,
-        gc_interval=gc_interval)
+        gc_interval=gc_interval,
+        codec_cls=codec_cls,
+        on_call_stats=on_call_stats)
 
     await pool.start()
     return pool
 
 
 async def create_manager(*, runstate_dir: str, name: str,
-                         worker_cls: type, worker_args: tuple) -> Manager:
+                         worker_cls: type, worker_args: tuple,
+                         codec_cls: type=_codec.PickleCodec,
+                         on_call_stats=None) -> Manager:
 
     loop = asyncio.get_running_loop()
     pool = Manager(
@@ -342,7 +402,9 @@ async def create_manager(*, runstate_dir: str, name: str,
         runstate_dir=runstate_dir,
         worker_cls=worker_cls,
         worker_args=worker_args,
-        name=name)
+        name=name,
+        codec_cls=codec_cls,
+        on_call_stats=on_call_stats)
 
     await pool.start()
     return pool
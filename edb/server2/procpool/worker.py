@@ -40,15 +40,19 @@ def load_class(cls_name):
     return cls
 
 
-async def worker(cls, cls_args, sockname):
+async def worker(cls, cls_args, codec_cls, sockname):
     con = await amsg.worker_connect(sockname)
     worker = cls(*cls_args)
+    codec = codec_cls()
+    # Workers can report statistics of a call (e.g. timings) along
+    # with its result.
+    pop_call_stats = getattr(worker, 'pop_call_stats', None)
 
     while True:
         req = await con.next_request()
 
         try:
-            methname, args = pickle.loads(req)
+            methname, args = codec.decode_request(req)
         except Exception as ex:
             data = (1, ex, traceback.format_exc())
         else:
@@ -56,8 +60,15 @@ async def worker(cls, cls_args, sockname):
 
             try:
                 res = await meth(*args)
-                data = (0, res)
+                stats = pop_call_stats() if pop_call_stats else None
+                if stats is None:
+                    data = (0, res)
+                else:
+                    data = (0, res, stats)
             except Exception as ex:
+                if pop_call_stats:
+                    # Only successful calls are reported.
+                    pop_call_stats()
                 if debug.flags.server:
                     markup.dump(ex, marker="exception in methname()",
                                 file=sys.stderr)
@@ -65,18 +76,18 @@ async def worker(cls, cls_args, sockname):
                 data = (1, ex, traceback.format_exc())
 
         try:
-            pickled = pickle.dumps(data)
+            pickled = codec.encode_response(data)
         except Exception as ex:
             ex_tb = traceback.format_exc()
             ex_str = f'{ex}:\n\n{ex_tb}'
-            pickled = pickle.dumps((2, ex_str))
+            pickled = codec.encode_response((2, ex_str))
 
         await con.reply(pickled)
 
 
-def run_worker(cls, cls_args, sockname):
+def run_worker(cls, cls_args, codec_cls, sockname):
     asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
-    asyncio.run(worker(cls, cls_args, sockname))
+    asyncio.run(worker(cls, cls_args, codec_cls, sockname))
 
 
 def clear_exception_frames(er):
@@ -104,14 +115,16 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--cls-name')
     parser.add_argument('--cls-args')
+    parser.add_argument('--codec-name')
     parser.add_argument('--sockname')
     args = parser.parse_args()
 
     cls = load_class(args.cls_name)
     cls_args = pickle.loads(base64.b64decode(args.cls_args))
+    codec_cls = load_class(args.codec_name)
 
     try:
-        run_worker(cls, cls_args, args.sockname)
+        run_worker(cls, cls_args, codec_cls, args.sockname)
     except amsg.PoolClosedError:
         exit(0)
 
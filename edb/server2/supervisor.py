@@ -0,0 +1,285 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""Running the server in several front-end processes.
+
+The supervisor forks front-end processes that listen on the same
+ports (with SO_REUSEPORT), so that the kernel spreads client
+connections among them.  Each front-end is connected to the supervisor
+with a socket pair.  Whenever a front-end changes the schema of
+a database, it tells the supervisor, which relays the message to
+the other front-ends so that they advance their versions of the
+database and drop compiled queries.  Requests to cancel a query
+are relayed the same way, as the client connection that runs the
+query might be served by another front-end, and so are persisted
+GraphQL queries, as the client might send the digest of a query
+to another front-end than the one it registered the query with.
+
+Messages are framed like procpool messages.  The first byte of
+a message is its type:
+
+    b'D' + name of the database   -- DDL was executed
+    b'C' + connection id, secret  -- cancel a query (two int32)
+    b'G' + GraphQL document       -- a persisted query was registered
+"""
+
+
+import asyncio
+import logging
+import os
+import signal
+import socket
+import struct
+import sys
+import typing
+
+from edb.server2.procpool import amsg
+
+
+__all__ = ('Supervisor', 'SupervisorChannel')
+
+
+logger = logging.getLogger('edb.server')
+
+_len_packer = struct.Struct('!I').pack
+_cancel_struct = struct.Struct('!ii')
+
+_MSG_DDL = b'D'
+_MSG_CANCEL = b'C'
+_MSG_PERSISTED_GRAPHQL = b'G'
+
+
+class _ChannelProtocol(amsg.BaseFramedProtocol):
+
+    def __init__(self, *, loop, on_message, on_lost):
+        super().__init__(loop=loop)
+        self._on_message = on_message
+        self._on_lost = on_lost
+        # Messages sent before the connection is made.
+        self._pending = []
+
+    def send(self, payload: bytes):
+        if self._closed:
+            return
+        if self._transport is None:
+            self._pending.append(payload)
+        else:
+            self._transport.writelines((_len_packer(len(payload)), payload))
+
+    def connection_made(self, tr):
+        super().connection_made(tr)
+        pending, self._pending = self._pending, []
+        for payload in pending:
+            self.send(payload)
+
+    def process_message(self, msg):
+        self._on_message(self, msg)
+
+    def connection_lost(self, exc):
+        super().connection_lost(exc)
+        self._on_lost(self)
+
+
+class SupervisorChannel:
+    """The front-end end of the connection to the supervisor."""
+
+    def __init__(self, sock: socket.socket, *,
+                 on_ddl: typing.Callable[[str], None],
+                 on_cancel: typing.Optional[
+                     typing.Callable[[int, int], None]]=None,
+                 on_persisted_graphql: typing.Optional[
+                     typing.Callable[[bytes], None]]=None):
+        self._sock = sock
+        self._on_ddl = on_ddl
+        self._on_cancel = on_cancel
+        self._on_persisted_graphql = on_persisted_graphql
+        self._protocol = None
+
+    async def connect(self):
+        loop = asyncio.get_running_loop()
+        _, self._protocol = await loop.connect_accepted_socket(
+            lambda: _ChannelProtocol(
+                loop=loop,
+                on_message=self._on_message,
+                on_lost=self._on_lost),
+            self._sock)
+
+    def signal_ddl(self, dbname: str):
+        if self._protocol is not None:
+            self._protocol.send(_MSG_DDL + dbname.encode())
+
+    def request_cancel(self, con_id: int, secret: int):
+        if self._protocol is not None:
+            self._protocol.send(
+                _MSG_CANCEL + _cancel_struct.pack(con_id, secret))
+
+    def announce_persisted_graphql(self, document: bytes):
+        if self._protocol is not None:
+            self._protocol.send(_MSG_PERSISTED_GRAPHQL + document)
+
+    def close(self):
+        if self._protocol is not None:
+            self._protocol._transport.close()
+            self._protocol = None
+
+    def _on_message(self, protocol, msg: bytes):
+        mtype = msg[:1]
+        if mtype == _MSG_DDL:
+            self._on_ddl(msg[1:].decode())
+        elif mtype == _MSG_CANCEL:
+            if self._on_cancel is not None:
+                self._on_cancel(*_cancel_struct.unpack(msg[1:]))
+        elif mtype == _MSG_PERSISTED_GRAPHQL:
+            if self._on_persisted_graphql is not None:
+                self._on_persisted_graphql(msg[1:])
+        else:
+            logger.warning(
+                'unexpected message from the supervisor: %r', mtype)
+
+    def _on_lost(self, protocol):
+        if self._protocol is protocol:
+            # The supervisor is gone; keep serving on our own.
+            logger.warning('lost connection to the supervisor')
+            self._protocol = None
+
+
+class Supervisor:
+    """Fork *nprocs* front-ends and relay messages between them.
+
+    *frontend_main* is called in every front-end process with the
+    index of the process and a SupervisorChannel socket; it returns
+    the exit status of the process.
+    """
+
+    # How often to check whether a front-end process that closed
+    # its channel has exited, in seconds.
+    _REAP_INTERVAL = 0.1
+
+    def __init__(self, nprocs: int,
+                 frontend_main: typing.Callable[[int, socket.socket], int]):
+        if nprocs < 1:
+            raise ValueError('the number of front-ends must be positive')
+        self._nprocs = nprocs
+        self._frontend_main = frontend_main
+        self._protocols = {}
+        self._exited = None
+
+    def run(self) -> typing.Dict[int, int]:
+        """Run the front-ends until all of them exit.
+
+        Return a mapping of front-end PIDs to their exit statuses.
+        """
+        socks = {}
+        for i in range(self._nprocs):
+            parent_sock, child_sock = socket.socketpair(
+                socket.AF_UNIX, socket.SOCK_STREAM)
+
+            pid = os.fork()
+            if pid == 0:
+                self._run_frontend(i, child_sock, parent_sock, socks)
+
+            child_sock.close()
+            socks[pid] = parent_sock
+
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self._relay(loop, socks))
+        finally:
+            loop.close()
+
+    def _run_frontend(self, i, sock, parent_sock, sibling_socks):
+        status = 1
+        try:
+            parent_sock.close()
+            for s in sibling_socks.values():
+                s.close()
+            # The front-end starts a fresh event loop.
+            asyncio.set_event_loop(None)
+            status = self._frontend_main(i, sock)
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            logger.exception('front-end process %d failed', os.getpid())
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(status or 0)
+
+    async def _relay(self, loop, socks):
+        self._exited = {}
+        done = loop.create_future()
+
+        def on_message(protocol, msg):
+            for other in list(self._protocols.values()):
+                if other is not protocol:
+                    other.send(msg)
+
+        def on_lost(protocol):
+            pid = next(
+                pid for pid, p in self._protocols.items() if p is protocol)
+            del self._protocols[pid]
+            reap(pid)
+
+        def reap(pid):
+            # The channel is usually closed by the exit of the process,
+            # but the process might still be shutting down: never block
+            # the loop waiting for it.
+            reaped, status = os.waitpid(pid, os.WNOHANG)
+            if not reaped:
+                loop.call_later(self._REAP_INTERVAL, reap, pid)
+                return
+
+            status = _exit_status(status)
+            self._exited[pid] = status
+            if status != 0:
+                logger.error(
+                    'front-end process %d exited with status %d; '
+                    'stopping the server', pid, status)
+                self._terminate()
+            if len(self._exited) == len(socks):
+                done.set_result(None)
+
+        # Create all protocols upfront, so that no front-end misses
+        # messages sent before the others are connected.
+        for pid in socks:
+            self._protocols[pid] = _ChannelProtocol(
+                loop=loop, on_message=on_message, on_lost=on_lost)
+
+        for pid, sock in socks.items():
+            protocol = self._protocols[pid]
+            await loop.connect_accepted_socket(lambda: protocol, sock)
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, self._terminate)
+
+        await done
+        return self._exited
+
+    def _terminate(self):
+        for pid in self._protocols:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def _exit_status(status: int) -> int:
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
@@ -187,6 +187,71 @@ class ASTBaseTests(unittest.TestCase):
             class Node5(ast.AST):
                 field: list = list
 
+    def test_common_ast_production_mode(self):
+        class Node(ast.AST):
+            field_str: str
+            field_list: typing.List[ast.AST]
+
+        ast.set_production_mode()
+        try:
+            self.assertTrue(ast.is_in_production_mode())
+
+            # Field values are not checked.
+            node = Node(field_str=1)
+            node.field_str = 2
+            self.assertEqual(node.field_str, 2)
+
+            # Parent links are not maintained.
+            child = Node()
+            node = Node(field_list=[child])
+            self.assertIsNone(child.parent)
+            ast.fix_parent_links(node)
+            self.assertIs(child.parent, node)
+
+            with self.assertRaises(ast.ASTError):
+                Node(no_such_field=1)
+        finally:
+            ast.set_production_mode(False)
+
+        self.assertFalse(ast.is_in_production_mode())
+        child = Node()
+        node = Node(field_list=[child])
+        self.assertIs(child.parent, node)
+        if __debug__:
+            with self.assertRaises(TypeError):
+                Node(field_str=1)
+            with self.assertRaises(TypeError):
+                node.field_str = 1
+
+
+class ASTVisitorTests(unittest.TestCase):
+
+    def test_common_ast_visitor_dispatch(self):
+        class Visitor(ast.NodeVisitor):
+            def visit_Base(self, node):
+                return 'base'
+
+            def visit_BinOp(self, node):
+                return ('binop', self.visit([node.left, node.right]))
+
+        class ConstVisitor(Visitor):
+            def visit_Constant(self, node):
+                return node.value
+
+        tree = tast.BinOp(
+            left=tast.Constant(value=1),
+            right=tast.UnaryOp(operand=tast.Constant(value=2)))
+
+        # Visitor methods are looked up separately for every
+        # visitor class.
+        self.assertEqual(Visitor.run(tree), ('binop', ['base', 'base']))
+        self.assertEqual(ConstVisitor.run(tree), ('binop', [1, 'base']))
+        self.assertEqual(Visitor.run(tree), ('binop', ['base', 'base']))
+
+        self.assertEqual(
+            ast.NodeVisitor.run(tree),
+            [[], [[]]])
+
 
 class ASTMatchTests(unittest.TestCase):
     tree1 = tast.BinOp(
@@ -0,0 +1,59 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import collections
+import unittest
+
+from edb.lang.common import compiler
+
+
+class TestPersistentDict(unittest.TestCase):
+
+    def test_common_compiler_persistent_dict_01(self):
+        d1 = compiler.PersistentDict({'a': 1})
+        d2 = d1.copy()
+
+        d1['b'] = 2
+        d2['c'] = 3
+        del d2['a']
+
+        self.assertEqual(dict(d1), {'a': 1, 'b': 2})
+        self.assertEqual(dict(d2), {'c': 3})
+        self.assertIn('b', d1)
+        self.assertNotIn('b', d2)
+        self.assertIsNone(d2.get('b'))
+        self.assertEqual(d1, {'a': 1, 'b': 2})
+
+        with self.assertRaises(KeyError):
+            d2['a']
+
+    def test_common_compiler_persistent_dict_02(self):
+        d1 = compiler.PersistentDict()
+        d1.update({'a': 1})
+        d1.update(compiler.PersistentDict(b=2))
+        d1.update(collections.ChainMap({'c': 3}))
+        d1.update([('d', 4)], e=5)
+
+        self.assertEqual(
+            dict(d1), {'a': 1, 'b': 2, 'c': 3, 'd': 4, 'e': 5})
+
+        d2 = compiler.PersistentDict(d1)
+        d1.clear()
+        self.assertEqual(len(d1), 0)
+        self.assertEqual(len(d2), 5)
@@ -71,3 +71,20 @@ class TestLRU(unittest.TestCase):
 
         l[k4] = l[k4]
         self.assertEqual(list(l), [k1, k5, k4])
+
+    def test_lru_2(self):
+        evicted = []
+        l = lru.LRUMapping(  # noqa
+            maxsize=2, on_evict=lambda k, v: evicted.append((k, v)))
+
+        l['a'] = 1
+        l['b'] = 2
+        l['a'] = 10
+        self.assertEqual(evicted, [])
+
+        l['c'] = 3
+        self.assertEqual(evicted, [('b', 2)])
+
+        del l['a']
+        l.clear()
+        self.assertEqual(evicted, [('b', 2)])
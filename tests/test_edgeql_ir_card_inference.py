@@ -17,16 +17,24 @@
 #
 
 
+import os
 import os.path
 import textwrap
+import time
+import unittest
 
 from edb.lang import _testbase as tb
+from edb.lang import edgeql
 
+from edb.lang.common import ast
 from edb.lang.edgeql import compiler
 from edb.lang.edgeql.compiler import inference
 
 from edb.lang.ir import ast as irast
 
+from edb.server.pgsql import codegen as pg_codegen
+from edb.server.pgsql import compiler as pg_compiler
+
 
 class TestEdgeQLCardinalityInference(tb.BaseEdgeQLCompilerTest):
     """Unit tests for cardinality inference."""
@@ -123,3 +131,107 @@ class TestEdgeQLCardinalityInference(tb.BaseEdgeQLCompilerTest):
 % OK %
         MANY
         """
+
+
+class TestEdgeQLCompilerBenchmark(tb.BaseEdgeQLCompilerTest):
+
+    SCHEMA = os.path.join(os.path.dirname(__file__), 'schemas',
+                          'cards.eschema')
+
+    QUERIES = [
+        """
+        WITH MODULE test
+        SELECT User {
+            name,
+            deck: {
+                name,
+                element,
+                cost,
+                @count
+            } FILTER .element = 'Fire' ORDER BY .name,
+            friends: {
+                name,
+                @nickname
+            },
+            deck_cost
+        } FILTER .name = 'Alice'
+        """,
+        """
+        WITH MODULE test
+        SELECT Card {
+            name,
+            elemental_cost,
+            owners: {name}
+        } FILTER .cost > 1 AND .element IN {'Air', 'Earth'}
+        ORDER BY .cost DESC THEN .name
+        LIMIT 10
+        """,
+        """
+        WITH
+            MODULE test,
+            U := (SELECT User FILTER count(.deck) > 3)
+        SELECT U {
+            name,
+            total := sum(U.deck.cost),
+            elements := array_agg(DISTINCT U.deck.element)
+        }
+        """,
+    ]
+
+    def compile(self, tree):
+        ir = compiler.compile_ast_to_ir(tree, self.schema)
+        return pg_compiler.compile_ir_to_sql(
+            ir, schema=self.schema,
+            output_format=pg_compiler.OutputFormat.JSON)
+
+    @unittest.skipUnless(os.environ.get('EDGEDB_TEST_BENCHMARKS'),
+                         'set EDGEDB_TEST_BENCHMARKS to run benchmarks')
+    def test_edgeql_compiler_benchmark_production_mode(self):
+        rounds = 20
+
+        timings = {}
+        for production_mode in (False, True):
+            # The compiler is not guaranteed to leave its input alone,
+            # so every round gets freshly parsed trees.
+            trees = [[edgeql.parse(query) for query in self.QUERIES]
+                     for _ in range(rounds + 1)]
+
+            ast.set_production_mode(production_mode)
+            try:
+                for tree in trees.pop():
+                    self.compile(tree)
+
+                started = time.perf_counter()
+                for round_trees in trees:
+                    for tree in round_trees:
+                        self.compile(tree)
+                timings[production_mode] = time.perf_counter() - started
+            finally:
+                ast.set_production_mode(False)
+
+        for production_mode, duration in timings.items():
+            mode = 'production' if production_mode else 'checked'
+            per_query = duration / (rounds * len(self.QUERIES)) * 1000
+            print(f'{mode}: {per_query:.3f} ms per query')
+
+        self.assertLess(timings[True], timings[False])
+
+    @unittest.skipUnless(os.environ.get('EDGEDB_TEST_BENCHMARKS'),
+                         'set EDGEDB_TEST_BENCHMARKS to run benchmarks')
+    def test_edgeql_compiler_benchmark_sql_codegen(self):
+        trees = []
+        for query in self.QUERIES:
+            ir = compiler.compile_ast_to_ir(edgeql.parse(query), self.schema)
+            trees.append(pg_compiler.compile_ir_to_sql_tree(
+                ir, schema=self.schema,
+                output_format=pg_compiler.OutputFormat.JSON))
+        rounds = 100
+
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for tree in trees:
+                pg_codegen.SQLSourceGenerator.to_source(tree)
+        duration = time.perf_counter() - started
+
+        per_tree = duration / (rounds * len(trees)) * 1000
+        print(f'SQL codegen: {per_tree:.3f} ms per query')
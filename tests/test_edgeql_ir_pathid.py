@@ -160,3 +160,27 @@ class TestEdgeQLIRPathID(tb.BaseEdgeQLCompilerTest):
                 '.>(test::deck)[IS test::Card]',
             ]
         )
+
+    def test_edgeql_ir_pathid_hash_01(self):
+        User = self.schema.get('test::User')
+        deck_ptr = User.getptr(self.schema, 'deck')
+
+        pid_1 = pathid.PathId.from_type(self.schema, User)
+        pid_2 = pid_1.extend(deck_ptr, schema=self.schema)
+        pid_2_again = pid_1.extend(deck_ptr, schema=self.schema)
+
+        # Equal PathIds built separately hash equally.
+        self.assertIsNot(pid_2, pid_2_again)
+        self.assertEqual(pid_2, pid_2_again)
+        self.assertEqual(hash(pid_2), hash(pid_2_again))
+        self.assertEqual({pid_2: 1}[pid_2_again], 1)
+
+        self.assertNotEqual(pid_2, pid_2.ptr_path())
+        self.assertNotEqual(
+            pid_2, pid_2.replace_namespace(frozenset(('foo',))))
+
+        # Prefixes are computed once.
+        prefixes = list(pid_2.iter_prefixes())
+        self.assertEqual(prefixes, [pid_1, pid_2])
+        for p1, p2 in zip(prefixes, pid_2.iter_prefixes()):
+            self.assertIs(p1, p2)
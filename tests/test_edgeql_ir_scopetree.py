@@ -18,8 +18,10 @@
 
 
 import difflib
+import os
 import os.path
 import textwrap
+import unittest
 
 from edb import errors
 
@@ -50,6 +52,31 @@ class TestEdgeQLIRScopeTree(tb.BaseEdgeQLCompilerTest):
                 f'\nEXPECTED:\n{expected_scope}\nACTUAL:\n{path_scope}'
                 f'\nDIFF:\n{diff}')
 
+    # Compare the durations of the benchmarks below, e.g. with
+    # pytest --durations.
+
+    @unittest.skipUnless(os.environ.get('EDGEDB_TEST_BENCHMARKS'),
+                         'set EDGEDB_TEST_BENCHMARKS to run benchmarks')
+    def test_edgeql_ir_scope_tree_benchmark_wide(self):
+        for n in (5, 10, 20, 40):
+            elements = ',\n'.join(
+                f'a{i} := (count(User.deck) + {i}, User.friends.name)'
+                for i in range(n))
+            compiler.compile_to_ir(
+                f'WITH MODULE test SELECT User {{ {elements} }}',
+                self.schema)
+
+    @unittest.skipUnless(os.environ.get('EDGEDB_TEST_BENCHMARKS'),
+                         'set EDGEDB_TEST_BENCHMARKS to run benchmarks')
+    def test_edgeql_ir_scope_tree_benchmark_deep(self):
+        for n in (5, 10, 20, 40):
+            shape = 'name'
+            for _ in range(n):
+                shape = f'name, deck: {{name, cost}}, friends: {{{shape}}}'
+            compiler.compile_to_ir(
+                f'WITH MODULE test SELECT User {{ {shape} }}',
+                self.schema)
+
     def test_edgeql_ir_scope_tree_01(self):
         """
         WITH MODULE test
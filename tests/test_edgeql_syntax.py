@@ -17,12 +17,15 @@
 #
 
 
+import os
 import re
+import time
 import unittest  # NOQA
 
 from edb import errors
 
 from edb.lang import _testbase as tb
+from edb.lang import edgeql
 from edb.lang.edgeql import generate_source as edgeql_to_source
 from edb.lang.edgeql.parser import parser as edgeql_parser
 
@@ -3292,3 +3295,36 @@ aa';
 
         DROP INDEX title_name;
         """
+
+
+class TestEdgeQLParserBenchmark(unittest.TestCase):
+
+    def get_queries(self):
+        queries = []
+        for name in dir(TestEdgeSchemaParser):
+            meth = getattr(TestEdgeSchemaParser, name)
+            if (not name.startswith('test_') or not meth.__doc__ or
+                    'must_fail' in getattr(meth, 'test_spec', {})):
+                continue
+            queries.append(meth.__doc__.partition('\n% OK %')[0])
+        return queries
+
+    @unittest.skipUnless(os.environ.get('EDGEDB_TEST_BENCHMARKS'),
+                         'set EDGEDB_TEST_BENCHMARKS to run benchmarks')
+    def test_edgeql_syntax_parse_benchmark(self):
+        queries = self.get_queries()
+        rounds = 5
+
+        # Warm up: load the parser tables.
+        for query in queries:
+            edgeql.parse_block(query)
+
+        size = sum(len(query) for query in queries) * rounds
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for query in queries:
+                edgeql.parse_block(query)
+        duration = time.perf_counter() - started
+
+        print(f'{rounds * len(queries) / duration:.0f} blocks/s, '
+              f'{size / duration / 1024:.0f} KiB/s')
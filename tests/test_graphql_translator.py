@@ -17,6 +17,7 @@
 #
 
 
+import ast
 import difflib
 import os
 import re
@@ -26,6 +27,7 @@ import unittest  # NOQA
 from edb.lang import _testbase as tb
 from edb.lang import graphql as edge_graphql
 from edb.lang import edgeql as edge_edgeql
+from edb.lang.graphql import translator
 from edb.lang.graphql.errors import GraphQLCoreError
 
 
@@ -1733,6 +1735,61 @@ class TestGraphQLTranslation(TranslatorTest):
         }
         """
 
+    @with_variables(n=2)
+    def test_graphql_translation_variables_33(self):
+        r"""
+        query($n: Int) {
+            User(order: {name: {dir: ASC}}, first: $n) {
+                name
+            }
+        }
+
+% OK %
+        # critical variables: $n=2
+
+        SELECT stdgraphql::Query {
+            multi User := (
+                SELECT
+                    test::User {
+                        name
+                    }
+                ORDER BY .name ASC EMPTY FIRST
+                LIMIT 2
+            )
+        };
+        """
+
+    def test_graphql_translation_variables_cache_01(self):
+        query = r"""
+            query($name: String, $n: Int) {
+                User(filter: {name: {eq: $name}}, first: $n) {
+                    name
+                }
+            }
+        """
+
+        def translate(**variables):
+            return edge_graphql.translate(
+                self.schema, query,
+                variables={'$' + n: v for n, v in variables.items()})
+
+        translator._translation_caches.clear()
+        first = translate(name='John', n=1)
+        cache = translator._translation_caches[self.schema].translations
+        self.assertEqual(len(cache), 0)
+
+        # Critical variables are known now.
+        self.assertEqual(translate(name='John', n=1), first)
+        self.assertEqual(len(cache), 1)
+
+        # Other variables are query parameters and do not affect
+        # the translation.
+        self.assertEqual(translate(name='Jane', n=1), first)
+        self.assertEqual(len(cache), 1)
+
+        self.assertNotEqual(translate(name='John', n=2), first)
+        self.assertEqual(len(cache), 2)
+
     @tb.must_fail(GraphQLCoreError, line=4, col=31)
     def test_graphql_translation_enum_01(self):
         r"""
@@ -4826,3 +4883,94 @@ class TestGraphQLTranslation(TranslatorTest):
             }
           }
         """
+
+    def test_graphql_translation_schema_cache_01(self):
+        # The reflection of the schema is built once and reused.
+        gqlcore = translator._get_gqlcore(self.schema)
+        self.assertIs(translator._get_gqlcore(self.schema), gqlcore)
+
+        edge_graphql.translate(self.schema, 'query { User { name } }')
+        self.assertIs(translator._get_gqlcore(self.schema), gqlcore)
+
+
+class TestGraphQLTranslationPipeline(TranslatorTest):
+    SCHEMA = os.path.join(os.path.dirname(__file__), 'schemas',
+                          'graphql.eschema')
+
+    @classmethod
+    def get_functional_queries(cls):
+        # The queries run by test_graphql_functional, which uses
+        # the same schema.
+        path = os.path.join(os.path.dirname(__file__),
+                            'test_graphql_functional.py')
+        with open(path) as f:
+            tree = ast.parse(f.read())
+
+        queries = []
+        for func in ast.walk(tree):
+            if (not isinstance(func, ast.AsyncFunctionDef) or
+                    any(cls.is_expected_failure(decorator)
+                        for decorator in func.decorator_list)):
+                continue
+
+            for node in ast.walk(func):
+                if (isinstance(node, ast.Call) and
+                        isinstance(node.func, ast.Attribute) and
+                        node.func.attr == 'graphql_query' and
+                        node.args):
+                    try:
+                        queries.append(ast.literal_eval(node.args[0]))
+                    except ValueError:
+                        # Queries built at run time, e.g. with f-strings.
+                        continue
+        return queries
+
+    @staticmethod
+    def is_expected_failure(decorator):
+        if isinstance(decorator, ast.Attribute):
+            return decorator.attr == 'expectedFailure'
+        elif isinstance(decorator, ast.Name):
+            return decorator.id == 'expectedFailure'
+        else:
+            return False
+
+    def test_graphql_translation_pipeline_01(self):
+        # The server compiles the translated EdgeQL ASTs directly;
+        # they must be the same as the result of parsing the
+        # translated EdgeQL source.
+        queries = self.get_functional_queries()
+        self.assertTrue(queries)
+
+        for query in queries:
+            with self.subTest(query=query):
+                trees = edge_graphql.translate_ast(self.schema, query)
+                reparsed = edge_edgeql.parse_block(
+                    edge_graphql.translate(self.schema, query))
+                self.assertEqual(
+                    [edge_edgeql.generate_source(t) for t in trees],
+                    [edge_edgeql.generate_source(t) for t in reparsed])
+
+    def run_translation_benchmark(self, translate):
+        # Compare the durations of the benchmarks below, e.g. with
+        # pytest --durations.
+        queries = self.get_functional_queries()
+        # Warm up the caches of the translator.
+        for query in queries:
+            translate(query)
+
+        for _ in range(20):
+            for query in queries:
+                translate(query)
+
+    @unittest.skipUnless(os.environ.get('EDGEDB_TEST_BENCHMARKS'),
+                         'set EDGEDB_TEST_BENCHMARKS to run benchmarks')
+    def test_graphql_translation_pipeline_benchmark_source(self):
+        self.run_translation_benchmark(
+            lambda query: edge_edgeql.parse_block(
+                edge_graphql.translate(self.schema, query)))
+
+    @unittest.skipUnless(os.environ.get('EDGEDB_TEST_BENCHMARKS'),
+                         'set EDGEDB_TEST_BENCHMARKS to run benchmarks')
+    def test_graphql_translation_pipeline_benchmark_direct(self):
+        self.run_translation_benchmark(
+            lambda query: edge_graphql.translate_ast(self.schema, query))
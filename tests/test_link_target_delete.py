@@ -17,7 +17,9 @@
 #
 
 
+import os
 import pathlib
+import time
 import unittest  # NOQA
 
 import edgedb
@@ -507,6 +509,90 @@ class TestLinkTargetDeleteDeclarative(stb.QueryTestCase):
                 }]
             ])
 
+    async def test_link_on_target_delete_set_empty_03(self):
+        # Targets of a descendant type are deleted through the parent
+        # type and through their own type.
+        async with self._run_and_rollback():
+            await self.query("""
+                SET MODULE test;
+
+                INSERT Target1Child {
+                    name := 'Target1Child.1'
+                };
+
+                INSERT Target1Child {
+                    name := 'Target1Child.2'
+                };
+
+                INSERT Source1 {
+                    name := 'Source1.1',
+                    tgt1_set_empty := (
+                        SELECT Target1
+                        FILTER .name = 'Target1Child.1'
+                    )
+                };
+
+                INSERT Source3 {
+                    name := 'Source3.1',
+                    tgt1_set_empty := (
+                        SELECT Target1
+                        FILTER .name = 'Target1Child.2'
+                    )
+                };
+            """)
+
+            await self.query("""
+                DELETE (SELECT test::Target1
+                        FILTER .name = 'Target1Child.1');
+            """)
+
+            await self.assert_query_result(r'''
+                WITH MODULE test
+                SELECT
+                    Source1 {
+                        name,
+                        tgt1_set_empty: {
+                            name
+                        }
+                    }
+                ORDER BY
+                    .name;
+            ''', [
+                [{
+                    'name': 'Source1.1',
+                    'tgt1_set_empty': None,
+                }, {
+                    'name': 'Source3.1',
+                    'tgt1_set_empty': {'name': 'Target1Child.2'},
+                }]
+            ])
+
+            await self.query("""
+                DELETE (SELECT test::Target1Child
+                        FILTER .name = 'Target1Child.2');
+            """)
+
+            await self.assert_query_result(r'''
+                WITH MODULE test
+                SELECT
+                    Source1 {
+                        name,
+                        tgt1_set_empty: {
+                            name
+                        }
+                    }
+                ORDER BY
+                    .name;
+            ''', [
+                [{
+                    'name': 'Source1.1',
+                    'tgt1_set_empty': None,
+                }, {
+                    'name': 'Source3.1',
+                    'tgt1_set_empty': None,
+                }]
+            ])
+
     async def test_link_on_target_delete_delete_source_01(self):
         async with self._run_and_rollback():
             await self.query("""
@@ -745,6 +831,116 @@ class TestLinkTargetDeleteDeclarative(stb.QueryTestCase):
                 ]
             ])
 
+    async def test_link_on_target_delete_delete_source_04(self):
+        # Targets of a descendant type are deleted through the parent
+        # type and through their own type.
+        async with self._run_and_rollback():
+            await self.query("""
+                SET MODULE test;
+
+                INSERT Target1Child {
+                    name := 'Target1Child.1'
+                };
+
+                INSERT Target1Child {
+                    name := 'Target1Child.2'
+                };
+
+                INSERT Source1 {
+                    name := 'Source1.1',
+                    tgt1_del_source := (
+                        SELECT Target1
+                        FILTER .name = 'Target1Child.1'
+                    )
+                };
+
+                INSERT Source3 {
+                    name := 'Source3.1',
+                    tgt1_del_source := (
+                        SELECT Target1
+                        FILTER .name = 'Target1Child.2'
+                    )
+                };
+            """)
+
+            await self.query("""
+                DELETE (SELECT test::Target1
+                        FILTER .name = 'Target1Child.1');
+            """)
+
+            await self.assert_query_result(r'''
+                WITH MODULE test
+                SELECT
+                    Source1 {
+                        name
+                    }
+                ORDER BY
+                    .name;
+            ''', [
+                [{'name': 'Source3.1'}]
+            ])
+
+            await self.query("""
+                DELETE (SELECT test::Target1Child
+                        FILTER .name = 'Target1Child.2');
+            """)
+
+            await self.assert_query_result(r'''
+                WITH MODULE test
+                SELECT
+                    Source1;
+
+                WITH MODULE test
+                SELECT
+                    Target1;
+            ''', [
+                [],
+                [],
+            ])
+
+    @unittest.skipUnless(os.environ.get('EDGEDB_TEST_BENCHMARKS'),
+                         'set EDGEDB_TEST_BENCHMARKS to run benchmarks')
+    async def test_link_on_target_delete_benchmark(self):
+        count = 2000
+        names = ', '.join(f"'Bulk.{i}'" for i in range(count))
+
+        async with self._run_and_rollback():
+            await self.query(f"""
+                SET MODULE test;
+
+                FOR name IN {{{names}}}
+                UNION (
+                    INSERT Source1 {{
+                        name := name,
+                        tgt1_set_empty := (
+                            INSERT Target1 {{
+                                name := name ++ '.set_empty'
+                            }}
+                        ),
+                        tgt1_del_source := (
+                            INSERT Target1 {{
+                                name := name ++ '.del_source'
+                            }}
+                        )
+                    }}
+                );
+            """)
+
+            started = time.perf_counter()
+            await self.query("""
+                DELETE test::Target1;
+            """)
+            duration = time.perf_counter() - started
+
+            print(f'deleted {count * 2} targets in {duration:.3f} s')
+
+            await self.assert_query_result(r'''
+                WITH MODULE test
+                SELECT count(Source1);
+            ''', [
+                [0],
+            ])
+
 
 class TestLinkTargetDeleteMigrations(stb.NonIsolatedDDLTestCase):
     SCHEMA = pathlib.Path(__file__).parent / 'schemas' / 'link_tgt_del.eschema'
@@ -17,6 +17,8 @@
 #
 
 
+import pickle
+
 from edb import errors
 
 from edb.lang import _testbase as tb
@@ -261,3 +263,85 @@ _123456789_123456789_123456789 -> str
             Object1.get_attribute(schema, 'test::inh'), 'inherit me')
         self.assertEqual(
             Object2.get_attribute(schema, 'test::inh'), 'inherit me')
+
+    def test_schema_delta_01(self):
+        base = self.load_schema("""
+            type Object1:
+                property name -> str
+        """)
+
+        schema = self.run_ddl(base, '''
+            CREATE TYPE test::Object2 EXTENDING test::Object1;
+            ALTER TYPE test::Object1 {
+                CREATE PROPERTY test::val -> int64;
+            };
+        ''')
+
+        delta = pickle.loads(pickle.dumps(schema.get_delta(base)))
+        restored = base.apply_delta(delta)
+
+        Obj1 = restored.get('test::Object1')
+        Obj2 = restored.get('test::Object2')
+        self.assertEqual(Obj2.get_bases(restored).objects(restored), (Obj1,))
+        self.assertEqual(
+            set(Obj1.get_pointers(restored).names(restored)),
+            set(schema.get('test::Object1').get_pointers(schema)
+                      .names(schema)))
+
+        self.assertEqual(
+            restored.get_referrers(Obj1),
+            schema.get_referrers(schema.get('test::Object1')))
+
+        schema2 = self.run_ddl(schema, '''
+            DROP TYPE test::Object2;
+        ''')
+
+        restored = restored.apply_delta(schema2.get_delta(schema))
+        self.assertIsNone(restored.get('test::Object2', None))
+        self.assertEqual(restored.get_referrers(Obj1),
+                         schema2.get_referrers(Obj1))
+
+        self.assertIs(schema2.apply_delta(schema2.get_delta(schema2)),
+                      schema2)
+
+    def test_schema_fingerprint_01(self):
+        base = self.load_schema("""
+            type Object1:
+                property name -> str
+        """)
+
+        std, schema = pickle.loads(pickle.dumps((self.schema, base)))
+        self.assertEqual(schema.get_fingerprint(std),
+                         base.get_fingerprint(self.schema))
+
+        schema2 = self.run_ddl(base, '''
+            ALTER TYPE test::Object1 {
+                CREATE PROPERTY test::val -> int64;
+            };
+        ''')
+        self.assertNotEqual(schema2.get_fingerprint(self.schema),
+                            base.get_fingerprint(self.schema))
+
+    def test_schema_fingerprint_02(self):
+        # Migrations keep their commands in the schema; those are
+        # not introspectable and do not affect the fingerprint.
+        schema = self.run_ddl(self.schema, '''
+            CREATE MODULE test;
+            CREATE MIGRATION test::d1 TO eschema $$
+                type Object1:
+                    property name -> str
+            $$;
+            COMMIT MIGRATION test::d1;
+        ''')
+
+        fingerprint = schema.get_fingerprint(self.schema)
+        self.assertNotEqual(fingerprint,
+                            self.schema.get_fingerprint(self.schema))
+
+        schema2 = self.run_ddl(schema, '''
+            ALTER TYPE test::Object1 {
+                CREATE PROPERTY test::val -> int64;
+            };
+        ''')
+        self.assertNotEqual(schema2.get_fingerprint(self.schema),
+                            fingerprint)
@@ -0,0 +1,71 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import asyncio
+import tempfile
+
+from edb.lang import _testbase as tb
+
+from edb.server2.backend import compiler
+
+
+class TestCompilerSchemaUpdates(tb.BaseSchemaTest):
+
+    # Built by a migration, see BaseSchemaTest.get_schema_script().
+    SCHEMA = '''
+        type Object1:
+            property name -> str
+    '''
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+
+        self.std_schema = tb._load_std_schema()
+        self.compiler = compiler.Compiler({}, tmpdir.name)
+        self.compiler._cached_std_schema = self.std_schema
+        self.compiler._std_fingerprint = b''
+
+    def test_server_compiler_schema_delta_01(self):
+        self.compiler._cached_dbs['test'] = compiler.CompilerDatabaseState(
+            dbver=1, con_args={}, schema=self.std_schema)
+
+        # Migrations are left out of the delta.
+        delta = self.compiler._dump_schema_delta(
+            self.schema, self.std_schema)
+        asyncio.run(self.compiler.set_database_schema(
+            'test', [(2, 1, delta)]))
+
+        db = self.compiler._cached_dbs['test']
+        self.assertEqual(db.dbver, 2)
+        self.assertIsNotNone(db.schema.get('test::Object1', None))
+        self.assertIsNone(db.schema.get('test::d1', None))
+        self.assertIsNotNone(self.schema.get('test::d1', None))
+
+    def test_server_compiler_schema_snapshot_01(self):
+        snapshot = self.compiler._dump_schema(self.schema)
+        schema = self.compiler._load_schema(snapshot)
+
+        self.assertIsNotNone(schema.get('test::Object1', None))
+        self.assertIsNone(schema.get('test::d1', None))
+        self.assertEqual(
+            set(schema.get('test::Object1').get_pointers(schema)
+                      .names(schema)),
+            set(self.schema.get('test::Object1').get_pointers(self.schema)
+                           .names(self.schema)))
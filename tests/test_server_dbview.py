@@ -0,0 +1,358 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import immutables
+
+from edb.server2 import metrics
+from edb.server2.backend import dbstate
+from edb.server2.backend import dbview
+from edb.server2.backend import querycache
+
+
+class TestDatabaseSchemaVersions(unittest.TestCase):
+
+    def ddl(self, db, delta, *, dbver=None):
+        if dbver is None:
+            dbver = db._dbver
+        db._signal_ddl(dbstate.QueryUnit(
+            dbver=dbver, txid=None, has_ddl=True, schema_delta=delta))
+        return db._dbver
+
+    def test_server_dbview_schema_updates_01(self):
+        db = dbview.Database('test')
+        v0 = db._dbver
+
+        self.assertIsNone(db._get_schema_updates(None, v0))
+        self.assertEqual(db._get_schema_updates(v0, v0), [])
+
+        db._set_schema_snapshot(v0, b'snap0')
+        self.assertEqual(
+            db._get_schema_updates(None, v0), [(v0, None, b'snap0')])
+
+        v1 = self.ddl(db, b'd1')
+        v2 = self.ddl(db, b'd2')
+
+        self.assertEqual(
+            db._get_schema_updates(v0, v2),
+            [(v1, v0, b'd1'), (v2, v1, b'd2')])
+        self.assertEqual(
+            db._get_schema_updates(v1, v2),
+            [(v2, v1, b'd2')])
+        self.assertEqual(
+            db._get_schema_updates(None, v2),
+            [(v0, None, b'snap0'), (v1, v0, b'd1'), (v2, v1, b'd2')])
+
+        db._set_schema_snapshot(v1, b'snap1')
+        self.assertEqual(db._schema_deltas, {v2: (v1, b'd2')})
+        self.assertEqual(
+            db._get_schema_updates(v0, v2),
+            [(v1, None, b'snap1'), (v2, v1, b'd2')])
+
+        # Older snapshots are ignored.
+        db._set_schema_snapshot(v0, b'snap0')
+        self.assertEqual(db._schema_snapshot, (v1, b'snap1'))
+
+    def test_server_dbview_schema_updates_02(self):
+        db = dbview.Database('test')
+        v0 = db._dbver
+        db._set_schema_snapshot(v0, b'snap0')
+
+        # DDL compiled against an outdated version of the schema
+        # cannot be applied as a delta.
+        v1 = self.ddl(db, b'd1', dbver=v0 - 1)
+        self.assertIsNone(db._get_schema_updates(v0, v1))
+
+        # Neither can DDL without a delta.
+        v2 = self.ddl(db, b'')
+        self.assertIsNone(db._get_schema_updates(v0, v2))
+
+    def test_server_dbview_ddl_in_tx_01(self):
+        db = dbview.Database('test')
+        view = dbview.DatabaseConnectionView(db, user='test')
+        v0 = db._dbver
+
+        units = [
+            dbstate.QueryUnit(dbver=v0, txid=1, starts_tx=True),
+            dbstate.QueryUnit(dbver=v0, txid=1, has_ddl=True),
+            dbstate.QueryUnit(
+                dbver=v0, txid=1, commits_tx=True, schema_delta=b'd1'),
+        ]
+
+        for unit in units:
+            view.start(unit)
+            self.assertEqual(db._dbver, v0)
+            view.on_success(unit)
+
+        self.assertNotEqual(db._dbver, v0)
+        self.assertEqual(db._schema_deltas, {db._dbver: (v0, b'd1')})
+
+    def test_server_dbview_external_ddl_01(self):
+        signaled = []
+        dbindex = dbview.DatabaseIndex(on_ddl=signaled.append)
+        view = dbindex.new_view('test', user='test')
+        db = dbindex.get_db('test')
+        v0 = db._dbver
+        db._set_schema_snapshot(v0, b'snap0')
+
+        unit = dbstate.QueryUnit(
+            dbver=v0, txid=None, has_ddl=True, schema_delta=b'd1')
+        view.start(unit)
+        view.on_success(unit)
+        self.assertEqual(signaled, ['test'])
+        v1 = db._dbver
+
+        # A schema change made by another process has to be
+        # introspected.
+        db._eql_to_compiled[b'SELECT 1'] = unit
+        dbindex.signal_external_ddl('test')
+        self.assertNotEqual(db._dbver, v1)
+        self.assertIsNone(db._get_schema_updates(v1, db._dbver))
+        self.assertEqual(len(db._eql_to_compiled), 0)
+        self.assertEqual(signaled, ['test'])
+
+        # Databases that have not been used yet are ignored.
+        dbindex.signal_external_ddl('other')
+
+
+class TestCompiledQueryCache(unittest.TestCase):
+
+    def new_unit(self, dbver):
+        return dbstate.QueryUnit(
+            dbver=dbver, txid=None, sql=b'SELECT 1', sql_hash=b'h',
+            out_type_data=b'o', out_type_id=b'oid',
+            in_type_data=b'i', in_type_id=b'iid')
+
+    def set_module(self, view, module):
+        unit = dbstate.QueryUnit(
+            dbver=view.dbver, txid=None,
+            modaliases=immutables.Map({None: module}),
+            config=immutables.Map())
+        view.start(unit)
+        view.on_success(unit)
+
+    def test_server_query_cache_session_01(self):
+        db = dbview.Database('test')
+        view1 = db._new_view(user='test')
+        view2 = db._new_view(user='test')
+
+        # Equal session states are interned.
+        self.assertIs(view1.modaliases, view2.modaliases)
+        self.assertIs(view1._session_state, view2._session_state)
+
+        unit = self.new_unit(db._dbver)
+        view1.cache_compiled_query(b'SELECT 1', False, unit)
+        self.assertIs(view2.lookup_compiled_query(b'SELECT 1', False), unit)
+
+        # Queries compiled for another session state are not shared.
+        self.set_module(view2, 'test')
+        self.assertIsNone(view2.lookup_compiled_query(b'SELECT 1', False))
+        self.assertIs(view1.lookup_compiled_query(b'SELECT 1', False), unit)
+
+        self.set_module(view1, 'test')
+        self.assertIs(view1._session_state, view2._session_state)
+        self.assertIsNone(view1.lookup_compiled_query(b'SELECT 1', False))
+
+        stats = {s['modaliases'][None]: s for s in db._get_query_cache_stats()}
+        self.assertEqual(stats['default']['hits'], 2)
+        self.assertEqual(stats['default']['misses'], 0)
+        self.assertEqual(stats['test']['hits'], 0)
+        self.assertEqual(stats['test']['misses'], 2)
+        self.assertEqual(stats['default']['hit_rate'], 1.0)
+
+    def test_server_query_cache_session_02(self):
+        db = dbview.Database('test')
+        view = db._new_view(user='test')
+        self.set_module(view, 'test')
+        self.assertEqual(len(db._session_states), 1)
+
+        # Session states that are no longer used are forgotten.
+        del view
+        self.assertEqual(len(db._session_states), 0)
+
+    def test_server_query_cache_metrics_01(self):
+        m = metrics.ServerMetrics()
+        dbindex = dbview.DatabaseIndex(metrics=m)
+        view = dbindex.new_view('test', user='test')
+        db = dbindex.get_db('test')
+        db._eql_to_compiled._maxsize = 2
+
+        self.assertIsNone(view.lookup_compiled_query(b'SELECT 1', False))
+        for i in range(3):
+            view.cache_compiled_query(
+                b'SELECT %d' % i, False, self.new_unit(db._dbver))
+        self.assertIsNotNone(view.lookup_compiled_query(b'SELECT 2', False))
+
+        lookups = m.query_cache_lookups
+        evictions = m.query_cache_evictions
+        self.assertEqual(lookups.get('test', 'hit'), 1)
+        self.assertEqual(lookups.get('test', 'miss'), 1)
+        self.assertEqual(evictions.get('test', 'lru'), 1)
+
+        db._signal_ddl(dbstate.QueryUnit(
+            dbver=db._dbver, txid=None, has_ddl=True))
+        self.assertEqual(evictions.get('test', 'ddl'), 2)
+
+    def test_server_query_cache_graphql_01(self):
+        db = dbview.Database('test')
+        view = db._new_view(user='test')
+        doc = b'query { User { name } }'
+
+        self.assertIsNone(view.lookup_compiled_graphql(doc))
+        units = [self.new_unit(db._dbver), self.new_unit(db._dbver)]
+        view.cache_compiled_graphql(doc, units)
+        self.assertEqual(view.lookup_compiled_graphql(doc), tuple(units))
+
+        # Units of another session state are not shared.
+        view2 = db._new_view(user='test')
+        self.set_module(view2, 'test')
+        self.assertIsNone(view2.lookup_compiled_graphql(doc))
+
+        # Units compiled in a transaction are bound to it.
+        view.start(dbstate.QueryUnit(
+            dbver=db._dbver, txid=1, starts_tx=True))
+        self.assertIsNone(view.lookup_compiled_graphql(doc))
+        view.cache_compiled_graphql(b'query { a }', [self.new_unit(1)])
+        view.rollback()
+        self.assertIsNone(view.lookup_compiled_graphql(b'query { a }'))
+
+        db._signal_ddl(dbstate.QueryUnit(
+            dbver=db._dbver, txid=None, has_ddl=True))
+        self.assertIsNone(view.lookup_compiled_graphql(doc))
+        # Units compiled against an old schema are not cached.
+        view.cache_compiled_graphql(doc, units)
+        self.assertIsNone(view.lookup_compiled_graphql(doc))
+
+
+class TestPersistentQueryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'cache.db')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def new_cache(self):
+        cache = querycache.PersistentQueryCache(self.path)
+        cache.open()
+        self.addCleanup(cache.close)
+        return cache
+
+    def run_coro(self, coro):
+        return asyncio.get_event_loop().run_until_complete(coro)
+
+    def new_unit(self, dbver):
+        return dbstate.QueryUnit(
+            dbver=dbver, txid=None, sql=b'SELECT 1', sql_hash=b'h',
+            out_type_data=b'o', out_type_id=b'oid',
+            in_type_data=b'i', in_type_id=b'iid')
+
+    def test_server_query_cache_01(self):
+        aliases = immutables.Map({None: 'default'})
+        config = immutables.Map()
+
+        cache = self.new_cache()
+        db = dbview.Database('test', query_cache=cache)
+        db._set_schema_fingerprint(db._dbver, b'fp1')
+        view = db._new_view(user='test')
+        unit = self.new_unit(db._dbver)
+        view.cache_compiled_query(b'SELECT 1', False, unit)
+        # Flush the queued write.
+        cache.close()
+
+        # A different server process with the same schema.
+        db2 = dbview.Database('test', query_cache=self.new_cache())
+        view2 = db2._new_view(user='test')
+        self.assertIsNone(view2.lookup_compiled_query(b'SELECT 1', False))
+        self.assertIsNone(
+            self.run_coro(view2.lookup_persisted_query(b'SELECT 1', False)))
+
+        db2._set_schema_fingerprint(db2._dbver, b'fp1')
+        cached = self.run_coro(
+            view2.lookup_persisted_query(b'SELECT 1', False))
+        self.assertEqual(cached.sql, unit.sql)
+        self.assertEqual(cached.dbver, db2._dbver)
+        self.assertIs(view2.lookup_compiled_query(b'SELECT 1', False), cached)
+
+        self.assertIsNone(
+            self.run_coro(view2.lookup_persisted_query(b'SELECT 1', True)))
+
+        key = querycache.PersistentQueryCache.make_key
+        self.assertNotEqual(
+            key(b'fp1', b'SELECT 1', False, aliases, config),
+            key(b'fp1', b'SELECT 1', False,
+                aliases.set(None, 'test'), config))
+        self.assertNotEqual(
+            key(b'fp1', b'SELECT 1', False, aliases, config),
+            key(b'fp2', b'SELECT 1', False, aliases, config))
+
+    def test_server_query_cache_02(self):
+        db = dbview.Database('test', query_cache=self.new_cache())
+        db._set_schema_fingerprint(db._dbver, b'fp1')
+        view = db._new_view(user='test')
+
+        # The fingerprint of a schema changed by DDL is unknown
+        # unless the DDL carries one.
+        db._signal_ddl(dbstate.QueryUnit(
+            dbver=db._dbver - 1, txid=None, has_ddl=True,
+            schema_delta=b'd', schema_fingerprint=b'fp2'))
+        self.assertIsNone(db._fingerprint)
+
+        db._signal_ddl(dbstate.QueryUnit(
+            dbver=db._dbver, txid=None, has_ddl=True,
+            schema_delta=b'd', schema_fingerprint=b'fp2'))
+        self.assertEqual(db._fingerprint, b'fp2')
+
+        unit = self.new_unit(db._dbver - 1)
+        view.cache_compiled_query(b'SELECT 1', False, unit)
+        db._eql_to_compiled.clear()
+        self.assertIsNone(
+            self.run_coro(view.lookup_persisted_query(b'SELECT 1', False)))
+
+    def test_server_query_cache_03(self):
+        key = querycache.PersistentQueryCache.make_key(
+            b'fp1', b'SELECT 1', False,
+            immutables.Map({None: 'default'}), immutables.Map())
+
+        cache = self.new_cache()
+        cache.set(key, self.new_unit(1))
+        self.assertEqual(self.run_coro(cache.get(key)).sql, b'SELECT 1')
+        cache.close()
+
+        con = sqlite3.connect(self.path)
+        with con:
+            con.execute('UPDATE queries SET unit = ?', (b'garbage',))
+        con.close()
+
+        # Entries that cannot be unpickled are dropped.
+        cache = self.new_cache()
+        with self.assertLogs('edb.server', 'WARNING'):
+            self.assertIsNone(self.run_coro(cache.get(key)))
+        cache.close()
+
+        con = sqlite3.connect(self.path)
+        self.assertEqual(
+            con.execute('SELECT count(*) FROM queries').fetchone()[0], 0)
+        con.close()
@@ -0,0 +1,120 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import dataclasses
+import unittest
+
+import immutables
+
+from edb.server2.backend import dbstate
+from edb.server2.backend import ipc
+
+
+class TestCompilerCodec(unittest.TestCase):
+
+    def make_unit(self, i):
+        return dbstate.QueryUnit(
+            dbver=1,
+            txid=None,
+            sql=f'SELECT {i}'.encode(),
+            sql_hash=b'hash%d' % i,
+            out_type_data=b'\x00' * 100,
+            out_type_id=b'\x01' * 16,
+            in_type_data=b'\x02' * 10,
+            in_type_id=b'\x03' * 16)
+
+    def test_server_ipc_unit_01(self):
+        server = ipc.CompilerCodec()
+        worker = ipc.CompilerCodec()
+
+        unit = dbstate.QueryUnit(
+            dbver=2 ** 40,
+            txid=-5,
+            sql=b'SELECT 1',
+            sql_hash=b'1234',
+            has_ddl=True,
+            commits_tx=True,
+            rollbacks_tx=True,
+            starts_tx=True,
+            out_type_data=b'out',
+            out_type_id=b'\x01' * 16,
+            in_type_data=b'in',
+            in_type_id=b'\x02' * 16,
+            config=immutables.Map(foo=True),
+            modaliases=immutables.Map({None: 'default'}),
+            schema_delta=b'delta',
+            schema_fingerprint=b'fp')
+
+        # Make sure that every field is set to a non-default value,
+        # i.e. that the test is updated along with QueryUnit.
+        for field in dataclasses.fields(unit):
+            self.assertNotEqual(
+                getattr(unit, field.name), field.default, field.name)
+
+        for _ in range(2):
+            data = worker.encode_response((0, [unit, self.make_unit(1)]))
+            self.assertEqual(
+                server.decode_response(data),
+                (0, [unit, self.make_unit(1)]))
+
+    def test_server_ipc_interning_01(self):
+        server = ipc.CompilerCodec()
+        worker = ipc.CompilerCodec()
+
+        modaliases = immutables.Map({None: 'default'})
+        config = immutables.Map({f'setting{i}': 'value' for i in range(50)})
+        args = ('db', 1, b'SELECT 1', modaliases, config, False)
+
+        first = server.encode_request('compile_eql', args)
+        second = server.encode_request('compile_eql', args)
+        self.assertLess(len(second), len(first))
+        self.assertEqual(worker.decode_request(first), ('compile_eql', args))
+        self.assertEqual(worker.decode_request(second), ('compile_eql', args))
+
+        first = worker.encode_response((0, self.make_unit(1)))
+        second = worker.encode_response((0, self.make_unit(2)))
+        self.assertLess(len(second), len(first) - 100)
+        self.assertEqual(
+            server.decode_response(first), (0, self.make_unit(1)))
+        self.assertEqual(
+            server.decode_response(second), (0, self.make_unit(2)))
+
+    def test_server_ipc_interning_02(self):
+        class Codec(ipc.CompilerCodec):
+            BYTES_TABLE_SIZE = 3
+
+        server = Codec()
+        worker = Codec()
+
+        for i in range(10):
+            for j in (i, i // 2, 0):
+                unit = self.make_unit(j)
+                data = worker.encode_response((0, unit))
+                self.assertEqual(server.decode_response(data), (0, unit))
+
+    def test_server_ipc_reset_01(self):
+        server = ipc.CompilerCodec()
+        worker = ipc.CompilerCodec()
+        unit = self.make_unit(1)
+
+        with self.assertRaises(Exception):
+            worker.encode_response((0, unit, lambda: None))
+
+        data = worker.encode_response((0, unit))
+        self.assertEqual(server.decode_response(data), (0, unit))
@@ -0,0 +1,117 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import asyncio
+import unittest
+
+from edb.server2 import metrics
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_server_metrics_render_01(self):
+        registry = metrics.Registry()
+        counter = registry.new_counter(
+            'test_total', 'A counter.', labels=('database', 'result'))
+        gauge = registry.new_gauge('test_gauge', 'A "gauge".')
+
+        counter.inc(1, 'db', 'hit')
+        counter.inc(2, 'db', 'hit')
+        counter.inc(1, 'a"b\\c\n', 'miss')
+        gauge.inc()
+        gauge.inc(2)
+        gauge.dec()
+
+        self.assertEqual(counter.get('db', 'hit'), 3)
+        self.assertEqual(registry.render(), '\n'.join([
+            '# HELP test_total A counter.',
+            '# TYPE test_total counter',
+            'test_total{database="db",result="hit"} 3',
+            'test_total{database="a\\"b\\\\c\\n",result="miss"} 1',
+            '# HELP test_gauge A "gauge".',
+            '# TYPE test_gauge gauge',
+            'test_gauge 2',
+            '',
+        ]))
+
+        with self.assertRaises(ValueError):
+            counter.inc(1, 'db')
+        with self.assertRaises(ValueError):
+            counter.inc(-1, 'db', 'hit')
+        with self.assertRaises(ValueError):
+            registry.new_gauge('test_gauge', 'Again.')
+
+    def test_server_metrics_histogram_01(self):
+        registry = metrics.Registry()
+        hist = registry.new_histogram(
+            'test_seconds', 'A histogram.', labels=('stage',),
+            buckets=(0.1, 1))
+
+        hist.observe(0.05, 'parse')
+        hist.observe(0.1, 'parse')
+        hist.observe(0.5, 'parse')
+        hist.observe(7, 'parse')
+
+        self.assertEqual(hist.get_count('parse'), 4)
+        self.assertEqual(hist.get_sum('parse'), 7.65)
+        self.assertEqual(hist.get_count('other'), 0)
+        self.assertEqual(registry.render(), '\n'.join([
+            '# HELP test_seconds A histogram.',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{stage="parse",le="0.1"} 2',
+            'test_seconds_bucket{stage="parse",le="1"} 3',
+            'test_seconds_bucket{stage="parse",le="+Inf"} 4',
+            'test_seconds_sum{stage="parse"} 7.65',
+            'test_seconds_count{stage="parse"} 4',
+            '',
+        ]))
+
+    def test_server_metrics_http_01(self):
+        registry = metrics.Registry()
+        registry.new_counter('test_total', 'A counter.').inc()
+
+        async def request(data):
+            loop = asyncio.get_running_loop()
+            srv = await loop.create_server(
+                lambda: metrics.MetricsProtocol(registry),
+                host='127.0.0.1', port=0)
+            try:
+                port = srv.sockets[0].getsockname()[1]
+                reader, writer = await asyncio.open_connection(
+                    '127.0.0.1', port)
+                writer.write(data)
+                response = await reader.read()
+                writer.close()
+                return response
+            finally:
+                srv.close()
+                await srv.wait_closed()
+
+        response = asyncio.run(
+            request(b'GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n'))
+        head, body = response.split(b'\r\n\r\n', 1)
+        self.assertTrue(head.startswith(b'HTTP/1.0 200 OK\r\n'))
+        self.assertIn(b'Content-Type: text/plain; version=0.0.4', head)
+        self.assertEqual(body, registry.render().encode())
+
+        response = asyncio.run(request(b'GET / HTTP/1.1\r\n\r\n'))
+        self.assertTrue(response.startswith(b'HTTP/1.0 404 Not Found\r\n'))
+
+        response = asyncio.run(request(b'POST /metrics HTTP/1.1\r\n\r\n'))
+        self.assertTrue(response.startswith(b'HTTP/1.0 405 '))
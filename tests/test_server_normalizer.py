@@ -0,0 +1,114 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import struct
+import unittest
+
+from edb.lang import edgeql
+from edb.server2.backend import dbview
+from edb.server2.backend import normalizer
+
+
+class TestNormalizer(unittest.TestCase):
+
+    def assert_normalized(self, eql, expected_eql, expected_args=()):
+        normalized = normalizer.normalize(eql.encode())
+        self.assertEqual(normalized.eql.decode(), expected_eql)
+        self.assertEqual(normalized.implicit_params, len(expected_args))
+        self.assertEqual(normalized.implicit_args, b''.join(expected_args))
+
+        if expected_args:
+            # The normalized query must be valid.
+            edgeql.parse_block(normalized.eql.decode() + ';')
+
+    def assert_not_normalized(self, eql):
+        self.assert_normalized(eql, eql)
+
+    def int64(self, value):
+        return struct.pack('!iq', 8, value)
+
+    def str(self, value):
+        value = value.encode()
+        return struct.pack('!i', len(value)) + value
+
+    def test_server_normalizer_01(self):
+        self.assert_normalized(
+            "SELECT User { name } FILTER .name = 'foo' AND .age > 10",
+            "SELECT User { name } FILTER .name = <std::str>$0 "
+            "AND .age > <std::int64>$1",
+            [self.str('foo'), self.int64(10)])
+
+    def test_server_normalizer_02(self):
+        self.assert_normalized(
+            "SELECT 1.5 + <float64>$1 + <float64>$0",
+            "SELECT <std::float64>$2 + <float64>$1 + <float64>$0",
+            [struct.pack('!id', 8, 1.5)])
+
+    def test_server_normalizer_03(self):
+        self.assert_normalized(
+            "SELECT (r'a\\b', $$c$$, b'd', 'e\\n')",
+            "SELECT (<std::str>$0, <std::str>$1, <std::bytes>$2, 'e\\n')",
+            [self.str('a\\b'), self.str('c'), self.str('d')])
+
+    def test_server_normalizer_04(self):
+        # Tuple element references.
+        self.assert_normalized(
+            "SELECT (1, (2, 3)).1.0",
+            "SELECT (<std::int64>$0, (<std::int64>$1, <std::int64>$2)).1.0",
+            [self.int64(1), self.int64(2), self.int64(3)])
+
+    def test_server_normalizer_05(self):
+        # LIMIT and OFFSET affect the inferred cardinality.
+        self.assert_normalized(
+            "SELECT (SELECT User OFFSET 2 + 1 LIMIT 1) FILTER .age = 1",
+            "SELECT (SELECT User OFFSET 2 + 1 LIMIT 1) "
+            "FILTER .age = <std::int64>$0",
+            [self.int64(1)])
+
+    def test_server_normalizer_06(self):
+        self.assert_not_normalized("SELECT User FILTER .name = <str>$name")
+        self.assert_not_normalized("SET MODULE foo")
+        self.assert_not_normalized("CREATE TYPE Foo")
+        self.assert_not_normalized(
+            "WITH MODULE test CREATE FUNCTION foo() -> int64 FROM EdgeQL $$ "
+            "SELECT 1 $$")
+        self.assert_not_normalized("SELECT 9223372036854775808")
+        self.assert_not_normalized("SELECT User")
+        self.assert_not_normalized("SELECT 'unterminated")
+
+    def test_server_normalizer_07(self):
+        db = dbview.Database('test')
+        view = db._new_view(user='test')
+
+        normalized = view.normalize_query(b'SELECT 1')
+        self.assertEqual(normalized.implicit_params, 1)
+        self.assertEqual(view.normalize_query(b'SELECT 2').eql,
+                         normalized.eql)
+
+        self.assertEqual(
+            view.disable_query_normalization(b'SELECT 1', normalized),
+            normalizer.not_normalized(b'SELECT 1'))
+        # Queries with constants in the same places are not
+        # normalized either.
+        for eql in (b'SELECT 1', b'SELECT 2'):
+            self.assertEqual(
+                view.normalize_query(eql),
+                normalizer.not_normalized(eql))
+        self.assertEqual(
+            view.normalize_query(b"SELECT 'a'").implicit_params, 1)
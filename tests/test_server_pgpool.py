@@ -0,0 +1,174 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import asyncio
+
+from edb.server import _testbase as tb
+from edb.server2 import pgpool
+
+
+class FakeCon:
+
+    def __init__(self, dbname):
+        self.dbname = dbname
+        self.connected = True
+        self.tx = False
+
+    def is_connected(self):
+        return self.connected
+
+    def in_tx(self):
+        return self.tx
+
+    def terminate(self):
+        self.connected = False
+
+    def abort(self):
+        self.connected = False
+
+
+class TestPGPool(tb.TestCase):
+
+    async def create_pool(self, max_capacity):
+        self.connects = []
+
+        async def connect(dbname):
+            await asyncio.sleep(0.01)
+            con = FakeCon(dbname)
+            self.connects.append(con)
+            return con
+
+        return await pgpool.create_pool(
+            connect=connect, max_capacity=max_capacity)
+
+    async def test_pgpool_1(self):
+        pool = await self.create_pool(2)
+
+        c1 = await pool.acquire('a')
+        pool.release('a', c1)
+        c2 = await pool.acquire('a')
+
+        self.assertIs(c1, c2)
+        self.assertEqual(len(self.connects), 1)
+        self.assertEqual(pool.capacity, 1)
+
+        pool.release('a', c2)
+        await pool.close()
+        self.assertEqual(pool.capacity, 0)
+        self.assertFalse(c1.is_connected())
+
+    async def test_pgpool_2(self):
+        pool = await self.create_pool(2)
+
+        c1 = await pool.acquire('a')
+        c2 = await pool.acquire('a')
+        t3 = asyncio.create_task(pool.acquire('a'))
+        await asyncio.sleep(0.05)
+        self.assertFalse(t3.done())
+        self.assertEqual(pool.capacity, 2)
+
+        pool.release('a', c1)
+        self.assertIs(await t3, c1)
+
+        pool.release('a', c1)
+        pool.release('a', c2)
+        self.assertEqual(len(self.connects), 2)
+        await pool.close()
+
+    async def test_pgpool_3(self):
+        # Waiters for other databases get the capacity slot
+        # of a released connection.
+        pool = await self.create_pool(1)
+
+        c1 = await pool.acquire('a')
+        t2 = asyncio.create_task(pool.acquire('b'))
+        t3 = asyncio.create_task(pool.acquire('a'))
+        await asyncio.sleep(0.05)
+
+        pool.release('a', c1)
+        c2 = await t2
+        self.assertEqual(c2.dbname, 'b')
+        self.assertFalse(c1.is_connected())
+        self.assertFalse(t3.done())
+
+        pool.release('b', c2)
+        c3 = await t3
+        self.assertEqual(c3.dbname, 'a')
+        self.assertEqual(pool.capacity, 1)
+
+        pool.release('a', c3)
+        await pool.close()
+
+    async def test_pgpool_4(self):
+        # Idle connections to other databases are closed to make
+        # room for new ones.
+        pool = await self.create_pool(1)
+
+        c1 = await pool.acquire('a')
+        pool.release('a', c1)
+
+        c2 = await pool.acquire('b')
+        self.assertFalse(c1.is_connected())
+        self.assertEqual(c2.dbname, 'b')
+        self.assertEqual(pool.capacity, 1)
+
+        pool.release('b', c2)
+        await pool.close()
+
+    async def test_pgpool_5(self):
+        # Connections in a transaction or broken connections
+        # are not reused.
+        pool = await self.create_pool(2)
+
+        c1 = await pool.acquire('a')
+        c1.tx = True
+        pool.release('a', c1)
+        self.assertFalse(c1.is_connected())
+        self.assertEqual(pool.capacity, 0)
+
+        c2 = await pool.acquire('a')
+        pool.release('a', c2)
+        c2.connected = False
+
+        c3 = await pool.acquire('a')
+        self.assertIsNot(c2, c3)
+        self.assertEqual(pool.capacity, 1)
+
+        pool.release('a', c3)
+        await pool.close()
+
+    async def test_pgpool_6(self):
+        pool = await self.create_pool(1)
+
+        c1 = await pool.acquire('a')
+        t2 = asyncio.create_task(pool.acquire('a'))
+        await asyncio.sleep(0.05)
+        t2.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await t2
+
+        pool.release('a', c1)
+        c3 = await asyncio.wait_for(pool.acquire('a'), 1)
+        self.assertIs(c1, c3)
+
+        pool.release('a', c3)
+        await pool.close()
+
+        with self.assertRaises(pgpool.PoolClosedError):
+            await pool.acquire('a')
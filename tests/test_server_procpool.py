@@ -19,13 +19,20 @@
 
 import asyncio
 import os
+import random
 import signal
+import struct
 import tempfile
+import unittest
 
+import immutables
 import uvloop
 
 from edb.server import _testbase as tb
 from edb.server2 import procpool
+from edb.server2.backend import dbstate
+from edb.server2.backend import ipc
+from edb.server2.procpool import amsg
 from edb.lang.common import taskgroup
 
 
@@ -60,6 +67,44 @@ class Worker:
             pass
         raise WillCrashPickle
 
+    async def test6(self, data):
+        return data
+
+
+class FramedProtocol(amsg.BaseFramedProtocol):
+
+    def __init__(self):
+        super().__init__(loop=None)
+        self.messages = []
+
+    def process_message(self, msg):
+        self.messages.append(bytes(msg))
+
+    def feed(self, data):
+        data = memoryview(data)
+        while data:
+            buf = self.get_buffer(-1)
+            n = min(len(buf), len(data), random.randint(1, 100_000))
+            buf[:n] = data[:n]
+            data = data[n:]
+            self.buffer_updated(n)
+
+
+class TestFraming(unittest.TestCase):
+
+    def test_procpool_framing_1(self):
+        messages = [
+            os.urandom(random.choice([0, 1, 3, 100, 70_000, 3_000_000]))
+            for _ in range(200)
+        ]
+
+        data = b''.join(
+            struct.pack('!I', len(msg)) + msg for msg in messages)
+
+        proto = FramedProtocol()
+        proto.feed(data)
+        self.assertEqual(proto.messages, messages)
+
 
 class TestProcPool(tb.TestCase):
 
@@ -324,3 +369,105 @@ class TestProcPool(tb.TestCase):
 
         self.assertEqual(manager._stats_spawned, 11)
         self.assertEqual(manager._stats_killed, 11)
+
+    async def test_procpool_11(self):
+        pool = await procpool.create_pool(
+            max_capacity=1,
+            min_capacity=1,
+            runstate_dir=self.runstate_dir,
+            worker_cls=Worker,
+            worker_args=([123],),
+            name='test_procpool_11')
+
+        try:
+            for size in (0, 10, 2 ** 16, 10 * 2 ** 20):
+                data = os.urandom(size)
+                self.assertEqual(await pool.call('test6', data), data)
+        finally:
+            await pool.stop()
+
+    async def test_procpool_12(self):
+        pool = await procpool.create_pool(
+            max_capacity=1,
+            min_capacity=1,
+            runstate_dir=self.runstate_dir,
+            worker_cls=Worker,
+            worker_args=([123],),
+            codec_cls=ipc.CompilerCodec,
+            name='test_procpool_12')
+
+        try:
+            state = immutables.Map(a=1, b='2')
+            unit = dbstate.QueryUnit(
+                dbver=1, txid=None, sql=b'SELECT 1', sql_hash=b'h',
+                out_type_data=b'd', out_type_id=b'i')
+
+            for _ in range(3):
+                self.assertEqual(
+                    await pool.call('test6', (state, unit)),
+                    (state, unit))
+
+            with self.assertRaises(MyExc):
+                await pool.call('test4')
+
+            self.assertEqual(await pool.call('test6', state), state)
+        finally:
+            await pool.stop()
+
+    async def test_procpool_13(self):
+        pool = await procpool.create_pool(
+            max_capacity=1,
+            min_capacity=1,
+            runstate_dir=self.runstate_dir,
+            worker_cls=Worker,
+            worker_args=([123],),
+            name='test_procpool_13')
+
+        manager = pool.manager
+
+        try:
+            worker = await pool.acquire()
+            self.assertEqual(await worker.call('test1', 0), 1)
+
+            # A discarded worker is replaced, so a caller that is
+            # waiting for a worker does not get stuck.
+            waiter = asyncio.create_task(pool.acquire())
+            pool.release(worker, discard=True)
+            new_worker = await asyncio.wait_for(waiter, 5)
+
+            self.assertIsNot(new_worker, worker)
+            self.assertEqual(await new_worker.call('test1', 0), 1)
+            self.assertEqual(manager._stats_spawned, 2)
+            self.assertEqual(manager._stats_killed, 1)
+            pool.release(new_worker)
+        finally:
+            await pool.stop()
+
+    async def test_procpool_14(self):
+        pool = await procpool.create_pool(
+            max_capacity=1,
+            min_capacity=1,
+            runstate_dir=self.runstate_dir,
+            worker_cls=Worker,
+            worker_args=([123],),
+            name='test_procpool_14')
+
+        worker = next(pool.manager.iter_workers())
+        pid = worker.get_pid()
+
+        try:
+            t = asyncio.create_task(pool.call('test1', 0.5))
+            await asyncio.sleep(0.1)
+            t.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await t
+
+            # The reply to the cancelled call must not be taken
+            # for the reply to the next one.
+            self.assertEqual(await pool.call('test6', 'spam'), 'spam')
+            await asyncio.sleep(0.5)
+            self.assertEqual(await pool.call('test1', 0), 1)
+            self.assertNotEqual(worker.get_pid(), pid)
+
+        finally:
+            await pool.stop()
@@ -0,0 +1,142 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import asyncio
+import os
+import unittest
+
+from edb.server2 import supervisor
+
+
+def _frontend_main(frontend_id, sock):
+    async def main():
+        loop = asyncio.get_running_loop()
+        received = loop.create_future()
+        channel = supervisor.SupervisorChannel(
+            sock, on_ddl=received.set_result)
+        await channel.connect()
+
+        if frontend_id == 0:
+            channel.signal_ddl('db0')
+            channel.close()
+            await asyncio.sleep(0.1)
+            return 0
+
+        dbname = await asyncio.wait_for(received, 10)
+        return 0 if dbname == 'db0' else 1
+
+    return asyncio.run(main())
+
+
+def _frontend_cancel_main(frontend_id, sock):
+    async def main():
+        loop = asyncio.get_running_loop()
+        received = loop.create_future()
+        channel = supervisor.SupervisorChannel(
+            sock, on_ddl=lambda dbname: None,
+            on_cancel=lambda *args: received.set_result(args))
+        await channel.connect()
+
+        if frontend_id == 0:
+            channel.request_cancel(12, -34)
+            channel.close()
+            await asyncio.sleep(0.1)
+            return 0
+
+        args = await asyncio.wait_for(received, 10)
+        return 0 if args == (12, -34) else 1
+
+    return asyncio.run(main())
+
+
+def _frontend_graphql_main(frontend_id, sock):
+    async def main():
+        loop = asyncio.get_running_loop()
+        received = loop.create_future()
+        channel = supervisor.SupervisorChannel(
+            sock, on_ddl=lambda dbname: None,
+            on_persisted_graphql=received.set_result)
+        await channel.connect()
+
+        if frontend_id == 0:
+            channel.announce_persisted_graphql(b'{ User { name } }')
+            channel.close()
+            await asyncio.sleep(0.1)
+            return 0
+
+        document = await asyncio.wait_for(received, 10)
+        return 0 if document == b'{ User { name } }' else 1
+
+    return asyncio.run(main())
+
+
+class TestSupervisor(unittest.TestCase):
+
+    def test_server_supervisor_relay_01(self):
+        statuses = supervisor.Supervisor(3, _frontend_main).run()
+        self.assertEqual(len(statuses), 3)
+        self.assertNotIn(os.getpid(), statuses)
+        self.assertEqual(list(statuses.values()), [0, 0, 0])
+
+    def test_server_supervisor_relay_02(self):
+        statuses = supervisor.Supervisor(2, _frontend_cancel_main).run()
+        self.assertEqual(list(statuses.values()), [0, 0])
+
+    def test_server_supervisor_relay_03(self):
+        statuses = supervisor.Supervisor(2, _frontend_graphql_main).run()
+        self.assertEqual(list(statuses.values()), [0, 0])
+
+    def test_server_supervisor_exit_01(self):
+        def frontend_main(frontend_id, sock):
+            if frontend_id == 0:
+                return 3
+            # The others are stopped once one of them fails.
+            return asyncio.run(asyncio.sleep(60)) or 0
+
+        statuses = supervisor.Supervisor(2, frontend_main).run()
+        self.assertEqual(sorted(statuses.values()), [-15, 3])
+
+    def test_server_supervisor_exit_02(self):
+        def frontend_main(frontend_id, sock):
+            async def main():
+                loop = asyncio.get_running_loop()
+                received = loop.create_future()
+                channel = supervisor.SupervisorChannel(
+                    sock, on_ddl=received.set_result)
+                await channel.connect()
+
+                if frontend_id == 0:
+                    # Messages are still relayed while a front-end
+                    # that closed its channel is shutting down.
+                    channel.close()
+                    await asyncio.sleep(2)
+                    return 0
+                elif frontend_id == 1:
+                    await asyncio.sleep(0.2)
+                    channel.signal_ddl('db0')
+                    channel.close()
+                    return 0
+
+                dbname = await asyncio.wait_for(received, 1)
+                return 0 if dbname == 'db0' else 1
+
+            return asyncio.run(main())
+
+        statuses = supervisor.Supervisor(3, frontend_main).run()
+        self.assertEqual(list(statuses.values()), [0, 0, 0])